@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Benchmark the import time of the dirac-cwl modules and the CLI startup.
+
+Each module is imported in a fresh interpreter run with ``-X importtime``, as
+the CLI and the per-job interpreters are. The total import time is reported
+together with the modules taking the most time to import (cumulative).
+
+The CLI startup is measured as the time taken by ``dirac-cwl --help``.
+
+Usage:
+    python scripts/benchmark_import_time.py [--modules dirac_cwl dirac_cwl.job] [--top 10] [--repeat 5]
+"""
+
+import argparse
+import logging
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+# Line of the -X importtime output: "import time: <self us> | <cumulative us> | <module>"
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times(module: str) -> list[tuple[str, int, int]]:
+    """Import a module in a fresh interpreter and get the time spent importing each module.
+
+    The modules imported by the start of the interpreter (site) are left out.
+
+    :param module: The module to import
+    :return: The name, depth and cumulative import time (microseconds) of each module imported
+    :raises RuntimeError: If the module cannot be imported
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    times = []
+    for line in result.stderr.splitlines():
+        if match := IMPORT_TIME_LINE.match(line):
+            _, cumulative, indent, name = match.groups()
+            times.append((name, len(indent) // 2, int(cumulative)))
+    # The start of the interpreter ends with the import of site
+    start = next((i for i, (name, depth, _) in enumerate(times) if depth == 0 and name == "site"), -1)
+    return times[start + 1 :]
+
+
+def run_module(module: str, top: int) -> None:
+    """Report the import time of a module.
+
+    :param module: The module to import
+    :param top: Number of the slowest modules to report
+    """
+    try:
+        times = import_times(module)
+    except RuntimeError as e:
+        logger.error("%s: could not be imported: %s", module, e)
+        return
+    total = sum(cumulative for _, depth, cumulative in times if depth == 0)
+    logger.info("%s: %d modules imported in %.3f s", module, len(times), total / 1e6)
+    for name, _, cumulative in sorted(times, key=lambda entry: entry[2], reverse=True)[:top]:
+        logger.info("  %-60s %8.3f s", name, cumulative / 1e6)
+
+
+def run_cli(arguments: list[str], repeat: int) -> None:
+    """Report the time taken by a command of the CLI.
+
+    :param arguments: The arguments of the CLI
+    :param repeat: Number of runs, the median time is reported
+    """
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", "from dirac_cwl import app; app()", *arguments],
+            capture_output=True,
+            check=True,
+        )
+        elapsed.append(time.perf_counter() - start)
+    logger.info("dirac-cwl %s: %.3f s (median of %d)", " ".join(arguments), statistics.median(elapsed), repeat)
+
+
+def main():
+    """Benchmark the import time of the dirac-cwl modules."""
+    parser = argparse.ArgumentParser(description="Benchmark the import time of the dirac-cwl modules")
+    parser.add_argument(
+        "--modules",
+        nargs="+",
+        default=["dirac_cwl", "dirac_cwl.execution_hooks", "dirac_cwl.job", "dirac_cwl.production"],
+        help="Modules to import (default: dirac_cwl dirac_cwl.execution_hooks dirac_cwl.job dirac_cwl.production)",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="Number of the slowest modules to report (default: 10)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of runs of the CLI (default: 5)",
+    )
+
+    args = parser.parse_args()
+    for module in args.modules:
+        run_module(module, args.top)
+    run_cli(["--help"], args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Benchmark the pool XML catalog handling of the lb-prod-run wrapper.
+
+This script builds a replica map of N entries, then measures:
+
+1. The generation of the pool XML catalog from the replica map
+2. The update of the catalog written by the application (relative PFNs made
+   absolute) together with the update of the replica map
+
+The time and the peak of memory allocated by Python are reported for each step.
+
+Usage:
+    python scripts/benchmark_pool_xml.py [--sizes 10000 100000 300000] [--outputs 10]
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+from diracx.core.models.replica_map import ReplicaMap
+
+from dirac_cwl.job.executor.run_lbprodrun import (
+    generate_pool_xml_catalog_from_replica_map,
+    update_pool_xml_to_absolute_paths,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+# Silence the wrapper
+logging.getLogger("run_lbprodrun").setLevel(logging.ERROR)
+
+
+@contextmanager
+def measure(label: str):
+    """Log the time spent and the peak of memory allocated in a block."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    logger.info("  %-45s %8.3f s %10.1f MiB", label, elapsed, peak / 1024**2)
+
+
+def build_replica_map(size: int) -> ReplicaMap:
+    """Build a replica map of the given size."""
+    return ReplicaMap(
+        root={
+            f"/lhcb/MC/2024/DIGI/{i:08d}/{i:08d}_1.digi": ReplicaMap.MapEntry(
+                replicas=[ReplicaMap.MapEntry.Replica(url=f"root://eos.example.org//digi/{i:08d}.digi", se="CERN-DST")],
+                checksum=ReplicaMap.MapEntry.Checksum(guid=f"{i:08X}-32DC-EC11-9A66-D85ED3091D71"),
+                size_bytes=1024 * (i + 1),
+            )
+            for i in range(size)
+        }
+    )
+
+
+def add_outputs(catalog: Path, workdir: Path, outputs: int) -> None:
+    """Register output files with relative PFNs, as the application does."""
+    files = []
+    for i in range(outputs):
+        name = f"00012345_{i:08d}_1.dst"
+        (workdir / name).write_bytes(b"\0" * 1024)
+        files.append(
+            f'  <File ID="{i:08X}-0000-0000-0000-000000000000">\n'
+            f'    <physical>\n      <pfn filetype="DST" name="{name}"/>\n    </physical>\n'
+            f'    <logical>\n      <lfn name="{name}"/>\n    </logical>\n  </File>\n'
+        )
+    content = catalog.read_text()
+    catalog.write_text(content.replace("</POOLFILECATALOG>", "".join(files) + "</POOLFILECATALOG>"))
+
+
+def run(size: int, outputs: int) -> None:
+    """Run the benchmark for a replica map of the given size."""
+    logger.info("Replica map: %d entries, %d output files", size, outputs)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        workdir = Path(tmpdir)
+        replica_map_path = workdir / "replica_map.json"
+        catalog = workdir / "pool_xml_catalog.xml"
+        replica_map_path.write_text(build_replica_map(size).model_dump_json())
+
+        with measure("generate pool XML catalog"):
+            generate_pool_xml_catalog_from_replica_map(replica_map_path, catalog)
+        logger.info("  %-45s %8.1f MiB", "catalog size", catalog.stat().st_size / 1024**2)
+
+        add_outputs(catalog, workdir, outputs)
+
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            with measure("update catalog and replica map"):
+                update_pool_xml_to_absolute_paths(catalog, replica_map_path)
+        finally:
+            os.chdir(cwd)
+
+
+def main():
+    """Benchmark the pool XML catalog handling."""
+    parser = argparse.ArgumentParser(description="Benchmark the pool XML catalog handling")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000, 300_000],
+        help="Sizes of the replica map (default: 10000 100000 300000)",
+    )
+    parser.add_argument(
+        "--outputs",
+        type=int,
+        default=10,
+        help="Number of output files added by the application (default: 10)",
+    )
+
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.outputs)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
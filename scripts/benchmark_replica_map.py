@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Benchmark the per-step replica map filtering of the DIRAC executor.
+
+This script builds a global replica map of N entries and a step reading a
+fraction of them, then measures:
+
+1. The extraction of the LFNs from the step inputs
+2. The filtering of the global replica map for the step
+3. The merge of the step replica map back into the global map
+
+The quadratic implementation used before keyed lookups can be timed as a
+reference with --legacy (slow: keep the sizes small).
+
+Usage:
+    python scripts/benchmark_replica_map.py [--sizes 100000 1000000] [--fraction 0.1] [--legacy]
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+from diracx.core.models.replica_map import ReplicaMap
+
+from dirac_cwl.job.executor.executor import DiracExecutor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+# Silence the executor
+logging.getLogger("dirac-cwl-run").setLevel(logging.ERROR)
+
+
+@contextmanager
+def timer(label: str):
+    """Log the time spent in a block."""
+    start = time.perf_counter()
+    yield
+    logger.info("  %-40s %8.3f s", label, time.perf_counter() - start)
+
+
+def build_replica_map(size: int) -> ReplicaMap:
+    """Build a replica map of the given size."""
+    return ReplicaMap(
+        root={
+            f"/lhcb/MC/2024/SIM/{i:08d}/{i:08d}_1.sim": ReplicaMap.MapEntry(
+                replicas=[ReplicaMap.MapEntry.Replica(url=f"root://eos.example.org//sim/{i:08d}.sim", se="CERN-DST")],
+                size_bytes=1024 * i,
+            )
+            for i in range(size)
+        }
+    )
+
+
+def build_job(lfns: list[str], outdir: Path) -> SimpleNamespace:
+    """Build a minimal stand-in for a CommandLineJob reading the given LFNs."""
+    job_order = {"input-data": [{"class": "File", "location": f"LFN:{lfn}"} for lfn in lfns]}
+    return SimpleNamespace(name="benchmark", builder=SimpleNamespace(job=job_order), outdir=str(outdir))
+
+
+def legacy_extract_lfns(executor: DiracExecutor, job_order) -> list[str]:
+    """Extract the LFNs with the list-based de-duplication used previously."""
+    lfns: list[str] = []
+    for lfn in executor._extract_lfns_from_inputs(job_order):
+        if lfn not in lfns:
+            lfns.append(lfn)
+    return lfns
+
+
+def legacy_filter(global_map: ReplicaMap, step_lfns: list[str]) -> ReplicaMap:
+    """Filter the global map by scanning it, as done previously."""
+    return ReplicaMap(root={lfn: entry for lfn, entry in global_map.root.items() if lfn in step_lfns})
+
+
+def run(size: int, fraction: float, legacy: bool) -> None:
+    """Run the benchmark for a global map of the given size."""
+    step_size = max(1, int(size * fraction))
+    logger.info("Global map: %d entries, step inputs: %d LFNs", size, step_size)
+
+    with timer("build global map"):
+        global_map = build_replica_map(size)
+    # Take the inputs across the whole map
+    step_lfns = list(global_map.root)[:: max(1, size // step_size)][:step_size]
+
+    executor = DiracExecutor()
+    executor.global_map = global_map
+
+    with tempfile.TemporaryDirectory() as outdir:
+        job = build_job(step_lfns, Path(outdir))
+
+        with timer("extract LFNs"):
+            extracted = executor._extract_lfns_from_inputs(job.builder.job)
+        assert len(extracted) == step_size
+
+        with timer("prepare step replica map (incl. JSON)"):
+            executor._prepare_job_replica_map(job, SimpleNamespace())
+
+        with timer("merge step replica map back"):
+            executor._update_replica_map_from_job(job, SimpleNamespace())
+
+        if legacy:
+            with timer("legacy: extract LFNs"):
+                legacy_extract_lfns(executor, job.builder.job)
+            with timer("legacy: filter global map"):
+                legacy_filter(global_map, extracted)
+
+
+def main():
+    """Benchmark the replica map filtering."""
+    parser = argparse.ArgumentParser(description="Benchmark the per-step replica map filtering")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[100_000, 300_000, 1_000_000],
+        help="Sizes of the global replica map (default: 100000 300000 1000000)",
+    )
+    parser.add_argument(
+        "--fraction",
+        type=float,
+        default=0.05,
+        help="Fraction of the global map read by the step (default: 0.05)",
+    )
+    parser.add_argument(
+        "--legacy",
+        action="store_true",
+        help="Also time the previous, quadratic implementation",
+    )
+
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.fraction, args.legacy)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
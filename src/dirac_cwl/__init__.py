@@ -1,13 +1,12 @@
 """DIRAC CWL Proto - Common Workflow Language integration for DIRAC."""
 
+import importlib
 import logging
 from importlib.metadata import PackageNotFoundError, version
 
+import click
 import typer
-
-from dirac_cwl.job import app as job_app
-from dirac_cwl.production import app as production_app
-from dirac_cwl.transformation import app as transformation_app
+from typer.core import TyperGroup
 
 try:
     __version__ = version("dirac-cwl")
@@ -15,7 +14,46 @@ except PackageNotFoundError:
     # package is not installed
     pass
 
-app = typer.Typer()
+# Sub-apps of the CLI: name -> (module, help)
+# The modules import DIRAC, diracx and cwltool: they are only imported when their command is run
+SUBCOMMANDS = {
+    "production": ("dirac_cwl.production", "Run a workflow as a production."),
+    "transformation": ("dirac_cwl.transformation", "Run a workflow as a transformation."),
+    "job": ("dirac_cwl.job", "Run a workflow as a job."),
+}
+
+
+class LazyGroup(TyperGroup):
+    """Group of the CLI importing the module of a subcommand only when it is run."""
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        """List the subcommands, without importing them."""
+        return list(SUBCOMMANDS)
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command | None:
+        """Import the module of a subcommand and build its command.
+
+        :param ctx: The click context
+        :param cmd_name: The name of the subcommand
+        :return: The command, None if the subcommand does not exist
+        """
+        if cmd_name not in SUBCOMMANDS:
+            return None
+        module, _ = SUBCOMMANDS[cmd_name]
+        # A group, as add_typer builds: get_command turns an app of a single command into that command
+        command = typer.main.get_group(importlib.import_module(module).app)
+        command.name = cmd_name
+        return command
+
+    def format_commands(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        """List the subcommands in the help, without importing them."""
+        rows = [(name, help) for name, (_, help) in SUBCOMMANDS.items()]
+        with formatter.section("Commands"):
+            formatter.write_dl(rows)
+
+
+# The rich help lists the subcommands by building them: use the plain help listing SUBCOMMANDS
+app = typer.Typer(cls=LazyGroup, rich_markup_mode=None)
 
 
 @app.callback(invoke_without_command=True)
@@ -27,10 +65,5 @@ def _configure_logging():
     )
 
 
-# Add sub-apps
-app.add_typer(production_app, name="production")
-app.add_typer(transformation_app, name="transformation")
-app.add_typer(job_app, name="job")
-
 if __name__ == "__main__":
     app()
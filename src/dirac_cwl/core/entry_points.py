@@ -0,0 +1,426 @@
+"""Cache of the plugins discovered from the entry points.
+
+Discovering the plugins of an entry point group imports every plugin, which
+each interpreter (CLI, job wrapper) pays at startup. The plugins found are kept
+in the dirac-cwl cache with the module and VO of their class, so that the next
+processes register them without importing them: a plugin class is only
+imported when it is looked up.
+
+The cache is keyed by the distributions installed in the environment: it is
+ignored once a distribution is installed, removed or upgraded. When a cached
+plugin cannot be imported anymore, the registry discovers the plugins again.
+
+EntryPointsPluginRegistry holds the discovery shared by the plugin registries.
+"""
+
+import functools
+import hashlib
+import importlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, ClassVar, Generic, NamedTuple, Optional, Protocol, TypeVar
+
+from dirac_cwl.core.utility import cache_dir
+
+logger = logging.getLogger(__name__)
+
+
+class PluginEntry(NamedTuple):
+    """A plugin found in an entry point group."""
+
+    #: Key of the plugin in its registry
+    key: str
+    #: Location of the plugin class, as "module:qualified.name"
+    value: str
+    #: Virtual Organization of the plugin
+    vo: str | None = None
+
+    @classmethod
+    def from_class(cls, key: str, plugin_class: type, vo: str | None = None) -> "PluginEntry":
+        """Describe a plugin class.
+
+        :param key: Key of the plugin in its registry.
+        :param plugin_class: The plugin class.
+        :param vo: Virtual Organization of the plugin.
+        :return: The entry.
+        """
+        return cls(key, f"{plugin_class.__module__}:{plugin_class.__qualname__}", vo)
+
+    def load(self) -> type:
+        """Import the plugin class.
+
+        :return: The plugin class.
+        :raises ImportError: If the class cannot be imported.
+        """
+        module_name, _, qualname = self.value.partition(":")
+        target = importlib.import_module(module_name)
+        try:
+            for attribute in qualname.split("."):
+                target = getattr(target, attribute)
+        except AttributeError as e:
+            raise ImportError(f"Cannot import {self.value}: {e}") from e
+        return target  # type: ignore[return-value]
+
+
+def default_cache_path() -> Path:
+    """Get the file where the plugins discovered are kept.
+
+    :return: ``$DIRAC_CWL_ENTRY_POINTS_CACHE`` if set, a file of the dirac-cwl cache otherwise.
+    """
+    if path := os.environ.get("DIRAC_CWL_ENTRY_POINTS_CACHE"):
+        return Path(path)
+    return cache_dir() / "entry-points.json"
+
+
+@functools.cache
+def environment_key() -> str:
+    """Get the key of the installed distributions.
+
+    The distributions are listed from their metadata directories, whose names
+    include their versions, without reading their metadata. The modification
+    time of their entry points is included, for a reinstall of the same version
+    (editable installs) to change the key.
+
+    :return: A digest of the interpreter, the import path and the installed distributions.
+    """
+    digest = hashlib.sha256(f"{sys.executable}\n{sys.version}\n".encode())
+    for entry in sys.path:
+        digest.update(f"{entry}\n".encode())
+        try:
+            names = os.listdir(entry or ".")
+        except OSError:
+            continue
+        for name in sorted(names):
+            if name.endswith((".dist-info", ".egg-info", ".egg-link")):
+                digest.update(f"  {name} {_metadata_mtime(os.path.join(entry or '.', name))}\n".encode())
+    return digest.hexdigest()
+
+
+def _metadata_mtime(path: str) -> int:
+    """Get the modification time of the entry points of a distribution.
+
+    :param path: The metadata directory of the distribution, or its egg-link.
+    :return: The modification time of its entry_points.txt if any, of the metadata otherwise, 0 if missing.
+    """
+    for candidate in (os.path.join(path, "entry_points.txt"), path):
+        try:
+            return os.stat(candidate).st_mtime_ns
+        except OSError:
+            continue
+    return 0
+
+
+class EntryPointsCache:
+    """Plugins discovered from the entry point groups, for a given environment.
+
+    :param path: File where the plugins are loaded from and saved to, the default location when used by default.
+    :param key: Key of the environment, the installed distributions by default.
+    """
+
+    def __init__(self, path: Path | None = None, key: str | None = None):
+        """Set up the cache, without reading it."""
+        self._path = path
+        self._key = key
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls) -> "EntryPointsCache":
+        """Get the cache at the default location.
+
+        The location is resolved when the cache is used, not when the registries are created on import.
+
+        :return: The cache.
+        """
+        return cls()
+
+    @property
+    def path(self) -> Path:
+        """File where the plugins are loaded from and saved to."""
+        return self._path if self._path is not None else default_cache_path()
+
+    @property
+    def key(self) -> str:
+        """Key of the environment of the plugins."""
+        if self._key is None:
+            self._key = environment_key()
+        return self._key
+
+    def _read(self) -> dict[str, list]:
+        """Read the plugins of each group, if they were discovered in the same environment.
+
+        :return: The plugins of each group, empty if the cache is missing or stale.
+        """
+        try:
+            content = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring the entry points cache %s: %s", self.path, e)
+            return {}
+        if not isinstance(content, dict) or content.get("key") != self.key:
+            return {}
+        return content.get("groups", {})
+
+    def get(self, group: str) -> list[PluginEntry] | None:
+        """Get the plugins of an entry point group.
+
+        :param group: The entry point group.
+        :return: The plugins, None if the group is not cached for this environment.
+        """
+        entries = self._read().get(group)
+        if entries is None:
+            return None
+        try:
+            return [PluginEntry(*entry) for entry in entries]
+        except TypeError as e:
+            logger.warning("Ignoring the cached entry points of %s: %s", group, e)
+            return None
+
+    def put(self, group: str, entries: list[PluginEntry]) -> None:
+        """Save the plugins of an entry point group, keeping the other groups.
+
+        :param group: The entry point group.
+        :param entries: The plugins.
+        """
+        with self._lock:
+            groups = self._read() | {group: [list(entry) for entry in entries]}
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with tempfile.NamedTemporaryFile("w", dir=self.path.parent, prefix=".tmp-", delete=False) as f:
+                    json.dump({"key": self.key, "groups": groups}, f)
+                os.replace(f.name, self.path)
+            except OSError as e:
+                logger.warning("Could not save the entry points cache to %s: %s", self.path, e)
+
+    def invalidate(self) -> None:
+        """Drop the cache, for the next processes to discover the plugins again."""
+        with self._lock:
+            try:
+                self.path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning("Could not remove the entry points cache %s: %s", self.path, e)
+
+
+class RegistryPlugin(Protocol):
+    """Plugin class held by an EntryPointsPluginRegistry."""
+
+    vo: ClassVar[Optional[str]]
+
+    @classmethod
+    def name(cls) -> str:
+        """Get the key of the plugin in its registry."""
+        ...
+
+    @classmethod
+    def get_schema_info(cls) -> dict[str, Any]:
+        """Get the information about the plugin."""
+        ...
+
+
+PluginT = TypeVar("PluginT", bound=RegistryPlugin)
+
+
+class EntryPointsPluginRegistry(ABC, Generic[PluginT]):
+    """Registry of the plugins of an entry point group, discovered through the cache.
+
+    Subclasses set the entry point group and the base class of its plugins,
+    register the plugins with register_plugin and import the plugins of the
+    group with _scan_entry_points.
+
+    :param lazy_discovery: Discover the plugins of the entry points on the first
+        use of the registry, instead of waiting for discover_plugins to be called.
+    :param cache: Cache of the plugins discovered: the plugins it holds are only
+        imported when they are looked up.
+    """
+
+    #: Entry point group of the plugins
+    ENTRY_POINT_GROUP: ClassVar[str]
+    #: Base class of the plugins
+    PLUGIN_BASE: type[PluginT]
+    #: VO of the plugins available to all the VOs, not listed as a VO
+    GENERIC_VO: ClassVar[Optional[str]] = None
+
+    def __init__(self, lazy_discovery: bool = False, cache: EntryPointsCache | None = None) -> None:
+        """Initialize the registry."""
+        self._plugins: dict[str, type[PluginT]] = {}
+        self._vo_plugins: dict[str, dict[str, type[PluginT]]] = {}
+        self._plugin_info: dict[str, dict[str, Any]] = {}
+        # Plugins registered from the cache, not imported yet
+        self._entries: dict[str, PluginEntry] = {}
+        # Keys of the cached plugins being imported, still in _entries until registered
+        self._loading: set[str] = set()
+        self._cache = cache
+        self._discovered = not lazy_discovery
+        # Set while the plugins are discovered, for register_plugin not to discover them again
+        self._discovering = False
+        self._discovery_lock = threading.RLock()
+
+    @abstractmethod
+    def register_plugin(self, plugin_class: type[PluginT], override: bool = False) -> None:
+        """Register a plugin.
+
+        :param plugin_class: The plugin class to register.
+        :param override: Whether to override existing registrations.
+        """
+
+    @abstractmethod
+    def _scan_entry_points(self) -> tuple[list[type[PluginT]], bool]:
+        """Import the plugins of the entry point group.
+
+        :return: The plugin classes, and whether all the entry points were plugins.
+        """
+
+    def _ensure_discovered(self) -> None:
+        """Discover the plugins of the entry points, if not done yet."""
+        if self._discovered:
+            return
+        # The other threads wait for the discovery to complete
+        with self._discovery_lock:
+            if not self._discovered and not self._discovering:
+                self.discover_plugins()
+
+    def _check_override(self, plugin_key: str, override: bool) -> None:
+        """Check that a plugin can be registered, dropping its cached entry.
+
+        :param plugin_key: The plugin identifier.
+        :param override: Whether to override existing registrations.
+        :raises ValueError: If plugin is already registered and override=False.
+        """
+        if plugin_key in self._plugins and not override:
+            existing = self._plugins[plugin_key]
+            raise ValueError(
+                f"Plugin '{plugin_key}' already registered by {existing.__module__}.{existing.__name__}. "
+                f"Use override=True to replace."
+            )
+        if plugin_key in self._entries and not override:
+            raise ValueError(
+                f"Plugin '{plugin_key}' already registered by {self._entries[plugin_key].value}. "
+                f"Use override=True to replace."
+            )
+        self._entries.pop(plugin_key, None)
+
+    def _load_entry(self, plugin_key: str) -> None:
+        """Import a plugin registered from the cache, if not imported yet.
+
+        :param plugin_key: The plugin identifier.
+        """
+        # Checked in this order, a lookup during an import waits for the plugin to be registered
+        if plugin_key not in self._entries and plugin_key not in self._loading:
+            return
+        with self._discovery_lock:
+            entry = self._entries.get(plugin_key)
+            if entry is None:
+                return
+            self._loading.add(plugin_key)
+            try:
+                try:
+                    plugin_class = entry.load()
+                    if not issubclass(plugin_class, self.PLUGIN_BASE) or plugin_class.name() != plugin_key:
+                        raise ImportError(f"{entry.value} is not the {self.PLUGIN_BASE.__name__} '{plugin_key}'")
+                except Exception as e:
+                    logger.warning(
+                        "Failed to import cached plugin %s, discovering the plugins again: %s", plugin_key, e
+                    )
+                    # The cache is outdated: scan the entry points, which caches them again
+                    if self._cache is not None:
+                        self._cache.invalidate()
+                    self._entries.clear()
+                    self._discover_plugins()
+                    return
+                # Replaces the cached entry
+                self.register_plugin(plugin_class, override=True)
+            finally:
+                self._loading.discard(plugin_key)
+
+    def _wait_for_loads(self) -> None:
+        """Wait for the cached plugins being imported to be registered."""
+        if self._loading:
+            with self._discovery_lock:
+                pass
+
+    def get_plugin(self, plugin_key: str, vo: Optional[str] = None) -> Optional[type[PluginT]]:
+        """Get a registered plugin.
+
+        :param plugin_key: The plugin identifier.
+        :param vo: Virtual Organization namespace to search first.
+        :return: The plugin class or None if not found.
+        """
+        self._ensure_discovered()
+        self._load_entry(plugin_key)
+        # Try VO-specific first if specified
+        if vo and vo in self._vo_plugins:
+            if plugin_key in self._vo_plugins[vo]:
+                return self._vo_plugins[vo][plugin_key]
+
+        # Fall back to global registry
+        return self._plugins.get(plugin_key)
+
+    def list_plugins(self, vo: Optional[str] = None) -> list[str]:
+        """List available plugins.
+
+        :param vo: Filter by Virtual Organization.
+        :return: List of available plugin keys.
+        """
+        self._ensure_discovered()
+        self._wait_for_loads()
+        if vo and vo in self.list_virtual_organizations():
+            return list(self._vo_plugins.get(vo, {})) + [key for key, entry in self._entries.items() if entry.vo == vo]
+        return list(self._plugins.keys()) + list(self._entries)
+
+    def list_virtual_organizations(self) -> list[str]:
+        """List Virtual Organizations with registered plugins."""
+        self._ensure_discovered()
+        self._wait_for_loads()
+        entry_vos = [entry.vo for entry in self._entries.values() if entry.vo and entry.vo != self.GENERIC_VO]
+        return list(dict.fromkeys([*self._vo_plugins, *entry_vos]))
+
+    def get_plugin_info(self, plugin_key: str) -> Optional[dict[str, Any]]:
+        """Get detailed information about a plugin."""
+        self._ensure_discovered()
+        self._load_entry(plugin_key)
+        return self._plugin_info.get(plugin_key)
+
+    def discover_plugins(self) -> int:
+        """Discover and register plugins from the entry points.
+
+        The plugins found in the cache are registered without being imported.
+
+        :return: Number of plugins discovered and registered.
+        """
+        with self._discovery_lock:
+            self._discovering = True
+            try:
+                if self._cache is not None and (entries := self._cache.get(self.ENTRY_POINT_GROUP)) is not None:
+                    self._entries.update((entry.key, entry) for entry in entries if entry.key not in self._plugins)
+                    count = len(entries)
+                else:
+                    count = self._discover_plugins()
+            finally:
+                self._discovering = False
+            # Only once complete: until then, the lookups of the other threads wait for the discovery
+            self._discovered = True
+            return count
+
+    def _discover_plugins(self) -> int:
+        """Register the plugins of the entry points.
+
+        :return: Number of plugins discovered and registered.
+        """
+        plugin_classes, complete = self._scan_entry_points()
+        discovered: list[PluginEntry] = []
+        for plugin_class in plugin_classes:
+            # Plugins imported from the cache before it was found outdated are registered already
+            if self._plugins.get(plugin_class.name()) is not plugin_class:
+                self.register_plugin(plugin_class)
+            discovered.append(PluginEntry.from_class(plugin_class.name(), plugin_class, plugin_class.vo))
+
+        # Keep reporting the broken entry points: only cache a complete discovery
+        if self._cache is not None and complete:
+            self._cache.put(self.ENTRY_POINT_GROUP, discovered)
+        return len(discovered)
@@ -0,0 +1,98 @@
+"""Transfer throughput measured from the storage elements.
+
+The throughput of the transfers from each storage element is smoothed with an
+exponential moving average and kept in the dirac-cwl cache, so that the measures
+of a job can be used to choose the replicas read by the next ones.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from dirac_cwl.core.utility import cache_dir
+
+logger = logging.getLogger(__name__)
+
+#: Weight of a new measure in the moving average
+THROUGHPUT_SMOOTHING = 0.3
+#: Transfers smaller than this are dominated by latency and not measured (bytes)
+MIN_MEASURED_BYTES = 1024 * 1024
+
+
+def default_throughput_path() -> Path:
+    """Get the file where the throughput measures are kept.
+
+    :return: ``$DIRAC_CWL_SE_THROUGHPUT`` if set, a file of the dirac-cwl cache otherwise.
+    """
+    if path := os.environ.get("DIRAC_CWL_SE_THROUGHPUT"):
+        return Path(path)
+    return cache_dir() / "se-throughput.json"
+
+
+class SEThroughput:
+    """Moving average of the transfer throughput of each storage element, in bytes/s.
+
+    :param path: File where the measures are loaded from and saved to, None to keep them in memory.
+    """
+
+    def __init__(self, path: Path | None = None):
+        """Load the measures."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._throughput: dict[str, float] = {}
+        if path is not None and path.exists():
+            try:
+                self._throughput = {se: float(value) for se, value in json.loads(path.read_text()).items()}
+            except (OSError, ValueError, AttributeError) as e:
+                logger.warning("Ignoring the throughput measures in %s: %s", path, e)
+
+    @classmethod
+    def load(cls) -> "SEThroughput":
+        """Load the measures from the default location.
+
+        :return: The measures.
+        """
+        return cls(default_throughput_path())
+
+    def record(self, se: str, nbytes: int, seconds: float) -> None:
+        """Record a transfer from a storage element.
+
+        :param se: The storage element.
+        :param nbytes: The size of the transfer.
+        :param seconds: The duration of the transfer.
+        """
+        if nbytes < MIN_MEASURED_BYTES or seconds <= 0:
+            return
+        measure = nbytes / seconds
+        with self._lock:
+            previous = self._throughput.get(se)
+            if previous is None:
+                self._throughput[se] = measure
+            else:
+                self._throughput[se] = previous + THROUGHPUT_SMOOTHING * (measure - previous)
+
+    def get(self, se: str) -> float | None:
+        """Get the throughput of a storage element.
+
+        :param se: The storage element.
+        :return: The throughput in bytes/s, None if it was never measured.
+        """
+        return self._throughput.get(se)
+
+    def save(self) -> None:
+        """Save the measures, merged with the ones saved meanwhile by other processes."""
+        if self.path is None:
+            return
+        with self._lock:
+            measures = dict(self._throughput)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            on_disk = SEThroughput(self.path)._throughput
+            with tempfile.NamedTemporaryFile("w", dir=self.path.parent, prefix=".tmp-", delete=False) as f:
+                json.dump(on_disk | measures, f)
+            os.replace(f.name, self.path)
+        except OSError as e:
+            logger.warning("Could not save the throughput measures to %s: %s", self.path, e)
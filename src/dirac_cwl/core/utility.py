@@ -1,5 +1,6 @@
 """Utility functions for file catalog operations."""
 
+import os
 from pathlib import Path
 from typing import Any
 
@@ -39,3 +40,25 @@ def get_lfns(input_data: dict[str, Any]) -> dict[str, list[Path]]:
                 val.append(Path(input_value.location))
             files[input_name] = val
     return files
+
+
+def cache_dir(*parts: str) -> Path:
+    """Get a directory of the dirac-cwl cache.
+
+    The cache is located in ``$XDG_CACHE_HOME/dirac-cwl``, ``~/.cache/dirac-cwl`` by default.
+
+    :param parts: Path of the directory within the cache.
+    :return: The path of the directory, which may not exist yet.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base, "dirac-cwl", *parts)
+
+
+def available_cores() -> int:
+    """Get the number of cores the process is allowed to use.
+
+    :return: The number of cores in the CPU affinity of the process, or the number of cores of the machine
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
@@ -10,6 +10,8 @@ providing enhanced functionality through the new plugin system.
 from .core import (
     ExecutionHooksBasePlugin,
     ExecutionHooksHint,
+    GroupWeight,
+    HintIndex,
     SchedulingHint,
     TransformationExecutionHooksHint,
 )
@@ -19,22 +21,18 @@ from .registry import (
     get_registry,
 )
 
-# Initialize the registry and discover core plugins
+# The plugins are discovered on the first lookup in the registry
 _registry = get_registry()
 
-# Auto-discover plugins on import
-try:
-    discover_plugins()
-except Exception:
-    # Fail silently if plugin discovery fails during import
-    pass
-
 __all__ = [
     # Core metadata and plugins
     "ExecutionHooksHint",
     "TransformationExecutionHooksHint",
     "ExecutionHooksBasePlugin",
+    "GroupWeight",
+    "HintIndex",
     "SchedulingHint",
     "ExecutionHooksPluginRegistry",
     "get_registry",
+    "discover_plugins",
 ]
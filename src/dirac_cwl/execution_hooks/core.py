@@ -8,7 +8,10 @@ from __future__ import annotations
 
 import logging
 import os
+import threading
+import weakref
 from abc import ABC, abstractmethod
+from enum import StrEnum
 from pathlib import Path
 from typing import (
     Any,
@@ -39,6 +42,7 @@ logger = logging.getLogger(__name__)
 
 # TypeVar for generic class methods
 T = TypeVar("T", bound="SchedulingHint")
+M = TypeVar("M", bound=BaseModel)
 
 
 class ExecutionHooksBasePlugin(BaseModel):
@@ -160,6 +164,112 @@ class ExecutionHooksBasePlugin(BaseModel):
         }
 
 
+class HintIndex:
+    """Index of the DIRAC hints of a CWL object, built in a single pass over its hints.
+
+    The index of a CWL object is built once and shared, e.g. by the jobs of a
+    submission, which all have the same task. The descriptors extracted from it
+    are cached too. It is rebuilt when the hints of the object are replaced or
+    updated with ``update_cwl``; other in-place changes to the hints require
+    calling ``invalidate``.
+
+    :param hints: The hints of the CWL object.
+    """
+
+    _indexes: ClassVar[dict[int, tuple[weakref.ref, "HintIndex"]]] = {}
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(self, hints: list[Any]):
+        """Gather the data of the DIRAC hints by class."""
+        self.hints = hints
+        self._size = len(hints)
+        self._data: dict[str, list[dict[str, Any]]] = {}
+        for hint in hints:
+            hint_class = hint.get("class")
+            if isinstance(hint_class, str) and hint_class.startswith("dirac:"):
+                self._data.setdefault(hint_class, []).append({k: v for k, v in hint.items() if k != "class"})
+        self._descriptors: dict[type, Any] = {}
+
+    @classmethod
+    def of(cls, cwl_object: Any) -> HintIndex:
+        """Get the index of the hints of a CWL object.
+
+        :param cwl_object: The CWL object.
+        :return: Its index, built if needed.
+        """
+        hints = getattr(cwl_object, "hints", []) or []
+        key = id(cwl_object)
+        entry = cls._indexes.get(key)
+        if entry is not None:
+            ref, index = entry
+            if ref() is cwl_object and index.hints is hints and index._size == len(hints):
+                return index
+
+        index = cls(hints)
+
+        def discard(_: weakref.ref) -> None:
+            cls._discard(key, ref)
+
+        try:
+            ref = weakref.ref(cwl_object, discard)
+        except TypeError:
+            # Not cached: the entry could outlive the object
+            return index
+        with cls._lock:
+            cls._indexes[key] = (ref, index)
+        return index
+
+    @classmethod
+    def _discard(cls, key: int, ref: weakref.ref) -> None:
+        """Remove the index of a collected CWL object.
+
+        :param key: The identifier of the object.
+        :param ref: The reference to the object, the entry is kept if it was replaced meanwhile.
+        """
+        with cls._lock:
+            entry = cls._indexes.get(key)
+            if entry is not None and entry[0] is ref:
+                del cls._indexes[key]
+
+    @classmethod
+    def invalidate(cls, cwl_object: Any) -> None:
+        """Forget the index of a CWL object whose hints changed.
+
+        :param cwl_object: The CWL object.
+        """
+        with cls._lock:
+            cls._indexes.pop(id(cwl_object), None)
+
+    def get(self, hint_class: str) -> list[dict[str, Any]]:
+        """Get the data of the hints of a class.
+
+        :param hint_class: The class of the hints, e.g. "dirac:Scheduling".
+        :return: The data of each hint of the class, without the class, in their order.
+        """
+        return self._data.get(hint_class, [])
+
+    def descriptor(self, model: type[M], hint_class: str) -> M:
+        """Get the descriptor of the hints of a class, folding them in their order.
+
+        :param model: The model of the descriptor.
+        :param hint_class: The class of the hints.
+        :return: A deep copy of the descriptor, built once: callers may modify its dicts and lists.
+        """
+        descriptor = self._descriptors.get(model)
+        if descriptor is None:
+            # The later hints replace the fields of the earlier ones, and are merged into their dicts
+            # as ExecutionHooksHint.model_copy does; like model_copy, the hints are not validated
+            merged_hint_data: dict[str, Any] = {}
+            for hint_data in self.get(hint_class):
+                for key, value in hint_data.items():
+                    if isinstance(value, dict) and isinstance(merged_hint_data.get(key), dict):
+                        value = merged_hint_data[key] | value
+                    merged_hint_data[key] = value
+            descriptor = model().model_copy(update=merged_hint_data)
+            self._descriptors[model] = descriptor
+        return descriptor.model_copy(deep=True)
+
+
 class Hint(ABC):
     """Base class for all DIRAC hints and requirements models."""
 
@@ -179,20 +289,16 @@ class SchedulingHint(BaseModel, Hint):
 
     priority: int = Field(default=10, description="Job priority (higher values = higher priority)")
 
+    max_parallel_jobs: Optional[int] = Field(
+        default=None, ge=1, description="Maximum number of jobs of the transformation running at the same time"
+    )
+
     sites: Optional[List[str]] = Field(default=None, description="Candidate execution sites")
 
     @classmethod
     def from_cwl(cls: type[T], cwl_object: Any) -> T:
         """Extract task descriptor from CWL hints."""
-        descriptor = cls()
-
-        hints = getattr(cwl_object, "hints", []) or []
-        for hint in hints:
-            if hint.get("class") == "dirac:Scheduling":
-                hint_data = {k: v for k, v in hint.items() if k != "class"}
-                descriptor = descriptor.model_copy(update=hint_data)
-
-        return descriptor
+        return HintIndex.of(cwl_object).descriptor(cls, "dirac:Scheduling")
 
 
 class ExecutionHooksHint(BaseModel, Hint):
@@ -325,17 +431,13 @@ class ExecutionHooksHint(BaseModel, Hint):
     @classmethod
     def from_cwl(cls, cwl_object: Any) -> Self:
         """Extract metadata descriptor from CWL object using Hint interface."""
-        descriptor = cls()
-        hints = getattr(cwl_object, "hints", []) or []
-        for hint in hints:
-            if hint.get("class") == "dirac:ExecutionHooks":
-                hint_data = {k: v for k, v in hint.items() if k != "class"}
-                descriptor = descriptor.model_copy(update=hint_data)
-        return descriptor
+        return HintIndex.of(cwl_object).descriptor(cls, "dirac:ExecutionHooks")
 
     @classmethod
     def update_cwl(cls, cwl_object: Any, descriptor: Self) -> None:
         """Update CWL object with metadata descriptor."""
+        # The hints are changed in place
+        HintIndex.invalidate(cwl_object)
         hints = getattr(cwl_object, "hints", []) or []
         for hint in hints:
             if hint.get("class") == "dirac:ExecutionHooks":
@@ -347,10 +449,32 @@ class ExecutionHooksHint(BaseModel, Hint):
         cwl_object.hints = hints
 
 
+class GroupWeight(StrEnum):
+    """Quantity balanced between the jobs of a transformation when grouping its input files."""
+
+    FILES = "files"
+    SIZE = "size"
+    EVENTS = "events"
+    CPU = "cpu"
+
+
 class TransformationExecutionHooksHint(ExecutionHooksHint):
     """Extended data manager for transformations."""
 
     group_size: Optional[int] = Field(default=None, description="Number of input files per job")
+    group_weight: GroupWeight = Field(
+        default=GroupWeight.FILES,
+        description="Quantity balanced between the jobs: number of files, size (bytes), "
+        "number of events or estimated CPU time (seconds)",
+    )
+    group_target: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="Total weight of the input files of each job, group_size remaining the maximum number of files",
+    )
+    cpu_per_event: Optional[float] = Field(
+        default=None, gt=0, description="Estimated CPU time per event (seconds), for the cpu group weight"
+    )
     input_data: Optional[Dict[str, List[str]]] = Field(
         default=None, description="Static input file lists, keyed by CWL input parameter name"
     )
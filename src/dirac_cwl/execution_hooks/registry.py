@@ -9,27 +9,31 @@ from __future__ import annotations
 
 import logging
 from importlib.metadata import entry_points
-from typing import Any, Dict, List, Optional, Type
+from typing import Any, List, Tuple, Type
+
+from dirac_cwl.core.entry_points import EntryPointsCache, EntryPointsPluginRegistry
 
 from .core import ExecutionHooksBasePlugin, ExecutionHooksHint
 
 logger = logging.getLogger(__name__)
 
 
-class ExecutionHooksPluginRegistry:
+class ExecutionHooksPluginRegistry(EntryPointsPluginRegistry[ExecutionHooksBasePlugin]):
     """
     Registry for execution hooks plugins.
 
     This class manages the registration and retrieval of execution hooks plugins
     for different steps in CWL workflows. Plugins are registered using
     entry points and can be retrieved by name.
+
+    :param lazy_discovery: Discover the plugins of the entry points on the first
+        use of the registry, instead of waiting for discover_plugins to be called.
+    :param cache: Cache of the plugins discovered: the plugins it holds are only
+        imported when they are looked up.
     """
 
-    def __init__(self) -> None:
-        """Initialize the execution hooks registry."""
-        self._plugins: Dict[str, Type[ExecutionHooksBasePlugin]] = {}
-        self._vo_plugins: Dict[str, Dict[str, Type[ExecutionHooksBasePlugin]]] = {}
-        self._plugin_info: Dict[str, Dict[str, Any]] = {}
+    ENTRY_POINT_GROUP = "dirac_cwl.execution_hooks"
+    PLUGIN_BASE = ExecutionHooksBasePlugin
 
     def register_plugin(self, plugin_class: Type[ExecutionHooksBasePlugin], override: bool = False) -> None:
         """Register a metadata plugin.
@@ -42,17 +46,14 @@ class ExecutionHooksPluginRegistry:
         """
         if not issubclass(plugin_class, ExecutionHooksBasePlugin):
             raise ValueError(f"Plugin {plugin_class} must inherit from ExecutionHooksBasePlugin")
+        # The plugins of the entry points come first, as when they are discovered on import
+        self._ensure_discovered()
 
         plugin_key = plugin_class.name()
         vo = plugin_class.vo
 
         # Check for conflicts
-        if plugin_key in self._plugins and not override:
-            existing = self._plugins[plugin_key]
-            raise ValueError(
-                f"Plugin '{plugin_key}' already registered by {existing.__module__}.{existing.__name__}. "
-                f"Use override=True to replace."
-            )
+        self._check_override(plugin_key, override)
 
         # Register globally
         self._plugins[plugin_key] = plugin_class
@@ -73,24 +74,6 @@ class ExecutionHooksPluginRegistry:
             vo_suffix,
         )
 
-    def get_plugin(self, plugin_key: str, vo: Optional[str] = None) -> Optional[Type[ExecutionHooksBasePlugin]]:
-        """Get a registered plugin.
-
-        :param plugin_key: The plugin identifier.
-        :type plugin_key: str
-        :param vo: Virtual Organization namespace to search first, by default None.
-        :type vo: Optional[str]
-        :return: The plugin class or None if not found.
-        :rtype: Optional[Type[ExecutionHooksBasePlugin]]
-        """
-        # Try VO-specific first if specified
-        if vo and vo in self._vo_plugins:
-            if plugin_key in self._vo_plugins[vo]:
-                return self._vo_plugins[vo][plugin_key]
-
-        # Fall back to global registry
-        return self._plugins.get(plugin_key)
-
     def instantiate_plugin(self, descriptor: ExecutionHooksHint, **kwargs: Any) -> ExecutionHooksBasePlugin:
         """Instantiate a metadata plugin from a descriptor.
 
@@ -122,50 +105,31 @@ class ExecutionHooksPluginRegistry:
         except Exception as e:
             raise ValueError(f"Failed to instantiate plugin '{descriptor.hook_plugin}': {e}") from e
 
-    def list_plugins(self, vo: Optional[str] = None) -> List[str]:
-        """List available plugins.
+    def _scan_entry_points(self) -> Tuple[List[Type[ExecutionHooksBasePlugin]], bool]:
+        """Import the plugins of the entry points defined in the pyproject.toml.
 
-        :param vo: Filter by Virtual Organization, by default None.
-        :type vo: Optional[str]
-        :return: List of available plugin keys.
-        :rtype: List[str]
+        :return: The plugin classes, and whether all the entry points were plugins.
+        :rtype: Tuple[List[Type[ExecutionHooksBasePlugin]], bool]
         """
-        if vo and vo in self._vo_plugins:
-            return list(self._vo_plugins[vo].keys())
-        return list(self._plugins.keys())
-
-    def list_virtual_organizations(self) -> List[str]:
-        """List available Virtual Organizations."""
-        return list(self._vo_plugins.keys())
-
-    def get_plugin_info(self, plugin_key: str) -> Optional[Dict[str, Any]]:
-        """Get detailed information about a plugin."""
-        return self._plugin_info.get(plugin_key)
-
-    def discover_plugins(self) -> int:
-        """Discover and register plugins from the entry points defined in the pyproject.toml.
-
-        :return: Number of plugins discovered and registered.
-        :rtype: int
-        """
-        entrypoints = entry_points(group="dirac_cwl.execution_hooks")
-        discovered = 0
+        entrypoints = entry_points(group=self.ENTRY_POINT_GROUP)
+        plugin_classes: List[Type[ExecutionHooksBasePlugin]] = []
+        complete = True
         for hook_name in entrypoints.names:
             try:
                 hook = entrypoints[hook_name].load()
                 if issubclass(hook, ExecutionHooksBasePlugin):
-                    self.register_plugin(hook)
-                    discovered += 1
+                    plugin_classes.append(hook)
                 else:
+                    complete = False
                     logger.warning(
                         "Tried to discover execution hook with name '%s' that does not inherit %s",
                         hook_name,
                         ExecutionHooksBasePlugin.__name__,
                     )
             except Exception as e:
+                complete = False
                 logger.error("Failed to import plugin %s: %s", hook_name, e)
-
-        return discovered
+        return plugin_classes, complete
 
     def validate_descriptor(self, descriptor: ExecutionHooksHint) -> List[str]:
         """Validate a data manager against registered plugins.
@@ -194,8 +158,8 @@ class ExecutionHooksPluginRegistry:
         return errors
 
 
-# Global registry instance
-_registry = ExecutionHooksPluginRegistry()
+# Global registry instance, discovering the plugins when first used
+_registry = ExecutionHooksPluginRegistry(lazy_discovery=True, cache=EntryPointsCache.load())
 
 
 # Public API
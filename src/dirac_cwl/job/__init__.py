@@ -1,9 +1,12 @@
 """CLI interface to run a workflow as a job."""
 
+import asyncio
 import logging
 import os
 import random
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
 from typing import Any
 
@@ -19,8 +22,11 @@ from rich import print_json
 from rich.console import Console
 from schema_salad.exceptions import ValidationException
 
+from dirac_cwl.core.utility import available_cores
+from dirac_cwl.job.job_batch import JobBatch
 from dirac_cwl.job.submission_clients import (
     DIRACSubmissionClient,
+    JobIsolation,
     PrototypeSubmissionClient,
     SubmissionClient,
 )
@@ -43,6 +49,13 @@ async def submit_job_client(
     input_files: list[str] | None = typer.Option(None, help="Paths to the CWL input files"),
     # Specific parameter for the purpose of the prototype
     local: bool | None = typer.Option(True, help="Run the job locally instead of submitting it to the router"),
+    max_parallel_jobs: int | None = typer.Option(
+        None, min=1, help="Maximum number of jobs run in parallel by the local router (default: number of cores)"
+    ),
+    isolation: JobIsolation = typer.Option(
+        JobIsolation.SUBPROCESS,
+        help="Run each local job in its own interpreter (subprocess) or in the router interpreter (in-process)",
+    ),
 ):
     """
     Correspond to the dirac-cli command to submit jobs.
@@ -52,7 +65,11 @@ async def submit_job_client(
     - Start the jobs
     """
     # Select submission strategy based on local flag
-    submission_client: SubmissionClient = PrototypeSubmissionClient() if local else DIRACSubmissionClient()
+    submission_client: SubmissionClient = (
+        PrototypeSubmissionClient(max_parallel_jobs=max_parallel_jobs, isolation=isolation)
+        if local
+        else DIRACSubmissionClient()
+    )
 
     os.environ["DIRAC_PROTO_LOCAL"] = "0"
 
@@ -121,17 +138,19 @@ def validate_jobs(job: JobSubmissionModel) -> list[JobModel]:
     """
     console.print("[blue]:information_source:[/blue] [bold]CLI:[/bold] Validating the job(s)...")
     # Initiate 1 job per parameter
+    # The task has been validated with the submission: the jobs share it as is
     jobs = []
     if not job.inputs:
         jobs.append(
-            JobModel(
+            JobModel.model_construct(
                 task=job.task,
+                input=None,
             )
         )
     else:
         for parameter in job.inputs:
             jobs.append(
-                JobModel(
+                JobModel.model_construct(
                     task=job.task,
                     input=parameter,
                 )
@@ -176,14 +195,41 @@ def prepare_input_sandbox(input_data: dict[str, Any]) -> list[Path]:
 # -----------------------------------------------------------------------------
 
 
-def submit_job_router(job: JobSubmissionModel) -> bool:
+def submit_job_router(
+    job: JobSubmissionModel,
+    max_parallel_jobs: int | None = None,
+    isolation: JobIsolation = JobIsolation.SUBPROCESS,
+) -> bool:
     """
     Execute a job using the router.
 
+    The jobs are executed concurrently through a bounded pool of workers.
+
     :param job: The task to execute
+    :param max_parallel_jobs: Maximum number of jobs running at the same time,
+        defaults to the number of cores available to the router
+    :param isolation: How the jobs are isolated from the router
 
     :return: True if the job executed successfully, False otherwise
     """
+    return all(run_jobs(job, max_parallel_jobs, isolation))
+
+
+def run_jobs(
+    job: JobSubmissionModel,
+    max_parallel_jobs: int | None = None,
+    isolation: JobIsolation = JobIsolation.SUBPROCESS,
+) -> list[bool]:
+    """
+    Execute the jobs of a submission using the router, as submit_job_router does.
+
+    :param job: The task to execute and the inputs of its jobs
+    :param max_parallel_jobs: Maximum number of jobs running at the same time,
+        defaults to the number of cores available to the router
+    :param isolation: How the jobs are isolated from the router
+
+    :return: Whether each job executed successfully, in the order of the inputs
+    """
     logger = logging.getLogger("JobRouter")
 
     os.environ["DIRAC_PROTO_LOCAL"] = "1"
@@ -191,15 +237,30 @@ def submit_job_router(job: JobSubmissionModel) -> bool:
     # Validate the jobs
     jobs = validate_jobs(job)
 
-    # Execute the job locally
-    logger.info("Executing jobs locally...")
-    results = []
-
-    for job in jobs:
-        job_id = random.randint(1000, 9999)
-        results.append(run_job(job_id, job, logger.getChild(f"job-{job_id}")))
+    # Jobs share the working directory: their identifiers must be distinct
+    job_ids = random.sample(range(1000, 1000 + max(9000, len(jobs))), len(jobs))
+    job_loggers = [logger.getChild(f"job-{job_id}") for job_id in job_ids]
+
+    # Execute the jobs locally
+    max_workers = max(1, min(max_parallel_jobs or available_cores(), len(jobs)))
+    logger.info("Executing %d job(s) locally (%s), up to %d in parallel...", len(jobs), isolation, max_workers)
+    with ExitStack() as stack:
+        # Jobs running in a subprocess share a single task document
+        batch = stack.enter_context(JobBatch(job.task)) if isolation == JobIsolation.SUBPROCESS else None
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="JobRouter") as executor:
+            results = list(
+                executor.map(
+                    run_job,
+                    job_ids,
+                    jobs,
+                    job_loggers,
+                    [isolation] * len(jobs),
+                    [batch] * len(jobs),
+                ),
+            )
 
-    return all(results)
+    logger.info("%d/%d job(s) executed successfully.", sum(results), len(results))
+    return results
 
 
 # -----------------------------------------------------------------------------
@@ -207,22 +268,89 @@ def submit_job_router(job: JobSubmissionModel) -> bool:
 # -----------------------------------------------------------------------------
 
 
-def run_job(job_id: int, job: JobModel, logger: logging.Logger) -> bool:
+def run_job(
+    job_id: int,
+    job: JobModel,
+    logger: logging.Logger,
+    isolation: JobIsolation = JobIsolation.SUBPROCESS,
+    batch: JobBatch | None = None,
+) -> bool:
+    """
+    Run a single job with the requested isolation.
+
+    :param job_id: The identifier of the job
+    :param job: The job to execute
+    :param logger: Logger instance for output
+    :param isolation: How the job is isolated from the router
+    :param batch: The open batch holding the task document of the job, if any
+
+    :return: True if the job executed successfully, False otherwise
+    """
+    if isolation == JobIsolation.IN_PROCESS:
+        return run_job_in_process(job_id, job, logger)
+    return run_job_in_subprocess(job_id, job, logger, batch)
+
+
+def run_job_in_process(job_id: int, job: JobModel, logger: logging.Logger) -> bool:
+    """
+    Run a single job by calling the job wrapper in the current interpreter.
+
+    The already parsed task is reused as is: the job wrapper only reads it.
+    The inputs are copied since the job wrapper rewrites them with local paths.
+
+    :param job_id: The identifier of the job
+    :param job: The job to execute
+    :param logger: Logger instance for output
+
+    :return: True if the job executed successfully, False otherwise
+    """
+    from dirac_cwl.job.job_wrapper import JobWrapper
+    from dirac_cwl.job.status_aggregator import get_status_aggregator
+
+    logger.info("Executing job %s in process", job_id)
+    job = JobModel.model_construct(
+        task=job.task,
+        input=job.input.model_copy(deep=True) if job.input else None,
+    )
+    try:
+        # The statuses of the jobs running in the router are sent together
+        result = asyncio.run(JobWrapper(job_id, status_aggregator=get_status_aggregator()).run_job(job))
+    except Exception:
+        logger.exception("Job %s failed", job_id)
+        return False
+
+    logger.info("Job execution completed (%s).", "success" if result else "failure")
+    return result
+
+
+def run_job_in_subprocess(
+    job_id: int,
+    job: JobModel,
+    logger: logging.Logger,
+    batch: JobBatch | None = None,
+) -> bool:
     """
     Run a single job by dumping it to JSON and executing the job_wrapper_template.py script.
 
+    The job file only references the task document of the batch.
+
+    :param job_id: The identifier of the job
     :param job: The job to execute
     :param logger: Logger instance for output
+    :param batch: The open batch holding the task document, a new one is created if not provided
 
     :return: True if the job executed successfully, False otherwise
     """
-    logger.info("Executing job locally:\n")
-    print_json(job.model_dump_json(indent=4))
+    if batch is None:
+        with JobBatch(job.task) as new_batch:
+            return run_job_in_subprocess(job_id, job, logger, new_batch)
+
+    # A single record, so that the inputs of concurrent jobs do not interleave
+    inputs = job.input.model_dump_json(indent=4) if job.input else "{}"
+    logger.info("Executing job %s locally (task %s):\n%s", job_id, batch.task_digest, inputs)
 
-    # Dump job to a JSON file
-    job_json_path = Path(f"job_{job_id}.json")
-    with open(job_json_path, "w") as f:
-        f.write(job.model_dump_json())
+    # Dump the job reference to a JSON file
+    job_json_path = batch.write_job(f"job_{job_id}", job.input)
 
     # Run the job_wrapper_template.py script via bash command
     result = subprocess.run(
@@ -240,11 +368,11 @@ def run_job(job_id: int, job: JobModel, logger: logging.Logger) -> bool:
     # Clean up the job JSON file
     job_json_path.unlink()
 
-    # Log output
+    # Log output: one record per stream so that concurrent jobs do not interleave
     if result.stdout:
         logger.info("STDOUT %s:\n%s", job_id, result.stdout)
     if result.stderr:
         logger.error("STDERR %s:\n%s", job_id, result.stderr)
 
-    logger.info("Job execution completed.")
+    logger.info("Job execution completed (exit code %s).", result.returncode)
     return result.returncode == 0
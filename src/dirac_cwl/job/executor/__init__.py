@@ -11,6 +11,6 @@ from ._mypyc_compat import install as _install_pure_python_hook
 
 _install_pure_python_hook()
 
-from .executor import DiracExecutor, dirac_executor_factory  # noqa: E402
+from .executor import DiracExecutor, DiracParallelExecutor, dirac_executor_factory  # noqa: E402
 
-__all__ = ["DiracExecutor", "dirac_executor_factory"]
+__all__ = ["DiracExecutor", "DiracParallelExecutor", "dirac_executor_factory"]
@@ -400,6 +400,27 @@ def main(
     debug: bool = typer.Option(False, help="Enable debug logging"),
     verbose: bool = typer.Option(False, help="Enable verbose logging"),
     parallel: bool = typer.Option(False, help="Run jobs in parallel"),
+    max_cores: float = typer.Option(
+        None,
+        "--max-cores",
+        help="Number of cores shared by the jobs run in parallel (default: the cores available to the process)",
+    ),
+    max_ram: int = typer.Option(
+        None,
+        "--max-ram",
+        help="RAM in MiB shared by the jobs run in parallel (default: half of the available memory)",
+    ),
+    local_se: list[str] = typer.Option(
+        [],
+        "--local-se",
+        help="Storage element of the site, whose replicas are preferred. May be provided multiple times.",
+    ),
+    replica_protocol: list[str] = typer.Option(
+        [],
+        "--replica-protocol",
+        help="Protocol of the replicas to read, by order of preference (default: file, root, xroot, https, http). "
+        "May be provided multiple times.",
+    ),
     version: bool = typer.Option(
         None,
         "--version",
@@ -483,10 +504,27 @@ def main(
         from cwltool.context import LoadingContext
         from cwltool.main import main as cwltool_main
 
-        from . import DiracExecutor
+        from dirac_cwl.core.throughput import SEThroughput
+
+        from . import DiracExecutor, DiracParallelExecutor
+        from .replica_policy import DEFAULT_PROTOCOLS, LocalityReplicaPolicy
         from .tool import dirac_make_tool
 
-        dirac_executor = DiracExecutor(global_map_path=actual_replica_map)
+        replica_policy = LocalityReplicaPolicy(
+            local_ses=local_se,
+            protocols=replica_protocol or DEFAULT_PROTOCOLS,
+            throughput=SEThroughput.load(),
+        )
+        dirac_executor: DiracExecutor | DiracParallelExecutor
+        if parallel:
+            dirac_executor = DiracParallelExecutor(
+                global_map_path=actual_replica_map,
+                max_cores=max_cores,
+                max_ram=max_ram,
+                replica_policy=replica_policy,
+            )
+        else:
+            dirac_executor = DiracExecutor(global_map_path=actual_replica_map, replica_policy=replica_policy)
 
         # Display execution info
         console.print()
@@ -522,6 +560,11 @@ def main(
         console.print(table)
         console.print()
         console.print("[green]✓[/green] Using DIRAC executor with replica map management")
+        if isinstance(dirac_executor, DiracParallelExecutor):
+            console.print(
+                f"[green]✓[/green] Running jobs in parallel on up to [cyan]{dirac_executor.max_cores:g}[/cyan] core(s)"
+                f" and [cyan]{dirac_executor.max_ram}[/cyan] MiB"
+            )
 
         if actual_replica_map:
             console.print(f"[green]✓[/green] Global replica map: [cyan]{actual_replica_map}[/cyan]")
@@ -605,7 +648,7 @@ def main(
 
             if dirac_executor.global_map:
                 try:
-                    final_replica_map_path.write_text(dirac_executor.global_map.model_dump_json(indent=2))
+                    final_replica_map_path.write_text(dirac_executor.global_map.model_dump_json())
                     results_table.add_row("Final replica map:", f"[cyan]{final_replica_map_path}[/cyan]")
                     results_table.add_row(
                         "Replica map entries:",
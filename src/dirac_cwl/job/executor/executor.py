@@ -1,51 +1,66 @@
 """Custom executor for DIRAC CWL workflows with replica map management."""
 
 import functools
+import itertools
 import logging
-from collections.abc import MutableMapping
+import threading
+from collections.abc import Iterable, MutableMapping
 from pathlib import Path
 from typing import cast
 
 from cwltool.context import RuntimeContext
 from cwltool.errors import WorkflowException
-from cwltool.executors import SingleJobExecutor
+from cwltool.executors import MultithreadedJobExecutor, SingleJobExecutor
 from cwltool.job import CommandLineJob
 from cwltool.process import Process
 from cwltool.stdfsaccess import StdFsAccess
-from cwltool.utils import CWLOutputType
+from cwltool.utils import CWLOutputType, JobsType
 from cwltool.workflow_job import WorkflowJob
 from diracx.core.models.replica_map import ReplicaMap
 
+from dirac_cwl.core.utility import available_cores
+
 from .fs_access import DiracReplicaMapFsAccess
+from .lfn_resolver import LFNResolver
+from .replica_map_delta import delta_path_for, read_deltas
+from .replica_policy import LocalityReplicaPolicy, ReplicaPolicy
 
 logger = logging.getLogger("dirac-cwl-run")
 
 
-class DiracExecutor(SingleJobExecutor):
-    """Custom executor that handles replica map management between steps.
+class ReplicaMapManagerMixin:
+    """Replica map management shared by the DIRAC executors.
 
-    This executor overrides run_jobs() to intercept each CommandLineJob execution
-    and manage replica maps before and after the job runs.
+    Before a CommandLineJob runs, the entries of the global replica map it needs
+    are written to its output directory. Once it completes, the entries it added
+    or modified are merged back into the global replica map. Both operations are
+    thread safe, so that jobs can run concurrently.
     """
 
-    def __init__(self, global_map_path: Path | None = None):
-        """Initialize executor with optional global replica map path."""
-        super().__init__()
+    global_map_path: Path | None
+    global_map: ReplicaMap | None
+
+    def _init_replica_map_management(self, global_map_path: Path | None, replica_policy: ReplicaPolicy | None):
+        """Initialize the replica map management.
+
+        Args:
+            global_map_path: Path to the global replica map JSON file
+            replica_policy: Ranking of the replicas read by the steps
+        """
         self.global_map_path = global_map_path
-        self.global_map: ReplicaMap | None = None
+        self.global_map = None
+        self.replica_policy = replica_policy or LocalityReplicaPolicy()
+        self.lfn_resolver: LFNResolver | None = None
+        # (mtime, size) of the step replica maps as written, by output directory
+        self._step_map_stats: dict[str, tuple[int, int]] = {}
+        # Protects the global replica map and the step replica map stats
+        self._replica_map_lock = threading.RLock()
 
-    def run_jobs(
-        self,
-        process: Process,
-        job_order_object: MutableMapping[str, CWLOutputType | None],
-        logger_arg: logging.Logger,
-        runtime_context: RuntimeContext,
-    ) -> None:
-        """Override run_jobs to intercept each job execution.
+    def _setup_replica_map(self, runtime_context: RuntimeContext):
+        """Load the global replica map and make it available to the tools.
 
-        This method is called once at the top level and iterates through ALL jobs
-        including nested CommandLineTools within subworkflows. The generator pattern
-        flattens the workflow hierarchy so we see every CommandLineJob here.
+        Args:
+            runtime_context: Runtime context of the workflow
         """
         # Load replica map once at the start
         if self.global_map is None:
@@ -56,61 +71,34 @@ class DiracExecutor(SingleJobExecutor):
                 self.global_map = ReplicaMap(root={})
                 logger.debug("Initialized empty replica map")
 
+        # The LFN resolutions are shared by the filesystem access and the path mappers
+        if self.lfn_resolver is None or self.lfn_resolver.replica_map is not self.global_map:
+            self.lfn_resolver = LFNResolver(self.global_map, self.replica_policy)
+
         # Set up custom filesystem access that can resolve LFNs via replica map
         # we create a partial function that binds the replica map to our custom
         # fs access class
         runtime_context.make_fs_access = cast(
             type[StdFsAccess],
-            functools.partial(DiracReplicaMapFsAccess, replica_map=self.global_map),
+            functools.partial(DiracReplicaMapFsAccess, resolver=self.lfn_resolver),
         )
 
         # Store the replica map on the runtime context so DiracCommandLineTool
         # can pass it to DiracPathMapper in make_path_mapper()
         runtime_context.replica_map = self.global_map  # type: ignore[attr-defined]
-
-        # Get job iterator - this yields ALL jobs including nested ones
-        jobiter = process.job(job_order_object, self.output_callback, runtime_context)
-
-        try:
-            for job in jobiter:
-                if job is not None:
-                    # Standard setup from SingleJobExecutor.run_jobs
-                    if runtime_context.builder is not None and hasattr(job, "builder"):
-                        job.builder = runtime_context.builder
-                    if job.outdir is not None:
-                        self.output_dirs.add(job.outdir)
-
-                    # Validation mode (from SingleJobExecutor.run_jobs)
-                    if runtime_context.validate_only is True:
-                        if isinstance(job, WorkflowJob):
-                            name = job.tool.lc.filename
-                        else:
-                            name = getattr(job, "name", str(job))
-                        print(
-                            f"{name} is valid CWL. No errors detected in the inputs.",
-                            file=runtime_context.validate_stdout,
-                        )
-                        return
-
-                    # CUSTOM: Intercept CommandLineJob to manage replica maps
-                    if isinstance(job, CommandLineJob):
-                        # job_name = getattr(job, "name", "unknown")
-                        self._prepare_job_replica_map(job, runtime_context)
-
-                    # Execute the job
-                    job.run(runtime_context)
-
-                    # CUSTOM: Update replica map after CommandLineJob completes
-                    if isinstance(job, CommandLineJob):
-                        self._update_replica_map_from_job(job, runtime_context)
-                else:
-                    logger.error("Workflow cannot make any more progress.")
-                    break
-        except WorkflowException:
-            raise
-        except Exception as err:
-            logger.exception("Got workflow error")
-            raise WorkflowException(str(err)) from err
+        runtime_context.lfn_resolver = self.lfn_resolver  # type: ignore[attr-defined]
+
+    def _log_resolver_stats(self):
+        """Log the counters of the LFN resolutions."""
+        if self.lfn_resolver is not None:
+            stats = self.lfn_resolver.stats
+            logger.debug(
+                "LFN resolutions: %d hit(s), %d miss(es), %d entries, %d invalidation(s)",
+                stats.hits,
+                stats.misses,
+                stats.entries,
+                stats.version,
+            )
 
     def _prepare_job_replica_map(self, job: CommandLineJob, runtime_context: RuntimeContext):
         """Prepare replica map for a specific CommandLineJob.
@@ -127,13 +115,26 @@ class DiracExecutor(SingleJobExecutor):
         step_lfns = self._extract_lfns_from_inputs(job_inputs)
 
         # Filter global map for this step's inputs
+        # Look up each input in the global map rather than scanning the global map:
+        # the cost depends on the number of inputs of the step, not on the size of the map
         if step_lfns and self.global_map:
-            step_replica_map = ReplicaMap(
-                root={lfn: entry for lfn, entry in self.global_map.root.items() if lfn in step_lfns}
-            )
+            global_entries = self.global_map.root
+            # The entries have been validated with the global map
+            with self._replica_map_lock:
+                step_replica_map = ReplicaMap.model_construct(
+                    root={lfn: global_entries[lfn] for lfn in step_lfns if lfn in global_entries}
+                )
+            # List the best replicas first, the applications try them in order
+            for lfn, entry in step_replica_map.root.items():
+                if len(entry.replicas) > 1:
+                    step_replica_map.root[lfn] = entry.model_copy(
+                        update={"replicas": self.replica_policy.rank(entry.replicas)}
+                    )
             found = len(step_replica_map.root)
             if found > 0:
                 logger.info("%s: Found %d input files in replica map", job_name, found)
+                if found < len(step_lfns):
+                    logger.warning("%s: %d input file(s) not found in replica map", job_name, len(step_lfns) - found)
             else:
                 logger.warning("%s: Expected input files not found in replica map: %s", job_name, step_lfns)
                 step_replica_map = ReplicaMap(root={})
@@ -147,7 +148,11 @@ class DiracExecutor(SingleJobExecutor):
         # Write step replica map to job's output directory
         if job.outdir:
             step_replica_map_path = Path(job.outdir) / "replica_map.json"
-            step_replica_map_path.write_text(step_replica_map.model_dump_json(indent=2))
+            step_replica_map_path.write_text(step_replica_map.model_dump_json())
+            delta_path_for(step_replica_map_path).unlink(missing_ok=True)
+            stat = step_replica_map_path.stat()
+            with self._replica_map_lock:
+                self._step_map_stats[job.outdir] = (stat.st_mtime_ns, stat.st_size)
         else:
             logger.warning("%s: Job has no output directory, cannot write replica map", job_name)
 
@@ -157,6 +162,10 @@ class DiracExecutor(SingleJobExecutor):
         After a job completes, the application may have added new LFNs
         to the step replica map. Merge those back into the global map.
 
+        The changes recorded in the delta file of the step replica map are
+        applied directly. The step replica map itself is only compared with
+        the global map if the application rewrote it.
+
         Args:
             job: The completed CommandLineJob
             runtime_context: Runtime context containing execution settings
@@ -168,47 +177,79 @@ class DiracExecutor(SingleJobExecutor):
             return
 
         step_replica_map_path = Path(job.outdir) / "replica_map.json"
-        if not step_replica_map_path.exists():
-            logger.debug("%s: No step replica map found, skipping update", job_name)
+        delta_path = delta_path_for(step_replica_map_path)
+        with self._replica_map_lock:
+            written_stat = self._step_map_stats.pop(job.outdir, None)
+        rewritten = False
+        if step_replica_map_path.exists():
+            stat = step_replica_map_path.stat()
+            rewritten = written_stat != (stat.st_mtime_ns, stat.st_size)
+        if not rewritten and not delta_path.exists():
+            logger.debug("%s: No change to the step replica map, skipping update", job_name)
             return
 
         try:
-            step_replica_map = ReplicaMap.model_validate_json(step_replica_map_path.read_text())
-
-            if self.global_map is None:
-                self.global_map = ReplicaMap(root={})
-
-            # Only register files that are NOT already in the global map
-            # This filters out input files that were copied to the step replica map
-            new_entries = []
-            updated_entries = []
-            for lfn, entry in step_replica_map.root.items():
-                if lfn in self.global_map.root:
-                    # File already exists - check if it was updated
-                    existing_entry = self.global_map.root[lfn]
-                    # If the entry has changed (e.g., new replicas added), update it
-                    if existing_entry != entry:
-                        self.global_map.root[lfn] = entry
-                        updated_entries.append(lfn)
-                        logger.debug("%s: Updated replica map entry for %s", job_name, lfn)
-                    # Otherwise skip - this is an input file that hasn't changed
-                else:
-                    # This is a new file (output from this job)
-                    self.global_map.root[lfn] = entry
-                    new_entries.append(lfn)
+            # Parse the changes before taking the lock
+            changes: list[tuple[str, ReplicaMap.MapEntry]] = []
+            if rewritten:
+                changes.extend(ReplicaMap.model_validate_json(step_replica_map_path.read_text()).root.items())
+            if delta_path.exists():
+                changes.extend(read_deltas(delta_path))
+
+            new_entries: list[str] = []
+            updated_entries: list[str] = []
+            with self._replica_map_lock:
+                if self.global_map is None:
+                    self.global_map = ReplicaMap(root={})
+                self._merge_entries(changes, new_entries, updated_entries, job_name)
+                total = len(self.global_map.root)
 
             if new_entries:
                 logger.info(
                     "%s: Registered %d new output file(s) (replica map total: %d)",
                     job_name,
                     len(new_entries),
-                    len(self.global_map.root),
+                    total,
                 )
             if updated_entries:
                 logger.info("%s: Updated %d existing replica map entries", job_name, len(updated_entries))
         except Exception as e:
             logger.exception("%s: Failed to update replica map - %s", job_name, e)
 
+    def _merge_entries(
+        self,
+        entries: Iterable[tuple[str, ReplicaMap.MapEntry]],
+        new_entries: list[str],
+        updated_entries: list[str],
+        job_name: str,
+    ):
+        """Merge entries of a step replica map into the global map.
+
+        Must be called with the replica map lock held.
+
+        Args:
+            entries: The LFNs and entries to merge
+            new_entries: Receives the LFNs added to the global map
+            updated_entries: Receives the LFNs whose entry changed
+            job_name: Name of the job, for logging
+        """
+        assert self.global_map is not None
+        global_entries = self.global_map.root
+        for lfn, entry in entries:
+            existing_entry = global_entries.get(lfn)
+            if existing_entry is None:
+                # This is a new file (output from this job)
+                global_entries[lfn] = entry
+                new_entries.append(lfn)
+            elif existing_entry != entry:
+                # File already exists but was updated (e.g., new replicas added)
+                global_entries[lfn] = entry
+                updated_entries.append(lfn)
+                logger.debug("%s: Updated replica map entry for %s", job_name, lfn)
+            # Otherwise skip - this is an input file that hasn't changed
+        if self.lfn_resolver is not None and (new_entries or updated_entries):
+            self.lfn_resolver.invalidate(itertools.chain(new_entries, updated_entries))
+
     def _extract_lfns_from_inputs(self, job_order: MutableMapping[str, CWLOutputType | None]) -> list[str]:
         """Extract LFN paths from job inputs.
 
@@ -219,9 +260,11 @@ class DiracExecutor(SingleJobExecutor):
             job_order: Job input dictionary
 
         Returns:
-            List of LFN paths found in the inputs (with LFN: prefix stripped)
+            List of LFN paths found in the inputs (with LFN: prefix stripped),
+            without duplicates and in the order of the inputs
         """
-        lfns = []
+        # Insertion-ordered set
+        lfns: dict[str, None] = {}
 
         def extract_recursive(obj):
             if isinstance(obj, dict):
@@ -232,9 +275,7 @@ class DiracExecutor(SingleJobExecutor):
                         value = obj.get(field, "")
                         if value.startswith("LFN:"):
                             # Strip LFN: prefix for replica map lookup
-                            lfn = value[4:]
-                            if lfn not in lfns:
-                                lfns.append(lfn)
+                            lfns[value[4:]] = None
                             break
                 else:
                     for value in obj.values():
@@ -244,21 +285,182 @@ class DiracExecutor(SingleJobExecutor):
                     extract_recursive(item)
 
         extract_recursive(job_order)
-        return lfns
+        return list(lfns)
+
+
+class DiracExecutor(ReplicaMapManagerMixin, SingleJobExecutor):
+    """Custom executor that handles replica map management between steps.
+
+    This executor overrides run_jobs() to intercept each CommandLineJob execution
+    and manage replica maps before and after the job runs.
+    """
+
+    def __init__(self, global_map_path: Path | None = None, replica_policy: ReplicaPolicy | None = None):
+        """Initialize executor with optional global replica map path and replica ranking policy."""
+        super().__init__()
+        self._init_replica_map_management(global_map_path, replica_policy)
+
+    def run_jobs(
+        self,
+        process: Process,
+        job_order_object: MutableMapping[str, CWLOutputType | None],
+        logger_arg: logging.Logger,
+        runtime_context: RuntimeContext,
+    ) -> None:
+        """Override run_jobs to intercept each job execution.
+
+        This method is called once at the top level and iterates through ALL jobs
+        including nested CommandLineTools within subworkflows. The generator pattern
+        flattens the workflow hierarchy so we see every CommandLineJob here.
+        """
+        self._setup_replica_map(runtime_context)
+
+        # Get job iterator - this yields ALL jobs including nested ones
+        jobiter = process.job(job_order_object, self.output_callback, runtime_context)
+
+        try:
+            for job in jobiter:
+                if job is not None:
+                    # Standard setup from SingleJobExecutor.run_jobs
+                    if runtime_context.builder is not None and hasattr(job, "builder"):
+                        job.builder = runtime_context.builder
+                    if job.outdir is not None:
+                        self.output_dirs.add(job.outdir)
+
+                    # Validation mode (from SingleJobExecutor.run_jobs)
+                    if runtime_context.validate_only is True:
+                        if isinstance(job, WorkflowJob):
+                            name = job.tool.lc.filename
+                        else:
+                            name = getattr(job, "name", str(job))
+                        print(
+                            f"{name} is valid CWL. No errors detected in the inputs.",
+                            file=runtime_context.validate_stdout,
+                        )
+                        return
+
+                    # CUSTOM: Intercept CommandLineJob to manage replica maps
+                    if isinstance(job, CommandLineJob):
+                        # job_name = getattr(job, "name", "unknown")
+                        self._prepare_job_replica_map(job, runtime_context)
+
+                    # Execute the job
+                    job.run(runtime_context)
 
+                    # CUSTOM: Update replica map after CommandLineJob completes
+                    if isinstance(job, CommandLineJob):
+                        self._update_replica_map_from_job(job, runtime_context)
+                else:
+                    logger.error("Workflow cannot make any more progress.")
+                    break
+        except WorkflowException:
+            raise
+        except Exception as err:
+            logger.exception("Got workflow error")
+            raise WorkflowException(str(err)) from err
+        finally:
+            self._log_resolver_stats()
+
+
+class DiracParallelExecutor(ReplicaMapManagerMixin, MultithreadedJobExecutor):
+    """Executor running independent jobs concurrently, with replica map management.
+
+    Jobs are started as soon as their inputs are available and enough cores and RAM
+    are free to satisfy their ResourceRequirement. The step replica map of a job is
+    prepared when the job is scheduled, and its changes are merged into the global
+    map before the steps depending on its outputs can be scheduled.
+    """
+
+    def __init__(
+        self,
+        global_map_path: Path | None = None,
+        max_cores: float | None = None,
+        max_ram: int | None = None,
+        replica_policy: ReplicaPolicy | None = None,
+    ):
+        """Initialize executor.
+
+        Args:
+            global_map_path: Path to master replica map JSON file
+            max_cores: Number of cores shared by the jobs (default: the cores the process may use)
+            max_ram: RAM shared by the jobs, in MiB (default: half of the available memory)
+            replica_policy: Ranking of the replicas read by the steps
+        """
+        super().__init__()
+        self._init_replica_map_management(global_map_path, replica_policy)
+        # Respect the CPU affinity of the process, e.g. the slot of a batch system
+        self.max_cores = float(max_cores or available_cores())
+        if max_ram:
+            self.max_ram = max_ram
 
-def dirac_executor_factory(global_map_path: Path | None = None):
+    def run_jobs(
+        self,
+        process: Process,
+        job_order_object: MutableMapping[str, CWLOutputType | None],
+        logger_arg: logging.Logger,
+        runtime_context: RuntimeContext,
+    ) -> None:
+        """Set up the replica map, then run the jobs concurrently."""
+        self._setup_replica_map(runtime_context)
+        logger.info("Running jobs in parallel on up to %g core(s) and %d MiB", self.max_cores, self.max_ram)
+        try:
+            super().run_jobs(process, job_order_object, logger_arg, runtime_context)
+        finally:
+            self._log_resolver_stats()
+
+    def run_job(self, job: JobsType | None, runtime_context: RuntimeContext) -> None:
+        """Prepare the replica map of a CommandLineJob before scheduling it.
+
+        Called with the workflow evaluation lock held, once the inputs of the job are
+        available: the global map already contains the outputs of the upstream steps.
+        """
+        if isinstance(job, CommandLineJob):
+            self._prepare_job_replica_map(job, runtime_context)
+            self._merge_replica_map_on_completion(job, runtime_context)
+        super().run_job(job, runtime_context)
+
+    def _merge_replica_map_on_completion(self, job: CommandLineJob, runtime_context: RuntimeContext):
+        """Merge the changes of the job into the global map before reporting its outputs.
+
+        cwltool reports the outputs of the job from its thread, which may make
+        downstream steps runnable: the replica map must be up to date by then.
+
+        Args:
+            job: The CommandLineJob about to be scheduled
+            runtime_context: Runtime context containing execution settings
+        """
+        output_callback = job.output_callback
+
+        def merge_then_report(outputs, process_status):
+            self._update_replica_map_from_job(job, runtime_context)
+            if output_callback is not None:
+                output_callback(outputs, process_status)
+
+        job.output_callback = merge_then_report
+
+
+def dirac_executor_factory(
+    global_map_path: Path | None = None,
+    parallel: bool = False,
+    replica_policy: ReplicaPolicy | None = None,
+):
     """Create a DiracExecutor with configuration.
 
     Args:
         global_map_path: Path to master replica map JSON file
+        parallel: Run independent jobs concurrently with a DiracParallelExecutor
+        replica_policy: Ranking of the replicas read by the steps
 
     Returns:
         Executor function compatible with cwltool
     """
 
     def executor(process, job_order, runtime_context, logger_arg):
-        dirac_exec = DiracExecutor(global_map_path)
+        dirac_exec: DiracExecutor | DiracParallelExecutor
+        if parallel:
+            dirac_exec = DiracParallelExecutor(global_map_path, replica_policy=replica_policy)
+        else:
+            dirac_exec = DiracExecutor(global_map_path, replica_policy=replica_policy)
         return dirac_exec(process, job_order, runtime_context, logger_arg)
 
     return executor
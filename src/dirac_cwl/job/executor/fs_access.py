@@ -6,6 +6,8 @@ from typing import Any
 from cwltool.stdfsaccess import StdFsAccess
 from diracx.core.models.replica_map import ReplicaMap
 
+from .lfn_resolver import LFNResolver
+
 
 class DiracReplicaMapFsAccess(StdFsAccess):
     """Use replica map to resolve LFNs to physical file locations.
@@ -14,15 +16,24 @@ class DiracReplicaMapFsAccess(StdFsAccess):
     in the replica map and using the physical file path (PFN) instead.
     """
 
-    def __init__(self, basedir: str, replica_map: ReplicaMap | None = None):
+    def __init__(
+        self,
+        basedir: str,
+        replica_map: ReplicaMap | None = None,
+        resolver: LFNResolver | None = None,
+    ):
         """Initialize with optional replica map.
 
         Args:
             basedir: Base directory for relative paths
             replica_map: ReplicaMap instance for LFN resolution
+            resolver: Resolution table shared with the other users of the replica map
         """
         super().__init__(basedir)
-        self.replica_map = replica_map or ReplicaMap(root={})
+        if resolver is None:
+            resolver = LFNResolver(replica_map or ReplicaMap(root={}))
+        self.resolver = resolver
+        self.replica_map = resolver.replica_map
 
     def _resolve_lfn(self, lfn: str) -> tuple[str, bool]:
         """Resolve an LFN to a physical file path using the replica map.
@@ -35,20 +46,8 @@ class DiracReplicaMapFsAccess(StdFsAccess):
             - physical path/URL: PFN if found in replica map, original path otherwise
             - is_remote: True if the PFN is a remote URL (root://, etc.), False for local files
         """
-        # Remove LFN: prefix if present
-        clean_lfn = lfn.removeprefix("LFN:")
-
-        # Look up in replica map
-        if clean_lfn in self.replica_map.root:
-            entry = self.replica_map[clean_lfn]
-            if entry.replicas:
-                url = entry.replicas[0].url
-                is_remote = url.scheme != "file"
-                # For local files, return just the path; for remote, return full URL
-                return str(url) if is_remote else (url.path or ""), is_remote
-
-        # If not in replica map, return the original LFN (assume local)
-        return clean_lfn, False
+        resolved = self.resolver.resolve(lfn)
+        return resolved.path, resolved.is_remote
 
     def _abs(self, p: str) -> str:
         """Resolve path, handling LFNs via replica map.
@@ -81,12 +80,21 @@ class DiracReplicaMapFsAccess(StdFsAccess):
         return super().glob(pattern)
 
     def open(self, fn: str, mode: str) -> Any:
-        """Open file with LFN resolution."""
+        """Open file with LFN resolution, falling back to the other local replicas."""
         if fn.startswith("LFN:"):
-            fn, is_remote = self._resolve_lfn(fn)
-            # Remote files can't be opened directly - let it fail with clear error
-            if is_remote:
-                raise ValueError(f"Cannot open remote file: {fn}")
+            lfn = fn
+            resolved = self.resolver.resolve(lfn)
+            while True:
+                # Remote files can't be opened directly - let it fail with clear error
+                if resolved.is_remote:
+                    raise ValueError(f"Cannot open remote file: {resolved.path}")
+                try:
+                    return super().open(resolved.path, mode)
+                except OSError:
+                    if not resolved.found or not resolved.alternatives:
+                        raise
+                    assert resolved.pfn is not None
+                    resolved = self.resolver.mark_failed(lfn, resolved.pfn)
         return super().open(fn, mode)
 
     def exists(self, fn: str) -> bool:
@@ -118,13 +126,11 @@ class DiracReplicaMapFsAccess(StdFsAccess):
         """Get file size, with LFN resolution."""
         if fn.startswith("LFN:"):
             # Try to get size from replica map first
-            clean_lfn = fn.removeprefix("LFN:")
-            if clean_lfn in self.replica_map.root:
-                entry = self.replica_map[clean_lfn]
-                if entry.size_bytes is not None:
-                    return entry.size_bytes
+            resolved = self.resolver.resolve(fn)
+            if resolved.size is not None:
+                return resolved.size
             # Fall back to checking the physical file (if local)
-            fn, is_remote = self._resolve_lfn(fn)
+            fn, is_remote = resolved.path, resolved.is_remote
             if is_remote:
                 # Can't check remote file size - return 0 or raise error
                 raise ValueError(f"Cannot determine size of remote file: {fn}")
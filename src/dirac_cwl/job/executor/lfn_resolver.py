@@ -0,0 +1,166 @@
+"""Memoized resolution of LFNs through a replica map.
+
+While staging the inputs of a step, cwltool resolves the same LFNs many times,
+through the filesystem access (``exists``, ``isfile``, ``size``...) and the path
+mapper. The resolution of each LFN is computed once and shared by both, until the
+replica map entry of the LFN changes.
+
+The replica of each LFN is chosen by a replica policy, skipping the replicas that
+failed and the local replicas missing on disk.
+"""
+
+import os
+import threading
+from collections.abc import Iterable
+from typing import NamedTuple
+
+from diracx.core.models.replica_map import ReplicaMap
+
+from .replica_policy import LocalityReplicaPolicy, ReplicaPolicy
+
+
+class ResolvedLFN(NamedTuple):
+    """Resolution of an LFN through the replica map."""
+
+    #: Whether the LFN is in the replica map with at least one replica
+    found: bool
+    #: URL of the chosen replica, None if not found
+    pfn: str | None
+    #: Local path for local replicas, URL for remote replicas, the LFN itself if not found
+    path: str
+    #: Whether the replica is a remote URL (root://, https://...)
+    is_remote: bool
+    #: Size of the file in the replica map
+    size: int | None
+    #: Checksum in CWL format (e.g. ``adler32$788c5caa``)
+    checksum: str | None
+    #: URLs of the other replicas, best first
+    alternatives: tuple[str, ...] = ()
+
+
+class ResolverStats(NamedTuple):
+    """Counters of an LFN resolver."""
+
+    hits: int
+    misses: int
+    #: Number of resolutions in the table
+    entries: int
+    #: Number of times the table was invalidated
+    version: int
+
+
+class LFNResolver:
+    """Resolution table of the LFNs of a replica map, filled on first use.
+
+    The table follows the replica map in place: the LFNs whose entries change must
+    be invalidated, see invalidate().
+    """
+
+    def __init__(self, replica_map: ReplicaMap, policy: ReplicaPolicy | None = None):
+        """Initialize an empty resolution table.
+
+        Args:
+            replica_map: The replica map resolving the LFNs
+            policy: Ranking of the replicas (default: local files first, then by protocol)
+        """
+        self.replica_map = replica_map
+        self.policy = policy or LocalityReplicaPolicy()
+        # URLs of the replicas that could not be read
+        self._failed: set[str] = set()
+        self._table: dict[str, ResolvedLFN] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._version = 0
+
+    def resolve(self, lfn: str) -> ResolvedLFN:
+        """Resolve an LFN.
+
+        Args:
+            lfn: Logical file name (with or without LFN: prefix)
+
+        Returns:
+            The resolution of the LFN
+        """
+        clean_lfn = lfn.removeprefix("LFN:")
+        resolved = self._table.get(clean_lfn)
+        if resolved is not None:
+            with self._lock:
+                self._hits += 1
+            return resolved
+
+        version = self._version
+        resolved = self._compute(clean_lfn)
+        with self._lock:
+            self._misses += 1
+            # Do not keep a resolution computed before an invalidation
+            if version == self._version:
+                self._table[clean_lfn] = resolved
+        return resolved
+
+    def _compute(self, lfn: str) -> ResolvedLFN:
+        """Resolve an LFN without the table.
+
+        Args:
+            lfn: Logical file name (without LFN: prefix)
+
+        Returns:
+            The resolution of the LFN
+        """
+        entry = self.replica_map.root.get(lfn)
+        if entry is None or not entry.replicas:
+            return ResolvedLFN(False, None, lfn, False, entry.size_bytes if entry else None, None)
+
+        ranked = self.policy.rank(entry.replicas)
+        # Fall back to the next replica if the best one failed or is missing locally
+        usable = [
+            replica
+            for replica in ranked
+            if str(replica.url) not in self._failed
+            and (replica.url.scheme != "file" or os.path.exists(replica.url.path or ""))
+        ]
+        chosen = (usable or ranked)[0]
+        url = chosen.url
+        pfn = str(url)
+        is_remote = url.scheme != "file"
+        checksum = None
+        if entry.checksum and entry.checksum.adler32:
+            checksum = f"adler32${entry.checksum.adler32}"
+        # For local files, use just the path; for remote, the full URL
+        path = pfn if is_remote else (url.path or "")
+        alternatives = tuple(str(replica.url) for replica in usable if replica is not chosen)
+        return ResolvedLFN(True, pfn, path, is_remote, entry.size_bytes, checksum, alternatives)
+
+    def mark_failed(self, lfn: str, pfn: str) -> ResolvedLFN:
+        """Stop using a replica that could not be read, and resolve the LFN again.
+
+        Args:
+            lfn: Logical file name (with or without LFN: prefix)
+            pfn: URL of the replica that failed
+
+        Returns:
+            The resolution of the LFN to its next replica
+        """
+        with self._lock:
+            self._failed.add(pfn)
+        self.invalidate([lfn.removeprefix("LFN:")])
+        return self.resolve(lfn)
+
+    def invalidate(self, lfns: Iterable[str] | None = None) -> None:
+        """Forget the resolution of LFNs whose replica map entries changed.
+
+        Args:
+            lfns: The LFNs (without LFN: prefix) to forget, all of them if None
+        """
+        with self._lock:
+            if lfns is None:
+                self._table.clear()
+            else:
+                for lfn in lfns:
+                    self._table.pop(lfn, None)
+            self._version += 1
+
+    @property
+    def stats(self) -> ResolverStats:
+        """Counters of the resolver."""
+        return ResolverStats(self._hits, self._misses, len(self._table), self._version)
@@ -1,5 +1,6 @@
 """Custom PathMapper for handling DIRAC LFNs in CWL workflows."""
 
+import itertools
 import logging
 from typing import List, Optional, cast
 
@@ -7,6 +8,8 @@ from cwltool.pathmapper import MapperEnt, PathMapper
 from cwltool.utils import CWLObjectType
 from diracx.core.models.replica_map import ReplicaMap
 
+from .lfn_resolver import LFNResolver
+
 logger = logging.getLogger("dirac-cwl-run")
 
 
@@ -24,6 +27,7 @@ class DiracPathMapper(PathMapper):
         stagedir: str,
         separateDirs: bool = True,
         replica_map: Optional[ReplicaMap] = None,
+        resolver: Optional[LFNResolver] = None,
     ):
         """Initialize with optional replica map.
 
@@ -33,8 +37,12 @@ class DiracPathMapper(PathMapper):
             stagedir: Staging directory for files
             separateDirs: Whether to separate directories
             replica_map: ReplicaMap for LFN resolution
+            resolver: Resolution table shared with the other users of the replica map
         """
-        self.replica_map = replica_map or ReplicaMap(root={})
+        if resolver is None:
+            resolver = LFNResolver(replica_map or ReplicaMap(root={}))
+        self.resolver = resolver
+        self.replica_map = resolver.replica_map
         super().__init__(referenced_files, basedir, stagedir, separateDirs)
 
     def visit(
@@ -66,54 +74,51 @@ class DiracPathMapper(PathMapper):
             logger.debug("DiracPathMapper.visit: Found LFN=%s", lfn)
 
             # Look up in replica map to resolve to PFN
-            if lfn in self.replica_map.root:
-                entry = self.replica_map[lfn]
-                if entry.replicas:
-                    # Get the first replica's URL (can be file:// or root:// or https:// etc.)
-                    pfn = str(entry.replicas[0].url)
-                    logger.info("DiracPathMapper: Resolved LFN:%s -> %s", lfn, pfn)
-
-                    # For LFN-resolved files, we don't download or stage them
-                    # We just map the original LFN location to the PFN
-                    # The PFN will be used directly by the tools (via xrootd, https, etc.)
-                    # Set both resolved and target to the PFN so CWL uses it directly
-                    self._pathmap[tgt] = MapperEnt(
-                        resolved=pfn,  # The physical URL/path
-                        target=pfn,  # Use the PFN directly (not a staging path)
-                        type="File",
-                        staged=False,  # We're not staging/copying this file
-                    )
-
-                    # Add size from replica map if available
-                    if entry.size_bytes is not None and "size" not in obj:
-                        obj["size"] = entry.size_bytes
-
-                    # Store checksum if available
-                    if entry.checksum and "checksum" not in obj:
-                        if entry.checksum.adler32:
-                            # Format: "adler32$788c5caa"
-                            obj["checksum"] = f"adler32${entry.checksum.adler32}"
-
-                    # Handle secondary files if any
-                    self.visitlisting(
-                        cast(List[CWLObjectType], obj.get("secondaryFiles", [])),
-                        stagedir,
-                        basedir,
-                        copy=copy,
-                        staged=staged,
-                    )
-
-                    # Don't call parent visit - we've handled this completely
-                    return
-
-                else:
-                    logger.warning("DiracPathMapper: LFN %s in replica map but has no replicas", lfn)
+            resolved = self.resolver.resolve(lfn)
+            if resolved.found and resolved.pfn is not None:
+                # URL of the replica chosen by the replica policy (can be file:// or root:// or https:// etc.)
+                pfn = resolved.pfn
+                logger.info("DiracPathMapper: Resolved LFN:%s -> %s", lfn, pfn)
+
+                # For LFN-resolved files, we don't download or stage them
+                # We just map the original LFN location to the PFN
+                # The PFN will be used directly by the tools (via xrootd, https, etc.)
+                # Set both resolved and target to the PFN so CWL uses it directly
+                self._pathmap[tgt] = MapperEnt(
+                    resolved=pfn,  # The physical URL/path
+                    target=pfn,  # Use the PFN directly (not a staging path)
+                    type="File",
+                    staged=False,  # We're not staging/copying this file
+                )
+
+                # Add size from replica map if available
+                if resolved.size is not None and "size" not in obj:
+                    obj["size"] = resolved.size
+
+                # Store checksum if available (format: "adler32$788c5caa")
+                if resolved.checksum and "checksum" not in obj:
+                    obj["checksum"] = resolved.checksum
+
+                # Handle secondary files if any
+                self.visitlisting(
+                    cast(List[CWLObjectType], obj.get("secondaryFiles", [])),
+                    stagedir,
+                    basedir,
+                    copy=copy,
+                    staged=staged,
+                )
+
+                # Don't call parent visit - we've handled this completely
+                return
+
+            elif lfn in self.replica_map.root:
+                logger.warning("DiracPathMapper: LFN %s in replica map but has no replicas", lfn)
             else:
                 # LFN not in replica map - this will likely fail later
                 logger.error(
                     "DiracPathMapper: LFN %s NOT in replica map! Available LFNs: %s",
                     lfn,
-                    list(self.replica_map.root.keys())[:5],
+                    list(itertools.islice(self.replica_map.root, 5)),
                 )
 
         # Handle remote protocol URLs (root://, https://, etc.) that should not be staged
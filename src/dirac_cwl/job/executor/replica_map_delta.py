@@ -0,0 +1,68 @@
+"""Incremental changes of a step replica map.
+
+Instead of rewriting the whole replica map of a step, the applications append the
+entries they add or modify to a JSON Lines file next to it. Each line holds one
+entry, in compact JSON::
+
+    {"lfn":"LFN:/lhcb/...","entry":{"replicas":[...],"checksum":{...},"size_bytes":123}}
+
+Later lines override earlier lines for the same LFN, so the executor can merge the
+changes of a step into the global replica map in O(number of changes).
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Iterator, Mapping
+
+from diracx.core.models.replica_map import ReplicaMap
+
+logger = logging.getLogger(__name__)
+
+#: Suffix of the delta file of a replica map (``replica_map.json`` -> ``replica_map.delta.jsonl``)
+DELTA_SUFFIX = ".delta.jsonl"
+
+
+def delta_path_for(replica_map_path: Path) -> Path:
+    """Get the path of the delta file of a replica map.
+
+    :param replica_map_path: Path to the replica map.
+    :return: Path to its delta file, in the same directory.
+    """
+    return replica_map_path.with_suffix(DELTA_SUFFIX)
+
+
+def append_deltas(delta_path: Path, entries: Mapping[str, ReplicaMap.MapEntry]) -> None:
+    """Append new or modified entries to a delta file.
+
+    :param delta_path: Path to the delta file, created if needed.
+    :param entries: The entries to record, by LFN.
+    """
+    if not entries:
+        return
+    lines = [f'{{"lfn":{json.dumps(lfn)},"entry":{entry.model_dump_json()}}}\n' for lfn, entry in entries.items()]
+    # A single write, so that concurrent writers do not interleave their lines
+    with open(delta_path, "a") as f:
+        f.write("".join(lines))
+
+
+def read_deltas(delta_path: Path) -> Iterator[tuple[str, ReplicaMap.MapEntry]]:
+    """Read the entries recorded in a delta file, in order.
+
+    The ``LFN:`` prefix of the LFNs is removed, as in a validated replica map.
+    A truncated last line (e.g. the writer was killed) is skipped.
+
+    :param delta_path: Path to the delta file.
+    :return: An iterator over the LFNs and their entries.
+    """
+    with open(delta_path) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Skipping malformed line %d of %s", line_number, delta_path)
+                continue
+            # Replica maps key the LFNs without prefix
+            yield record["lfn"].removeprefix("LFN:"), ReplicaMap.MapEntry.model_validate(record["entry"])
@@ -0,0 +1,78 @@
+"""Ranking of the replicas of a file, to choose the one read by a step."""
+
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Sequence
+
+from diracx.core.models.replica_map import ReplicaMap
+
+from dirac_cwl.core.throughput import SEThroughput
+
+#: Protocols preferred by default, best first
+DEFAULT_PROTOCOLS = ("file", "root", "xroot", "https", "http")
+
+
+class ReplicaPolicy(ABC):
+    """Order the replicas of a file by preference."""
+
+    @abstractmethod
+    def rank(self, replicas: Sequence[ReplicaMap.MapEntry.Replica]) -> list[ReplicaMap.MapEntry.Replica]:
+        """Rank the replicas of a file.
+
+        Args:
+            replicas: The replicas of the file, as listed in the replica map
+
+        Returns:
+            The replicas, best first
+        """
+
+
+class ReplicaMapOrderPolicy(ReplicaPolicy):
+    """Keep the order of the replica map."""
+
+    def rank(self, replicas: Sequence[ReplicaMap.MapEntry.Replica]) -> list[ReplicaMap.MapEntry.Replica]:
+        """Rank the replicas in the order of the replica map."""
+        return list(replicas)
+
+
+class LocalityReplicaPolicy(ReplicaPolicy):
+    """Prefer local files, then the storage elements of the site, then the preferred protocols.
+
+    Replicas equal on these criteria are ranked by decreasing measured throughput of their
+    storage element, then in the order of the replica map.
+    """
+
+    def __init__(
+        self,
+        local_ses: Iterable[str] = (),
+        protocols: Sequence[str] = DEFAULT_PROTOCOLS,
+        throughput: SEThroughput | None = None,
+    ):
+        """Initialize the policy.
+
+        Args:
+            local_ses: Storage elements of the site the jobs run at
+            protocols: URL schemes by order of preference, the other ones come last
+            throughput: Measured throughput of the storage elements
+        """
+        self.local_ses = frozenset(local_ses)
+        self.protocols = {scheme: rank for rank, scheme in enumerate(protocols)}
+        self.throughput = throughput
+
+    def rank(self, replicas: Sequence[ReplicaMap.MapEntry.Replica]) -> list[ReplicaMap.MapEntry.Replica]:
+        """Rank the replicas by locality, protocol and throughput."""
+        if len(replicas) < 2:
+            return list(replicas)
+
+        def key(indexed: tuple[int, ReplicaMap.MapEntry.Replica]):
+            index, replica = indexed
+            scheme = replica.url.scheme
+            throughput = (self.throughput.get(replica.se) if self.throughput else None) or 0.0
+            return (
+                scheme != "file",
+                replica.se not in self.local_ses,
+                self.protocols.get(scheme, len(self.protocols)),
+                -throughput,
+                index,
+            )
+
+        return [replica for _, replica in sorted(enumerate(replicas), key=key)]
@@ -11,14 +11,20 @@ import os
 import subprocess
 import sys
 import tarfile
+import tempfile
 import time
 import xml.etree.ElementTree as ET
 import zipfile
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator
+from xml.sax.saxutils import quoteattr
 
 import requests
 from diracx.core.models.replica_map import ReplicaMap
 
+from dirac_cwl.job.executor.replica_map_delta import append_deltas, delta_path_for, read_deltas
+
 # Configure logger to use UTC time
 logger = logging.getLogger("run_lbprodrun")
 logging.Formatter.converter = time.gmtime  # Use UTC for all log timestamps
@@ -99,19 +105,33 @@ def analyse_xml_summary(xml_path: Path) -> bool:
         return False
 
 
+POOL_XML_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="no" ?>\n'
+    "<!-- Edited By POOL -->\n"
+    '<!DOCTYPE POOLFILECATALOG SYSTEM "InMemory">\n'
+    "<POOLFILECATALOG>\n"
+)
+POOL_XML_FOOTER = "</POOLFILECATALOG>\n"
+
+
 def generate_pool_xml_catalog_from_replica_map(replica_map_path: Path, output_path: Path) -> None:
     """Generate a pool_xml_catalog.xml from a replica_map.json.
 
     The pool XML catalog format is used by LHCb applications to locate input files.
     This function converts our JSON replica map format to the XML format.
 
+    The catalog is written entry by entry, without building the XML document in memory.
+    The replica map itself is still loaded whole, json has no incremental parser.
+
     :param replica_map_path: Path to replica_map.json
     :param output_path: Path where pool_xml_catalog.xml will be written
     """
     # Load replica map
-    replica_map = ReplicaMap.model_validate_json(replica_map_path.read_text())
+    # The replica map is written by the executor from validated entries, skip the model validation
+    with open(replica_map_path, "rb") as f:
+        entries: dict = json.load(f)
 
-    # Create XML structure
+    # Write the XML structure
     # <?xml version="1.0" encoding="UTF-8" standalone="no" ?>
     # <!-- Edited By POOL -->
     # <!DOCTYPE POOLFILECATALOG SYSTEM "InMemory">
@@ -125,45 +145,77 @@ def generate_pool_xml_catalog_from_replica_map(replica_map_path: Path, output_pa
     #     </logical>
     #   </File>
     # </POOLFILECATALOG>
-
-    root = ET.Element("POOLFILECATALOG")
-
-    for lfn, entry in replica_map.root.items():
-        # Create File element with GUID as ID
-        file_elem = ET.SubElement(root, "File")
-        if entry.checksum and entry.checksum.guid:
-            file_elem.set("ID", entry.checksum.guid)
-
-        # Physical section
-        physical = ET.SubElement(file_elem, "physical")
-        for replica in entry.replicas:
-            pfn = ET.SubElement(physical, "pfn")
-            # Convert URL to string - handle both str and URL types
-            pfn_url = str(replica.url)
-            pfn.set("name", pfn_url)
-            # Optionally add filetype if we can determine it from LFN
-            # For now, we'll leave it empty or add based on extension
+    with _atomic_text_writer(output_path) as out:
+        out.write(POOL_XML_HEADER)
+        for lfn, entry in entries.items():
+            lfn = lfn.removeprefix("LFN:")
+            guid = (entry.get("checksum") or {}).get("guid")
             filetype = _guess_filetype(lfn)
-            if filetype:
-                pfn.set("filetype", filetype)
+            filetype_attr = f" filetype={quoteattr(filetype)}" if filetype else ""
+
+            out.write(f"  <File ID={quoteattr(guid)}>\n" if guid else "  <File>\n")
+            out.write("    <physical>\n")
+            for replica in entry.get("replicas", []):
+                out.write(f"      <pfn name={quoteattr(str(replica['url']))}{filetype_attr} />\n")
+            out.write("    </physical>\n")
+            out.write(f"    <logical>\n      <lfn name={quoteattr(lfn)} />\n    </logical>\n  </File>\n")
+        out.write(POOL_XML_FOOTER)
+
+    logger.info("Generated pool_xml_catalog.xml with %d entries", len(entries))
+
+
+@contextmanager
+def _atomic_text_writer(path: Path):
+    """Write a text file through a temporary file, renamed once complete.
+
+    :param path: Path of the file to write
+    :return: The buffered text file to write to
+    """
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="UTF-8", dir=path.parent, prefix=f".{path.name}.", delete=False, buffering=1024 * 1024
+    ) as out:
+        try:
+            yield out
+        except BaseException:
+            out.close()
+            os.unlink(out.name)
+            raise
+    os.replace(out.name, path)
+
 
-        # Logical section
-        logical = ET.SubElement(file_elem, "logical")
-        lfn_elem = ET.SubElement(logical, "lfn")
-        lfn_elem.set("name", lfn)
+def _iter_pool_xml_children(pool_xml_path: Path) -> Iterator[ET.Element]:
+    """Iterate over the children of the root of a pool XML catalog, in a single streaming pass.
 
-    # Create the tree and write with proper formatting
-    tree = ET.ElementTree(root)
-    ET.indent(tree, space="  ")  # Pretty print with 2-space indentation
+    Each element is cleared once the next one is read, so the memory used does not
+    depend on the size of the catalog.
+
+    :param pool_xml_path: Path to the pool XML catalog file
+    :return: An iterator over the File, META... elements, in the order of the catalog
+    """
+    context = ET.iterparse(pool_xml_path, events=("start", "end"))
+    root = None
+    depth = 0
+    for event, elem in context:
+        if event == "start":
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            yield elem
+            # Drop the processed element from the tree
+            assert root is not None
+            root.clear()
 
-    # Write XML with declaration
-    with open(output_path, "wb") as f:
-        f.write(b'<?xml version="1.0" encoding="UTF-8" standalone="no" ?>\n')
-        f.write(b"<!-- Edited By POOL -->\n")
-        f.write(b'<!DOCTYPE POOLFILECATALOG SYSTEM "InMemory">\n')
-        tree.write(f, encoding="UTF-8", xml_declaration=False)
 
-    logger.info("Generated pool_xml_catalog.xml with %d entries", len(replica_map.root))
+def _iter_pool_xml_files(pool_xml_path: Path) -> Iterator[ET.Element]:
+    """Iterate over the File elements of a pool XML catalog, in a single streaming pass.
+
+    :param pool_xml_path: Path to the pool XML catalog file
+    :return: An iterator over the File elements
+    """
+    return (elem for elem in _iter_pool_xml_children(pool_xml_path) if elem.tag == "File")
 
 
 def _guess_filetype(lfn: str) -> str:
@@ -207,6 +259,9 @@ def add_output_files_to_replica_map(
     We need to scan for output files and add them to the replica map
     with generated LFNs.
 
+    The new entries are appended to the delta file of the replica map
+    rather than rewriting the whole map.
+
     :param replica_map_path: Path to replica_map.json
     :param output_prefix: Output file prefix (e.g., "00012345_00006789_1")
     :param output_types: List of output file types (e.g., ["SIM", "DIGI"])
@@ -214,13 +269,7 @@ def add_output_files_to_replica_map(
     """
     import uuid
 
-    # Load existing replica map
-    if replica_map_path.exists():
-        replica_map = ReplicaMap.model_validate_json(replica_map_path.read_text())
-    else:
-        replica_map = ReplicaMap(root={})
-
-    new_count = 0
+    new_entries: dict[str, ReplicaMap.MapEntry] = {}
 
     # For each output type, find matching files
     for output_type in output_types:
@@ -263,98 +312,141 @@ def add_output_files_to_replica_map(
 
             entry = ReplicaMap.MapEntry(replicas=[replica], checksum=checksum, size_bytes=file_size)
 
-            replica_map.root[lfn] = entry
-            new_count += 1
+            new_entries[lfn] = entry
             logger.info("  Added to replica map: %s -> %s (%d bytes)", lfn, local_file.name, file_size)
 
-    # Write updated replica map
-    replica_map_path.write_text(replica_map.model_dump_json(indent=2))
+    # Record the new entries
+    append_deltas(delta_path_for(replica_map_path), new_entries)
 
-    if new_count > 0:
-        logger.info("Added %d output file(s) to replica map", new_count)
+    if new_entries:
+        logger.info("Added %d output file(s) to replica map", len(new_entries))
     else:
         logger.info("No output files found to add to replica map")
 
 
-def update_pool_xml_to_absolute_paths(pool_xml_path: Path) -> int:
+def _absolute_pfn(pfn_name: str) -> str | None:
+    """Get the absolute path of a relative PFN.
+
+    :param pfn_name: The PFN, as written by the application
+    :return: The absolute path if the PFN is a relative path to an existing file, None otherwise
+    """
+    # Remote replicas are URLs
+    if "://" in pfn_name:
+        return None
+    pfn_path = Path(pfn_name)
+    # Only update if it's not already an absolute path
+    if pfn_path.is_absolute():
+        return None
+    # Check if file exists in current directory
+    if not pfn_path.exists():
+        logger.warning("File %s not found in current directory", pfn_name)
+        return None
+    return pfn_path.resolve().as_posix()
+
+
+def update_pool_xml_to_absolute_paths(pool_xml_path: Path, replica_map_path: Path | None = None) -> int:
     """Update all relative PFN paths in pool XML catalog to absolute paths.
 
+    The catalog is rewritten in a single streaming pass, keeping its other elements. When a replica map is
+    given, it is updated from the catalog in the same pass, as done by
+    update_replica_map_from_pool_xml. A failure to update the replica map is
+    logged, the catalog is still updated.
+
     :param pool_xml_path: Path to the pool XML catalog file
+    :param replica_map_path: Path to replica_map.json to update, if any
     :return: Number of PFNs updated
     """
     if not pool_xml_path.exists():
         logger.warning("Pool XML file %s does not exist.", pool_xml_path)
         return 0
 
-    # Parse the XML
-    tree = ET.parse(pool_xml_path)
-    root = tree.getroot()
+    replica_map_updater = None
+    if replica_map_path is not None:
+        try:
+            replica_map_updater = _ReplicaMapUpdater(replica_map_path)
+        except Exception as e:
+            logger.warning("Failed to update replica map: %s", e)
 
     updated_count = 0
-    # Find all pfn elements
-    for pfn_elem in root.findall(".//pfn"):
-        pfn_name = pfn_elem.get("name")
-        if pfn_name:
-            pfn_path = Path(pfn_name)
-            # Only update if it's not already an absolute path
-            if not pfn_path.is_absolute():
-                # Check if file exists in current directory
-                if pfn_path.exists():
-                    absolute_path = pfn_path.resolve().as_posix()
-                    pfn_elem.set("name", absolute_path)
-                    logger.info("  Updated: %s -> %s", pfn_name, absolute_path)
-                    updated_count += 1
-                else:
-                    logger.warning("File %s not found in current directory", pfn_name)
-
-    # Write back the updated XML
-    # Preserve the XML declaration and DOCTYPE
-    tree.write(pool_xml_path, encoding="UTF-8", xml_declaration=True)
-
-    # Fix the DOCTYPE manually since ElementTree doesn't preserve it well
-    with open(pool_xml_path, "r") as f:
-        content = f.read()
-
-    # Add the POOLFILECATALOG comment and DOCTYPE after the XML declaration
-    if "<!DOCTYPE POOLFILECATALOG" not in content:
-        content = content.replace(
-            "<?xml version='1.0' encoding='UTF-8'?>",
-            '<?xml version="1.0" encoding="UTF-8" standalone="no" ?>\n'
-            "<!-- Edited By POOL -->\n"
-            '<!DOCTYPE POOLFILECATALOG SYSTEM "InMemory">',
-        )
-        with open(pool_xml_path, "w") as f:
-            f.write(content)
+    with _atomic_text_writer(pool_xml_path) as out:
+        out.write(POOL_XML_HEADER)
+        for elem in _iter_pool_xml_children(pool_xml_path):
+            # The other elements of the catalog (e.g. META) are copied as is
+            if elem.tag == "File":
+                for pfn_elem in elem.iter("pfn"):
+                    pfn_name = pfn_elem.get("name")
+                    if pfn_name and (absolute_path := _absolute_pfn(pfn_name)):
+                        pfn_elem.set("name", absolute_path)
+                        logger.info("  Updated: %s -> %s", pfn_name, absolute_path)
+                        updated_count += 1
+
+                if replica_map_updater is not None:
+                    try:
+                        replica_map_updater.add(elem)
+                    except Exception as e:
+                        logger.warning("Failed to update replica map: %s", e)
+                        replica_map_updater = None
+
+            elem.tail = None
+            out.write("  ")
+            out.write(ET.tostring(elem, encoding="unicode"))
+            out.write("\n")
+        out.write(POOL_XML_FOOTER)
 
     logger.info("Pool XML file updated. %d PFN(s) converted to absolute paths.", updated_count)
+    if replica_map_updater is not None:
+        try:
+            replica_map_updater.save()
+        except Exception as e:
+            logger.warning("Failed to update replica map: %s", e)
     return updated_count
 
 
-def update_replica_map_from_pool_xml(pool_xml_path: Path, replica_map_path: Path) -> None:
-    """Update replica map with changes from pool_xml_catalog.xml.
+class _ReplicaMapUpdater:
+    """Accumulate the changes of the File elements of a pool XML catalog to a replica map.
 
-    This function reads the pool XML catalog (which may have been updated by lb-prod-run)
-    and propagates any changes back to the replica map JSON file. This ensures
-    new output files and their metadata are captured in the replica map.
-
-    :param pool_xml_path: Path to pool_xml_catalog.xml
     :param replica_map_path: Path to replica_map.json to update
     """
-    # Load existing replica map if it exists
-    if replica_map_path.exists():
-        replica_map = ReplicaMap.model_validate_json(replica_map_path.read_text())
-    else:
-        replica_map = ReplicaMap(root={})
 
-    # Parse pool XML catalog
-    tree = ET.parse(pool_xml_path)
-    root = tree.getroot()
+    def __init__(self, replica_map_path: Path):
+        """Load the current replica map, including the changes already recorded.
 
-    updated_count = 0
-    new_count = 0
+        The entries of the replica map are only validated when the catalog refers to them.
+        """
+        self.replica_map_path = replica_map_path
+        self._raw_entries: dict = {}
+        if replica_map_path.exists():
+            with open(replica_map_path, "rb") as f:
+                self._raw_entries = json.load(f)
+        delta_path = delta_path_for(replica_map_path)
+        self._entries: dict[str, ReplicaMap.MapEntry] = dict(read_deltas(delta_path)) if delta_path.exists() else {}
+        self.changed_entries: dict[str, ReplicaMap.MapEntry] = {}
+        self.new_count = 0
+        self.updated_count = 0
+
+    def _current(self, lfn: str) -> tuple[set[str], str | None, int | None] | None:
+        """Get the replica URLs, GUID and size of an LFN, without validating its entry.
+
+        :param lfn: The LFN, without prefix
+        :return: The replica URLs, GUID and size, None if the LFN is not in the replica map
+        """
+        if (entry := self._entries.get(lfn)) is not None:
+            guid = entry.checksum.guid if entry.checksum else None
+            return {str(r.url) for r in entry.replicas}, guid, entry.size_bytes
+        if (raw := self._raw_entries.get(lfn)) is not None:
+            guid = (raw.get("checksum") or {}).get("guid")
+            return {r["url"] for r in raw.get("replicas", [])}, guid, raw.get("size_bytes")
+        return None
 
-    # Process each File element in the XML
-    for file_elem in root.findall(".//File"):
+    def __len__(self) -> int:
+        """Get the number of entries of the replica map."""
+        return len(self._raw_entries) + sum(1 for lfn in self._entries if lfn not in self._raw_entries)
+
+    def add(self, file_elem: ET.Element) -> None:
+        """Merge a File element of the catalog into the replica map.
+
+        :param file_elem: The File element
+        """
         guid = file_elem.get("ID", "")
 
         # Extract LFN from logical section
@@ -362,9 +454,8 @@ def update_replica_map_from_pool_xml(pool_xml_path: Path, replica_map_path: Path
         lfn = lfn_elem.get("name", "") if lfn_elem is not None else None
 
         # Extract PFNs from physical section
-        pfn_elems = file_elem.findall(".//physical/pfn")
-        replicas = []
-        for pfn_elem in pfn_elems:
+        pfn_urls = []
+        for pfn_elem in file_elem.findall(".//physical/pfn"):
             pfn_url = pfn_elem.get("name", "")
             if pfn_url:
                 # Convert file:// paths or absolute paths to proper URLs
@@ -376,54 +467,83 @@ def update_replica_map_from_pool_xml(pool_xml_path: Path, replica_map_path: Path
                         # If LFN is missing, generate one from filename
                         lfn = f"{Path(pfn_url).name}"
 
-                replicas.append(ReplicaMap.MapEntry.Replica(url=pfn_url, se="DIRAC.Client.Local"))
+                pfn_urls.append(pfn_url)
 
-        if not replicas or not lfn:
-            continue
+        if not pfn_urls or not lfn:
+            return
+        # Replica maps key the LFNs without prefix
+        lfn = lfn.removeprefix("LFN:")
 
         # Get file size if the file exists locally
         file_size = None
-        for replica in replicas:
-            if str(replica.url).startswith("file://"):
-                local_path = Path(str(replica.url).replace("file://", ""))
+        for pfn_url in pfn_urls:
+            if pfn_url.startswith("file://"):
+                local_path = Path(pfn_url.replace("file://", ""))
                 if local_path.exists():
                     file_size = local_path.stat().st_size
                     break
 
         # Create or update entry in replica map
-        if lfn in replica_map.root:
-            # Update existing entry
-            entry = replica_map.root[lfn]
+        # The entries are only validated when they change
+        current = self._current(lfn)
+        if current is not None:
+            existing_urls, current_guid, current_size = current
             # Merge replicas (avoid duplicates)
-            existing_urls = {str(r.url) for r in entry.replicas}
-            for replica in replicas:
-                if str(replica.url) not in existing_urls:
-                    entry.replicas.append(replica)
-
+            new_urls = [pfn_url for pfn_url in pfn_urls if pfn_url not in existing_urls]
             # Update GUID if we have one and it's different
-            if guid:
+            guid_changed = bool(guid) and current_guid != guid
+            # Update file size if we calculated it
+            size_changed = file_size is not None and current_size != file_size
+            if not (new_urls or guid_changed or size_changed):
+                return
+
+            # Update existing entry
+            entry = self._entries.get(lfn) or ReplicaMap.MapEntry.model_validate(self._raw_entries[lfn])
+            entry.replicas.extend(ReplicaMap.MapEntry.Replica(url=url, se="DIRAC.Client.Local") for url in new_urls)
+            if guid_changed:
                 if entry.checksum is None:
                     entry.checksum = ReplicaMap.MapEntry.Checksum(guid=guid)
-                elif entry.checksum.guid != guid:
+                else:
                     entry.checksum.guid = guid
-
-            # Update file size if we calculated it
-            if file_size is not None and entry.size_bytes != file_size:
+            if size_changed:
                 entry.size_bytes = file_size
-
-            updated_count += 1
+            self.updated_count += 1
         else:
             # Create new entry
+            replicas = [ReplicaMap.MapEntry.Replica(url=url, se="DIRAC.Client.Local") for url in pfn_urls]
             checksum = ReplicaMap.MapEntry.Checksum(guid=guid) if guid else None
             entry = ReplicaMap.MapEntry(replicas=replicas, checksum=checksum, size_bytes=file_size)
-            replica_map.root[lfn] = entry
-            new_count += 1
+            self.new_count += 1
+
+        self._entries[lfn] = entry
+        self.changed_entries[lfn] = entry
+
+    def save(self) -> None:
+        """Record the changes in the delta file of the replica map."""
+        append_deltas(delta_path_for(self.replica_map_path), self.changed_entries)
+        self.changed_entries = {}
+
+        logger.info("Replica map updated: %d new entries, %d updated entries", self.new_count, self.updated_count)
+        logger.info("Total entries in replica map: %d", len(self))
+
 
-    # Write updated replica map back to file
-    replica_map_path.write_text(replica_map.model_dump_json(indent=2))
+def update_replica_map_from_pool_xml(pool_xml_path: Path, replica_map_path: Path) -> None:
+    """Update replica map with changes from pool_xml_catalog.xml.
 
-    logger.info("Replica map updated: %d new entries, %d updated entries", new_count, updated_count)
-    logger.info("Total entries in replica map: %d", len(replica_map.root))
+    This function reads the pool XML catalog (which may have been updated by lb-prod-run)
+    and propagates any changes back to the replica map. This ensures
+    new output files and their metadata are captured in the replica map.
+
+    Only the new and modified entries are written, to the delta file of the
+    replica map. The catalog is read in a single streaming pass.
+
+    :param pool_xml_path: Path to pool_xml_catalog.xml
+    :param replica_map_path: Path to replica_map.json to update
+    """
+    updater = _ReplicaMapUpdater(replica_map_path)
+    for file_elem in _iter_pool_xml_files(pool_xml_path):
+        updater.add(file_elem)
+    updater.save()
 
 
 def write_debug_script(output_prefix: str, working_dir: Path) -> None:
@@ -502,6 +622,11 @@ def main():
     parser.add_argument("--event-type", help="Event type ID for Gauss")
     parser.add_argument("--histogram", action="store_true", help="Enable histogram output")
     parser.add_argument("--interactive", action="store_true", help="Run in interactive mode")
+    parser.add_argument(
+        "--log-mirror-rate",
+        type=float,
+        help="Maximum number of output lines per second mirrored to the log (default: all, 0 to disable)",
+    )
 
     args = parser.parse_args()
 
@@ -584,6 +709,7 @@ def main():
             application_log=f"{cleaned_appname}_{args.output_prefix}.log",
             prodconf_file=config_filename,
             interactive=args.interactive,
+            log_mirror_rate=args.log_mirror_rate,
         )
     )
 
@@ -614,15 +740,12 @@ def main():
     # Update all relative PFN paths in the pool XML catalog to absolute paths
     logger.info("Updating Pool XML file...")
     catalog_path = Path(args.pool_xml_catalog)
-    update_pool_xml_to_absolute_paths(catalog_path)
-
-    # Update replica map if it was provided
+    # Update replica map if it was provided, in the same pass
+    replica_map_path = None
     if args.replica_map and catalog_path.exists():
         logger.info("Updating replica map from pool XML...")
-        try:
-            update_replica_map_from_pool_xml(catalog_path, Path(args.replica_map))
-        except Exception as e:
-            logger.warning("Failed to update replica map: %s", e)
+        replica_map_path = Path(args.replica_map)
+    update_pool_xml_to_absolute_paths(catalog_path, replica_map_path)
     sys.exit(returncode)
 
 
@@ -776,8 +899,13 @@ async def run_lbprodrun(
     application_log: str,
     prodconf_file: str,
     interactive: bool = False,
+    log_mirror_rate: float | None = None,
 ) -> tuple[int, str, str]:
-    """Run the application using lb-prod-run."""
+    """Run the application using lb-prod-run.
+
+    The output is written to application_log and mirrored to the logger, up to
+    log_mirror_rate lines per second if given.
+    """
     import os
 
     # Debug: Check if CMAKE_PREFIX_PATH is set
@@ -831,11 +959,14 @@ async def run_lbprodrun(
             if proc.stdout is None or proc.stderr is None:
                 raise RuntimeError("Process streams are None in non-interactive mode")
 
+            # Both streams share the rate of the mirror
+            mirror = LogMirror(log_mirror_rate)
             await asyncio.gather(
-                handle_output(proc.stdout, stdout_fh),
-                handle_output(proc.stderr, stderr_fh),
+                handle_output(proc.stdout, stdout_fh, mirror),
+                handle_output(proc.stderr, stderr_fh, mirror),
                 proc.wait(),
             )
+            mirror.close()
         finally:
             if stdout_fh:
                 stdout_fh.close()
@@ -845,35 +976,143 @@ async def run_lbprodrun(
         return (returncode, stdout, stderr)
 
 
-async def readlines(
+async def readline_batches(
     stream: asyncio.StreamReader,
-    chunk_size: int = 4096,
+    chunk_size: int = 65536,
     errors: str = "backslashreplace",
 ):
-    """Read lines from a stream."""
-    buffer = b""
-    while not stream.at_eof():
+    """Read the lines of a stream, in batches of the lines completed by each chunk read.
+
+    The chunks are accumulated in a single buffer that is only searched from the
+    end of the previous search and compacted once per chunk, so long lines and
+    bursts of output are split in linear time.
+    """
+    buffer = bytearray()
+    # Position from which the buffer was not searched for a newline yet
+    searched = 0
+    while True:
         chunk = await stream.read(chunk_size)
         if not chunk:
             break
         buffer += chunk
-        while b"\n" in buffer:
-            line, buffer = buffer.split(b"\n", 1)
-            yield line.decode(errors=errors)
+        lines = []
+        start = 0
+        while (end := buffer.find(b"\n", searched)) != -1:
+            lines.append(buffer[start:end].decode(errors=errors))
+            start = searched = end + 1
+        if start:
+            del buffer[:start]
+        searched = len(buffer)
+        if lines:
+            yield lines
     if buffer:
-        yield buffer.decode(errors=errors)
+        yield [buffer.decode(errors=errors)]
 
 
-async def handle_output(stream: asyncio.StreamReader, fh):
-    """Process output of lb-prod-run."""
+async def readlines(
+    stream: asyncio.StreamReader,
+    chunk_size: int = 65536,
+    errors: str = "backslashreplace",
+):
+    """Read lines from a stream."""
+    async for lines in readline_batches(stream, chunk_size, errors):
+        for line in lines:
+            yield line
+
+
+class LogMirror:
+    """Mirror the output of the application to the logger, up to a number of lines per second.
+
+    The lines over the rate are counted and reported once the rate allows it again.
+    The application log file always gets all the lines.
+
+    :param rate: Maximum number of lines per second, None for no limit, 0 to disable the mirror
+    """
+
+    def __init__(self, rate: float | None = None):
+        """Initialize the mirror with a full budget of lines."""
+        self.rate = rate
+        # Allow a line at a time for rates under one line per second
+        self._capacity = max(rate or 0.0, 1.0)
+        self._budget = self._capacity
+        self._last = time.monotonic()
+        self.suppressed = 0
+
+    def mirror(self, lines: list[str]) -> None:
+        """Log the lines allowed by the rate.
+
+        :param lines: The lines of output
+        """
+        if self.rate is None:
+            for line in lines:
+                logger.info(line.rstrip())
+            return
+        if not self.rate:
+            return
+
+        now = time.monotonic()
+        self._budget = min(self._capacity, self._budget + (now - self._last) * self.rate)
+        self._last = now
+        if self._budget < 1:
+            self.suppressed += len(lines)
+            return
+
+        self._report_suppressed()
+        allowed = min(len(lines), int(self._budget))
+        self._budget -= allowed
+        for line in lines[:allowed]:
+            logger.info(line.rstrip())
+        self.suppressed += len(lines) - allowed
+
+    def _report_suppressed(self) -> None:
+        if self.suppressed:
+            logger.info("... %d line(s) not mirrored, see the application log", self.suppressed)
+            self.suppressed = 0
+
+    def close(self) -> None:
+        """Report the lines suppressed since the last report."""
+        self._report_suppressed()
+
+
+#: Interval between flushes of the application log (seconds)
+LOG_FLUSH_INTERVAL = 1.0
+
+
+async def _flush_periodically(fh, interval: float) -> None:
+    """Flush a file at regular intervals, until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        fh.flush()
+
+
+async def handle_output(
+    stream: asyncio.StreamReader,
+    fh,
+    mirror: LogMirror | None = None,
+    flush_interval: float = LOG_FLUSH_INTERVAL,
+):
+    """Process output of lb-prod-run.
+
+    The lines are written to the application log in batches, which is flushed
+    every flush_interval seconds and when the stream ends.
+    """
+    if mirror is None:
+        mirror = LogMirror()
+    flusher = asyncio.create_task(_flush_periodically(fh, flush_interval)) if fh else None
     line_count = 0
-    async for line in readlines(stream):
-        line_count += 1
-        if line_count == 1:
-            logger.info("handle_output: first line received from subprocess")
-        logger.info(line.rstrip())
+    try:
+        async for lines in readline_batches(stream):
+            if not line_count:
+                logger.info("handle_output: first line received from subprocess")
+            line_count += len(lines)
+            mirror.mirror(lines)
+            if fh:
+                fh.write("\n".join(lines))
+                fh.write("\n")
+    finally:
+        if flusher is not None:
+            flusher.cancel()
         if fh:
-            fh.write(line + "\n")
             fh.flush()
     logger.info("handle_output: stream ended after %d lines", line_count)
 
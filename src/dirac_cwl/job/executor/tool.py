@@ -44,6 +44,7 @@ class DiracCommandLineTool(CommandLineTool):
                 stagedir,
                 separateDirs,
                 replica_map=replica_map,
+                resolver=getattr(runtimeContext, "lfn_resolver", None),
             )
         return PathMapper(reffiles, runtimeContext.basedir, stagedir, separateDirs)
 
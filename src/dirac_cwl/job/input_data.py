@@ -0,0 +1,183 @@
+"""Concurrent staging of the input data of a job.
+
+The files are downloaded in parallel through the data manager, with a limit on
+the number of concurrent transfers from each storage element and a per-file retry.
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Sequence
+
+from DIRACCommon.Core.Utilities.ReturnValues import S_ERROR, returnValueOrRaise  # type: ignore[import-untyped]
+
+from dirac_cwl.core.throughput import SEThroughput
+
+logger = logging.getLogger(__name__)
+
+#: Maximum number of concurrent transfers from a given storage element
+DEFAULT_MAX_TRANSFERS_PER_SE = 4
+#: Number of attempts to download a file before giving up
+DEFAULT_MAX_ATTEMPTS = 3
+#: Delay (in seconds) before the first retry, doubled at each attempt
+DEFAULT_RETRY_DELAY = 1.0
+
+
+class InputDataStager:
+    """Stage LFNs into a directory with bounded concurrency per storage element.
+
+    :param datamanager: DIRAC data manager used to resolve and download the files.
+    :param destination: Directory where the files are downloaded.
+    :param max_transfers_per_se: Maximum number of concurrent transfers from a storage element.
+    :param max_attempts: Number of attempts to download a file.
+    :param retry_delay: Delay before the first retry, doubled at each attempt.
+    :param progress_callback: Called with the number of staged files and the total number of files.
+    :param throughput: Throughput measures of the storage elements, updated with the transfers.
+    """
+
+    def __init__(
+        self,
+        datamanager: Any,
+        destination: Path,
+        max_transfers_per_se: int = DEFAULT_MAX_TRANSFERS_PER_SE,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        retry_delay: float = DEFAULT_RETRY_DELAY,
+        progress_callback: Callable[[int, int], None] | None = None,
+        throughput: SEThroughput | None = None,
+    ):
+        """Initialize the stager."""
+        self._datamanager = datamanager
+        self._destination = destination
+        self._max_transfers_per_se = max_transfers_per_se
+        self._max_attempts = max_attempts
+        self._retry_delay = retry_delay
+        self._progress_callback = progress_callback
+        self._throughput = throughput
+
+    def _resolve_replicas(self, lfns: Sequence[Any]) -> dict[Any, list[str]]:
+        """Get the storage elements holding an active replica of each LFN.
+
+        :param lfns: The LFNs to resolve.
+        :return: The storage elements of each LFN, an empty list when unknown.
+        """
+        replicas: dict[Any, list[str]] = {lfn: [] for lfn in lfns}
+        try:
+            res = returnValueOrRaise(self._datamanager.getActiveReplicas([str(lfn) for lfn in lfns]))
+        except Exception as e:
+            # Not fatal: the data manager will try all the replicas when downloading
+            logger.warning("Could not resolve the replicas of the input data: %s", e)
+            return replicas
+
+        for lfn in lfns:
+            replicas[lfn] = list(res["Successful"].get(str(lfn), {}))
+        return replicas
+
+    async def stage(self, lfns: Sequence[Any]) -> dict[Any, Path]:
+        """Download the LFNs into the destination directory.
+
+        The transfers start in the order of ``lfns``.
+
+        :param lfns: The LFNs to download.
+        :return: The local path of each LFN.
+        :raises RuntimeError: If some files could not be downloaded.
+        """
+        # Deduplicate while keeping the order
+        lfns = list(dict.fromkeys(lfns))
+        if not lfns:
+            return {}
+
+        replicas = await asyncio.to_thread(self._resolve_replicas, lfns)
+
+        semaphores: dict[str | None, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(self._max_transfers_per_se)
+        )
+        in_flight: dict[str | None, int] = defaultdict(int)
+        staged: dict[Any, Path] = {}
+        failed: dict[Any, str] = {}
+        total = len(lfns)
+
+        async def stage_file(lfn: Any) -> None:
+            # The data manager reports the LFNs as strings
+            key = str(lfn)
+            failed_ses: set[str | None] = set()
+            for attempt in range(self._max_attempts):
+                # Prefer the storage elements that did not fail yet, with the fewest transfers in flight,
+                # then the fastest ones
+                candidates = [se for se in replicas[lfn] if se not in failed_ses] or replicas[lfn]
+                source_se = min(
+                    candidates, key=lambda se: (in_flight[se], -self._measured_throughput(se)), default=None
+                )
+                in_flight[source_se] += 1
+                try:
+                    async with semaphores[source_se]:
+                        start = time.monotonic()
+                        res = await asyncio.to_thread(
+                            self._datamanager.getFile, [key], str(self._destination), sourceSE=source_se
+                        )
+                        elapsed = time.monotonic() - start
+                except Exception as e:
+                    res = S_ERROR(str(e))
+                finally:
+                    in_flight[source_se] -= 1
+
+                if res["OK"] and key in res["Value"]["Successful"]:
+                    staged[lfn] = Path(res["Value"]["Successful"][key])
+                    self._record_transfer(source_se, staged[lfn], elapsed)
+                    self._report_progress(len(staged), total)
+                    return
+
+                failed_ses.add(source_se)
+                error = res["Message"] if not res["OK"] else res["Value"]["Failed"].get(key, "unknown error")
+                if attempt + 1 < self._max_attempts:
+                    delay = self._retry_delay * 2**attempt
+                    logger.warning("Failed to get %s from %s (%s), retrying in %.1fs", lfn, source_se, error, delay)
+                    await asyncio.sleep(delay)
+                else:
+                    failed[lfn] = str(error)
+
+        await asyncio.gather(*(stage_file(lfn) for lfn in lfns))
+        if self._throughput:
+            await asyncio.to_thread(self._throughput.save)
+
+        if failed:
+            raise RuntimeError(f"Could not get files : {failed}")
+        # Preserve the order of the LFNs
+        return {lfn: staged[lfn] for lfn in lfns}
+
+    def _measured_throughput(self, se: str | None) -> float:
+        """Get the measured throughput of a storage element.
+
+        :param se: The storage element.
+        :return: The throughput in bytes/s, 0 if unknown.
+        """
+        if not self._throughput or se is None:
+            return 0.0
+        return self._throughput.get(se) or 0.0
+
+    def _record_transfer(self, se: str | None, path: Path, elapsed: float) -> None:
+        """Record the throughput of a successful transfer.
+
+        :param se: The storage element the file was downloaded from.
+        :param path: The downloaded file.
+        :param elapsed: The duration of the transfer, in seconds.
+        """
+        if not self._throughput or se is None:
+            return
+        try:
+            self._throughput.record(se, path.stat().st_size, elapsed)
+        except OSError:
+            pass
+
+    def _report_progress(self, staged: int, total: int) -> None:
+        """Report the progress at every 10% and when all the files are staged.
+
+        :param staged: Number of staged files.
+        :param total: Total number of files.
+        """
+        if not self._progress_callback:
+            return
+        step = max(1, total // 10)
+        if staged == total or staged % step == 0:
+            self._progress_callback(staged, total)
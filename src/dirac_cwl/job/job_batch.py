@@ -0,0 +1,120 @@
+"""Job batches sharing a single task document.
+
+The jobs of a submission all execute the same task: it is serialized once into a
+content-addressed document (``task_<sha256>.cwl``) and each job is described by a
+compact reference holding the digest of the task and its own inputs.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from cwl_utils.parser import load_document_by_uri, save
+from cwl_utils.parser.cwl_v1_2 import CommandLineTool, ExpressionTool, Workflow
+
+from dirac_cwl.submission_models import JobInputModel, JobReferenceModel
+
+TASK_DOCUMENT_PREFIX = "task_"
+TASK_DOCUMENT_SUFFIX = ".cwl"
+
+
+def serialize_task(task: CommandLineTool | Workflow | ExpressionTool) -> tuple[str, bytes]:
+    """Serialize a task into its canonical document.
+
+    The document is canonical JSON (sorted keys, no whitespace), which is valid
+    YAML and thus a valid CWL document.
+
+    :param task: The task to serialize.
+    :return: The SHA-256 digest of the document and the document itself.
+    """
+    document = json.dumps(save(task), sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(document).hexdigest(), document
+
+
+def task_document_path(directory: Path, task_digest: str) -> Path:
+    """Get the path of a task document.
+
+    :param directory: The directory containing the document.
+    :param task_digest: The digest of the task.
+    :return: The path of the document.
+    """
+    return directory / f"{TASK_DOCUMENT_PREFIX}{task_digest}{TASK_DOCUMENT_SUFFIX}"
+
+
+def write_task_document(task: CommandLineTool | Workflow | ExpressionTool, directory: Path) -> tuple[str, Path]:
+    """Write the content-addressed document of a task, unless it already exists.
+
+    :param task: The task to write.
+    :param directory: The directory where the document is written.
+    :return: The digest of the task and the path of its document.
+    """
+    task_digest, document = serialize_task(task)
+    path = task_document_path(directory, task_digest)
+    if not path.exists():
+        # Write then rename so that a reader never sees a partial document
+        with tempfile.NamedTemporaryFile("wb", dir=directory, suffix=".tmp", delete=False) as f:
+            f.write(document)
+        os.replace(f.name, path)
+    return task_digest, path
+
+
+def load_task_document(path: Path, task_digest: str) -> CommandLineTool | Workflow | ExpressionTool:
+    """Load and parse a task document.
+
+    :param path: The path of the document.
+    :param task_digest: The expected digest of the document.
+    :return: The parsed task.
+    :raises ValueError: If the document does not match the digest.
+    """
+    actual_digest = hashlib.sha256(path.read_bytes()).hexdigest()
+    if actual_digest != task_digest:
+        raise ValueError(f"Task document {path} is corrupted: expected digest {task_digest}, got {actual_digest}")
+    return load_document_by_uri(str(path))
+
+
+class JobBatch:
+    """Working directory holding the files of a batch of jobs sharing the same task.
+
+    Use as a context manager: the directory and its content are removed on exit.
+    """
+
+    def __init__(self, task: CommandLineTool | Workflow | ExpressionTool, parent: Path | None = None):
+        """Initialize the batch.
+
+        :param task: The task shared by the jobs of the batch.
+        :param parent: The directory in which the batch directory is created, defaults to the current one.
+        """
+        self.task = task
+        self.parent = parent if parent is not None else Path(".")
+        self.directory: Path | None = None
+        self.task_digest: str | None = None
+        self.task_path: Path | None = None
+
+    def __enter__(self) -> "JobBatch":
+        """Create the batch directory and write the task document."""
+        self.directory = Path(tempfile.mkdtemp(prefix="job_batch_", dir=self.parent))
+        self.task_digest, self.task_path = write_task_document(self.task, self.directory)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Remove the batch directory."""
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    def write_job(self, name: str, job_input: JobInputModel | None) -> Path:
+        """Write the reference of a job of the batch.
+
+        :param name: The name of the job file, without extension.
+        :param job_input: The inputs of the job.
+        :return: The path of the job reference file.
+        """
+        if self.directory is None or self.task_digest is None:
+            raise RuntimeError("The job batch is not open")
+
+        path = self.directory / f"{name}.json"
+        path.write_text(JobReferenceModel(task_digest=self.task_digest, input=job_input).model_dump_json())
+        return path
@@ -1,10 +1,24 @@
 """All classes related to job reports."""
 
-from datetime import datetime, timezone
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
 from enum import StrEnum
+from typing import NamedTuple
 
 from diracx.client.aio import AsyncDiracClient
-from diracx.core.models.job import JobStatus, JobStatusUpdate
+from diracx.core.models.job import JobStatus
+
+from dirac_cwl.job.status_aggregator import JobStatusAggregator
+
+logger = logging.getLogger(__name__)
+
+#: Maximum number of seconds a status waits before being sent by the background flusher
+FLUSH_INTERVAL = 30.0
+#: Number of pending statuses above which the background flusher sends them
+FLUSH_SIZE = 50
+#: Number of seconds the background flusher waits after a commit, to send the statuses set meanwhile together
+COALESCE_DELAY = 1.0
 
 
 class JobMinorStatus(StrEnum):
@@ -50,21 +64,81 @@ class JobMinorStatus(StrEnum):
     # WATCHDOG_STALLED = "Watchdog identified this job as stalled"
 
 
+class StatusRecord(NamedTuple):
+    """Job status update, as stored until it is sent."""
+
+    timestamp: datetime
+    status: JobStatus | None
+    minor_status: JobMinorStatus | None
+    application_status: str | None
+
+
 class JobReport:
-    """JobReport."""
+    """Buffer the job status updates and send them to DiracX.
 
-    def __init__(self, job_id: int, source: str, client: AsyncDiracClient) -> None:
+    The updates are sent by commit or, once the report is started (or used as an
+    async context manager), by a background flusher: commits then only wake it up,
+    and the updates set within the coalescing delay, the flush interval or up to
+    the flush size are sent together. Closing the report sends the remaining ones.
+
+    With an aggregator, the updates are sent together with the ones of the other
+    jobs of the process, instead of by the client of the report.
+    """
+
+    def __init__(
+        self,
+        job_id: int,
+        source: str,
+        client: AsyncDiracClient,
+        flush_interval: float = FLUSH_INTERVAL,
+        flush_size: int = FLUSH_SIZE,
+        coalesce_delay: float = COALESCE_DELAY,
+        aggregator: JobStatusAggregator | None = None,
+    ) -> None:
         """
         Initialize Job Report.
 
         :param job_id: the job ID
         :param source: source for the reports
         :param client: DiracX client instance
+        :param flush_interval: maximum number of seconds an update waits for the background flusher
+        :param flush_size: number of pending updates above which the background flusher sends them
+        :param coalesce_delay: number of seconds the background flusher waits after a commit
+        :param aggregator: aggregator of the updates of the jobs of the process
         """
-        self.job_status_info: dict[str, dict[str, str]] = {}  # where job status updates are cumulated
         self.job_id = job_id
         self.source = source
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.coalesce_delay = coalesce_delay
         self._client = client
+        self._aggregator = aggregator
+        self._records: list[StatusRecord] = []  # where job status updates are cumulated
+        self._last_timestamp: datetime | None = None
+        self._send_lock = asyncio.Lock()
+        self._wakeup: asyncio.Event | None = None
+        self._flusher: asyncio.Task | None = None
+
+    @property
+    def job_status_info(self) -> dict[str, dict[str, str | None]]:
+        """Accumulated job status updates, by timestamp, as sent to DiracX."""
+        return self._serialize(self._records)
+
+    def _serialize(self, records: list[StatusRecord]) -> dict[str, dict[str, str | None]]:
+        """Get the body of updates for DiracX.
+
+        :param records: the updates
+        :return: the updates by timestamp
+        """
+        return {
+            str(record.timestamp): {
+                "Status": record.status,
+                "MinorStatus": record.minor_status,
+                "ApplicationStatus": record.application_status,
+                "Source": self.source,
+            }
+            for record in records
+        }
 
     def set_job_status(
         self,
@@ -79,30 +153,78 @@ class JobReport:
         :param minor_status: job minor status
         :param application_status: application status
         """
-        timestamp = str(datetime.now(timezone.utc))
-        # add job status record
-        self.job_status_info.update(
-            {
-                timestamp: JobStatusUpdate(
-                    Status=status,
-                    MinorStatus=minor_status,
-                    ApplicationStatus=application_status,
-                    Source=self.source,
-                ).model_dump()
-            }
-        )
+        timestamp = datetime.now(timezone.utc)
+        # Updates are keyed by timestamp: they must be distinct, and ordered as set
+        if self._last_timestamp is not None and timestamp <= self._last_timestamp:
+            timestamp = self._last_timestamp + timedelta(microseconds=1)
+        self._last_timestamp = timestamp
+        self._records.append(StatusRecord(timestamp, status, minor_status, application_status))
+        if self._wakeup is not None and len(self._records) >= self.flush_size:
+            self._wakeup.set()
 
     async def send_stored_status_info(self):
         """Send all the accumulated job status information."""
-        if not self.job_status_info:
-            return
-        body = {self.job_id: self.job_status_info}
-        ret = await self._client.jobs.set_job_statuses(body)
-        if ret.success:
-            self.job_status_info = {}
-        else:
-            raise RuntimeError(f"Could not set job statuses: {ret}")
+        async with self._send_lock:
+            if not self._records:
+                return
+            records, self._records = self._records, []
+            try:
+                if self._aggregator is not None:
+                    await asyncio.wrap_future(self._aggregator.submit(self.job_id, self._serialize(records)))
+                else:
+                    ret = await self._client.jobs.set_job_statuses({self.job_id: self._serialize(records)})
+                    if not ret.success:
+                        raise RuntimeError(f"Could not set job statuses: {ret}")
+            except BaseException:
+                # Sent again with the next updates
+                self._records[:0] = records
+                raise
 
     async def commit(self):
-        """Send all the accumulated information."""
+        """Send all the accumulated information, by the background flusher if started."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+            return
         await self.send_stored_status_info()
+
+    def start(self) -> None:
+        """Start the background flusher."""
+        if self._flusher is None:
+            self._wakeup = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        """Stop the background flusher and send the remaining updates."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+            self._wakeup = None
+        await self.send_stored_status_info()
+
+    async def __aenter__(self) -> "JobReport":
+        """Use the report as an async context manager running the background flusher."""
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Send the remaining updates."""
+        await self.close()
+
+    async def _flush_periodically(self) -> None:
+        """Send the updates when committed, when too many are pending, or at the flush interval."""
+        assert self._wakeup is not None
+        while True:
+            try:
+                # Unlike wait_for, the timeout context never loses the cancellation by close
+                async with asyncio.timeout(self.flush_interval):
+                    await self._wakeup.wait()
+                await asyncio.sleep(self.coalesce_delay)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                # Not interrupted by close, which waits for it before sending the rest
+                await asyncio.shield(self.send_stored_status_info())
+            except Exception as e:
+                logger.warning("Could not send the statuses of job %s, retrying later: %s", self.job_id, e)
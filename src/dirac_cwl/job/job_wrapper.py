@@ -1,12 +1,10 @@
 #!/usr/bin/env python
 """Job wrapper for executing CWL workflows with DIRAC."""
 
-import json
 import logging
 import os
-import random
 import shutil
-import subprocess
+import tempfile
 from pathlib import Path
 from typing import Any, List, Sequence, cast
 from unittest.mock import AsyncMock
@@ -21,19 +19,21 @@ from cwl_utils.parser.cwl_v1_2 import (
     Saveable,
     Workflow,
 )
-from DIRACCommon.Core.Utilities.ReturnValues import (  # type: ignore[import-untyped]
-    returnValueOrRaise,
-)
 from diracx.client.aio import AsyncDiracClient
 from rich.text import Text
 from ruamel.yaml import YAML
 
 from dirac_cwl.commands import PostProcessCommand, PreProcessCommand
 from dirac_cwl.core.exceptions import WorkflowProcessingException
+from dirac_cwl.core.throughput import SEThroughput
 from dirac_cwl.core.utility import get_lfns
 from dirac_cwl.execution_hooks import ExecutionHooksHint
 from dirac_cwl.execution_hooks.core import ExecutionHooksBasePlugin
+from dirac_cwl.job.input_data import InputDataStager
 from dirac_cwl.job.job_report import JobMinorStatus, JobReport, JobStatus
+from dirac_cwl.job.payload import prune_payload_logs, run_payload
+from dirac_cwl.job.sandbox_cache import SandboxCache
+from dirac_cwl.job.status_aggregator import JobStatusAggregator
 from dirac_cwl.submission_models import (
     JobInputModel,
     JobModel,
@@ -56,18 +56,30 @@ logger = logging.getLogger(__name__)
 class JobWrapper:
     """Job Wrapper for the execution hook."""
 
-    def __init__(self, job_id: int) -> None:
-        """Initialize the job wrapper."""
+    def __init__(self, job_id: int, status_aggregator: JobStatusAggregator | None = None) -> None:
+        """Initialize the job wrapper.
+
+        :param job_id: The job ID.
+        :param status_aggregator: Aggregator sending the statuses of the job with the ones of other jobs.
+        """
         self._execution_hooks_plugin: ExecutionHooksBasePlugin | None = None
         self._job_path: Path = Path()
+        self._log_path: Path = Path()
         self._job_id = job_id
+        self._sandbox_cache = SandboxCache()
         src = "JobWrapper"
         if os.getenv("DIRAC_PROTO_LOCAL") == "1":
             self._diracx_client: AsyncDiracClient = AsyncMock()
-            self._job_report: JobReport = JobReportMock(self._job_id, src, self._diracx_client)
+            if status_aggregator is not None:
+                # The aggregator writes the status files of the jobs
+                self._job_report: JobReport = JobReport(
+                    self._job_id, src, self._diracx_client, aggregator=status_aggregator
+                )
+            else:
+                self._job_report = JobReportMock(self._job_id, src, self._diracx_client)
         else:
             self._diracx_client = AsyncDiracClient()
-            self._job_report = JobReport(self._job_id, src, self._diracx_client)
+            self._job_report = JobReport(self._job_id, src, self._diracx_client, aggregator=status_aggregator)
         self._job_report.set_job_status(JobStatus.RUNNING, JobMinorStatus.JOB_INITIALIZATION)
 
     async def __download_input_sandbox(self, arguments: JobInputModel, job_path: Path) -> None:
@@ -82,7 +94,8 @@ class JobWrapper:
             self._job_report.set_job_status(minor_status=JobMinorStatus.FAILED_DOWNLOADING_INPUT_SANDBOX)
             raise RuntimeError("Could not download sandboxes")
         for sandbox in arguments.sandbox:
-            await download_sandbox(sandbox, job_path)
+            # Sandboxes are shared by the jobs of a transformation: extract them once per node
+            await self._sandbox_cache.fetch(sandbox, job_path, download_sandbox)
 
     async def __upload_output_sandbox(
         self,
@@ -131,14 +144,20 @@ class JobWrapper:
         lfns_inputs = get_lfns(inputs.cwl)
 
         if lfns_inputs:
+            # Stage the files of all the inputs at once, in the order of the inputs
+            stager = InputDataStager(
+                self._execution_hooks_plugin._datamanager,
+                job_path,
+                progress_callback=lambda staged, total: self._job_report.set_job_status(
+                    application_status=f"Staged {staged}/{total} input files"
+                ),
+                throughput=SEThroughput.load(),
+            )
+            paths = await stager.stage([lfn for lfns in lfns_inputs.values() for lfn in lfns])
             for input_name, lfns in lfns_inputs.items():
-                res = returnValueOrRaise(self._execution_hooks_plugin._datamanager.getFile(lfns, str(job_path)))
-                if res["Failed"]:
-                    raise RuntimeError(f"Could not get files : {res['Failed']}")
-                paths = res["Successful"]
-                if paths and isinstance(lfns, list):
-                    new_paths[input_name] = [Path(paths[lfn]).relative_to(job_path.resolve()) for lfn in paths]
-                elif paths and isinstance(lfns, str):
+                if lfns and isinstance(lfns, list):
+                    new_paths[input_name] = [Path(paths[lfn]).relative_to(job_path.resolve()) for lfn in lfns]
+                elif lfns and isinstance(lfns, str):
                     new_paths[input_name] = Path(paths[lfns]).relative_to(job_path.resolve())
         return new_paths
 
@@ -173,17 +192,16 @@ class JobWrapper:
                 for p in path:
                     inputs.cwl[input_name].append(File(path=str(p)))
 
-    def __parse_output_filepaths(self, stdout: str) -> dict[str, str | Path | Sequence[str | Path]]:
+    def __parse_output_filepaths(self, outputs: dict[str, Any]) -> dict[str, str | Path | Sequence[str | Path]]:
         """Get the outputted filepaths per output.
 
-        :param str stdout:
-            The console output of the the job
+        :param dict[str, Any] outputs:
+            The output document of the job
 
         :return dict[str, list[str]]:
             The dict of the list of filepaths for each output
         """
         outputted_files: dict[str, str | Path | Sequence[str | Path]] = {}
-        outputs = json.loads(stdout)
         for output, files in outputs.items():
             if not files:
                 continue
@@ -244,29 +262,33 @@ class JobWrapper:
     async def post_process(
         self,
         status: int,
-        stdout: str,
+        outputs: dict[str, Any],
         stderr: str,
     ):
         """
         Post-process the job after execution.
 
+        :param status: The return code of the task
+        :param outputs: The output document of the task
+        :param stderr: The end of the error stream of the task
         :return: True if the job is post-processed successfully, False otherwise
         """
         logger = logging.getLogger("JobWrapper - Post-process")
         if status != 0:
             raise RuntimeError(f"Error {status} during the task execution.")
 
-        logger.info(stdout)
+        # The whole output document may be large: only summarize it
+        logger.info("Task outputs: %s", ", ".join(outputs) or "none")
         logger.info(stderr)
 
-        outputs = self.__parse_output_filepaths(stdout)
+        output_paths = self.__parse_output_filepaths(outputs)
 
         success = True
 
         if self._execution_hooks_plugin:
-            success = await self.__post_process_hooks(self._job_path, outputs=outputs)
+            success = await self.__post_process_hooks(self._job_path, outputs=output_paths)
 
-        await self.__upload_output_sandbox(outputs=outputs)
+        await self.__upload_output_sandbox(outputs=output_paths)
         await self._job_report.commit()
         return success
 
@@ -356,6 +378,14 @@ class JobWrapper:
             raise err
         return True
 
+    async def __payload_heartbeat(self, elapsed: float) -> None:
+        """Report that the payload is still running.
+
+        :param elapsed: Time elapsed since the payload started, in seconds.
+        """
+        self._job_report.set_job_status(application_status=f"Payload running for {int(elapsed)}s")
+        await self._job_report.commit()
+
     async def run_job(self, job: JobModel) -> bool:
         """Execute a given CWL workflow using cwltool.
 
@@ -370,10 +400,16 @@ class JobWrapper:
         job_execution_hooks = ExecutionHooksHint.from_cwl(job.task)
         self._execution_hooks_plugin = job_execution_hooks.to_runtime(job) if job_execution_hooks else None
 
-        # Isolate the job in a specific directory
-        self._job_path = Path(".") / "workernode" / f"{random.randint(1000, 9999)}"
-        self._job_path.mkdir(parents=True, exist_ok=True)
+        # Isolate the job in a specific directory: jobs may run concurrently on the same node
+        workernode = Path(".") / "workernode"
+        workernode.mkdir(parents=True, exist_ok=True)
+        # The payload logs outlive the job directories: drop the ones of the old jobs
+        prune_payload_logs(workernode, "*.cwltool.log*")
+        self._job_path = Path(tempfile.mkdtemp(prefix=f"{self._job_id}_", dir=workernode))
+        self._log_path = workernode / f"{self._job_path.name}.cwltool.log"
 
+        # The statuses committed along the job are sent together by the background flusher
+        self._job_report.start()
         try:
             # Pre-process the job
             logger.info("Pre-processing Task...")
@@ -384,7 +420,13 @@ class JobWrapper:
             logger.info("Executing Task: %s", command)
             self._job_report.set_job_status(minor_status=JobMinorStatus.APPLICATION)
             await self._job_report.commit()
-            result = subprocess.run(command, capture_output=True, text=True, cwd=self._job_path)
+            # The payload log is written next to the job directory, which is removed at the end of the job
+            result = await run_payload(
+                command,
+                cwd=self._job_path,
+                log_path=self._log_path,
+                heartbeat=self.__payload_heartbeat,
+            )
 
             if result.returncode != 0:
                 logger.error("Error in executing workflow:\n%s", Text.from_ansi(result.stderr))
@@ -397,7 +439,7 @@ class JobWrapper:
             logger.info("Post-processing Task...")
             if await self.post_process(
                 result.returncode,
-                result.stdout,
+                result.outputs or {},
                 result.stderr,
             ):
                 logger.info("Task post-processed successfully!")
@@ -412,8 +454,8 @@ class JobWrapper:
             self._job_report.set_job_status(JobStatus.FAILED)
             return False
         finally:
-            # Commit all stored job reports
-            await self._job_report.commit()
+            # Send all stored job reports
+            await self._job_report.close()
             # Clean up
             if self._job_path.exists():
                 shutil.rmtree(self._job_path)
@@ -7,6 +7,7 @@ import logging
 import os
 import sys
 import tempfile
+from pathlib import Path
 
 import DIRAC  # type: ignore[import-untyped]
 from cwl_utils.parser import load_document_by_uri
@@ -16,36 +17,54 @@ from ruamel.yaml import YAML
 if os.getenv("DIRAC_PROTO_LOCAL") != "1":
     DIRAC.initialize()
 
+from dirac_cwl.job.job_batch import load_task_document, task_document_path
 from dirac_cwl.job.job_wrapper import JobWrapper
 from dirac_cwl.submission_models import JobModel
 
 
-async def main():
-    """Execute the job wrapper for a given job model."""
-    if len(sys.argv) != 3:
-        logging.error("2 arguments required, <json-file> <jobID>")
-        sys.exit(1)
+def load_job_model(job_json_file: str) -> JobModel:
+    """Load a job model dumped by the router.
 
-    job_id = int(sys.argv[2])
+    The file either references a task document of the same directory
+    (see :mod:`dirac_cwl.job.job_batch`) or embeds the whole task.
 
-    job_json_file = sys.argv[1]
-    job_wrapper = JobWrapper(job_id)
+    :param job_json_file: Path to the JSON file describing the job.
+    :return: The validated job model.
+    """
     with open(job_json_file, "r") as file:
         job_model_dict = json.load(file)
 
-    task_dict = job_model_dict["task"]
+    if task_digest := job_model_dict.pop("task_digest", None):
+        task_path = task_document_path(Path(job_json_file).parent, task_digest)
+        task_obj = load_task_document(task_path, task_digest)
+    else:
+        task_dict = job_model_dict["task"]
 
-    with tempfile.NamedTemporaryFile("w+", suffix=".cwl", delete=False) as f:
-        YAML().dump(task_dict, f)
-        f.flush()
-        task_obj = load_document_by_uri(f.name)
+        with tempfile.NamedTemporaryFile("w+", suffix=".cwl", delete=False) as f:
+            YAML().dump(task_dict, f)
+            f.flush()
+            task_obj = load_document_by_uri(f.name)
 
-    if job_model_dict["input"]:
+    if job_model_dict.get("input"):
+        if task_obj.cwlVersion is None:
+            raise ValueError(f"The task of {job_json_file} does not declare its cwlVersion")
         cwl_inputs_obj = load_inputfile(task_obj.cwlVersion, job_model_dict["input"]["cwl"])
         job_model_dict["input"]["cwl"] = cwl_inputs_obj
     job_model_dict["task"] = task_obj
 
-    job = JobModel.model_validate(job_model_dict)
+    return JobModel.model_validate(job_model_dict)
+
+
+async def main():
+    """Execute the job wrapper for a given job model."""
+    if len(sys.argv) != 3:
+        logging.error("2 arguments required, <json-file> <jobID>")
+        sys.exit(1)
+
+    job_id = int(sys.argv[2])
+
+    job_wrapper = JobWrapper(job_id)
+    job = load_job_model(sys.argv[1])
 
     res = await job_wrapper.run_job(job)
     if res:
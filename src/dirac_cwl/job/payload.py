@@ -0,0 +1,200 @@
+"""Streamed execution of the payload of a job.
+
+The output of the payload is never held in memory as a whole: stderr is teed to
+rotating log files while only its tail is kept, and stdout (the cwltool output
+document) is spooled to disk when it grows large, then parsed from there.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable, NamedTuple, Sequence
+
+logger = logging.getLogger(__name__)
+
+#: Size of the chunks read from the payload streams
+READ_CHUNK_SIZE = 64 * 1024
+#: Maximum size of a payload log file before it is rotated
+PAYLOAD_LOG_MAX_BYTES = 10 * 1024 * 1024
+#: Number of rotated payload log files kept
+PAYLOAD_LOG_BACKUP_COUNT = 5
+#: Size of the end of stderr kept in memory
+STDERR_TAIL_BYTES = 64 * 1024
+#: Size of stdout kept in memory before spooling it to disk
+STDOUT_SPOOL_BYTES = 1024 * 1024
+#: Size of the beginning of stdout kept to be logged
+STDOUT_HEAD_BYTES = 4 * 1024
+#: Age (in seconds) after which the payload log files left on the node are removed
+PAYLOAD_LOG_RETENTION = 7 * 24 * 3600
+#: Interval (in seconds) between two heartbeats
+HEARTBEAT_INTERVAL = 60.0
+
+
+class PayloadResult(NamedTuple):
+    """Result of the payload execution."""
+
+    returncode: int
+    #: Beginning of the standard output
+    stdout: str
+    #: End of the standard error, the whole of it is in the log files
+    stderr: str
+    #: JSON document of the standard output, if the payload succeeded
+    outputs: Any = None
+
+
+class RotatingLogFile:
+    """Append-only log file rotated when it exceeds a given size.
+
+    :param path: Path to the log file, rotated files are suffixed with ``.1``, ``.2``...
+    :param max_bytes: Size above which the file is rotated.
+    :param backup_count: Number of rotated files kept.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = PAYLOAD_LOG_MAX_BYTES,
+        backup_count: int = PAYLOAD_LOG_BACKUP_COUNT,
+    ):
+        """Open the log file."""
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+
+    def write(self, data: bytes) -> None:
+        """Append data to the log file, rotating it if needed.
+
+        :param data: The data to append.
+        """
+        if self._size and self._size + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._size += len(data)
+
+    def _rotate(self) -> None:
+        """Shift the rotated files and start a new log file."""
+        self._file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = self.path.with_name(f"{self.path.name}.{index}")
+            if source.exists():
+                os.replace(source, self.path.with_name(f"{self.path.name}.{index + 1}"))
+        if self.backup_count > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        self._file = open(self.path, "wb")
+        self._size = 0
+
+    def close(self) -> None:
+        """Close the log file."""
+        self._file.close()
+
+
+async def _pump(stream: asyncio.StreamReader, sinks: Sequence[Callable[[bytes], object]]) -> None:
+    """Forward the content of a stream to sinks, chunk by chunk.
+
+    :param stream: The stream to read.
+    :param sinks: The callables receiving the chunks.
+    """
+    while chunk := await stream.read(READ_CHUNK_SIZE):
+        for sink in sinks:
+            sink(chunk)
+
+
+async def run_payload(
+    command: Sequence[str],
+    cwd: Path,
+    log_path: Path,
+    heartbeat: Callable[[float], Awaitable[None]] | None = None,
+    heartbeat_interval: float = HEARTBEAT_INTERVAL,
+) -> PayloadResult:
+    """Execute the payload, streaming its output.
+
+    :param command: The command to execute.
+    :param cwd: The working directory of the payload.
+    :param log_path: The log file receiving stderr.
+    :param heartbeat: Coroutine function called periodically with the elapsed time while the payload runs.
+    :param heartbeat_interval: Interval between two heartbeats, in seconds.
+    :return: The return code, the output and the end of the error stream of the payload.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    assert process.stdout is not None and process.stderr is not None
+
+    start = time.monotonic()
+    log_file = RotatingLogFile(log_path)
+    stderr_tail: deque[bytes] = deque()
+    stderr_tail_size = 0
+
+    def keep_tail(chunk: bytes) -> None:
+        nonlocal stderr_tail_size
+        stderr_tail.append(chunk)
+        stderr_tail_size += len(chunk)
+        while stderr_tail_size - len(stderr_tail[0]) >= STDERR_TAIL_BYTES:
+            stderr_tail_size -= len(stderr_tail.popleft())
+
+    async def beat() -> None:
+        assert heartbeat is not None
+        while True:
+            await asyncio.sleep(heartbeat_interval)
+            try:
+                await heartbeat(time.monotonic() - start)
+            except Exception:
+                logger.exception("Failed to send the payload heartbeat")
+
+    heartbeat_task = asyncio.create_task(beat()) if heartbeat else None
+    with tempfile.SpooledTemporaryFile(max_size=STDOUT_SPOOL_BYTES) as stdout_file:
+        try:
+            await asyncio.gather(
+                _pump(process.stdout, [stdout_file.write]),
+                _pump(process.stderr, [log_file.write, keep_tail]),
+            )
+            returncode = await process.wait()
+        finally:
+            if heartbeat_task:
+                heartbeat_task.cancel()
+            log_file.close()
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+        stdout_file.seek(0)
+        stdout = stdout_file.read(STDOUT_HEAD_BYTES).decode(errors="replace")
+        outputs = None
+        if returncode == 0 and stdout:
+            stdout_file.seek(0)
+            outputs = json.load(stdout_file)
+
+    stderr = b"".join(stderr_tail).decode(errors="replace")
+    return PayloadResult(returncode, stdout, stderr, outputs)
+
+
+def prune_payload_logs(directory: Path, pattern: str, max_age: float = PAYLOAD_LOG_RETENTION) -> int:
+    """Remove the payload log files (and their rotated files) not modified for a given time.
+
+    :param directory: The directory holding the log files.
+    :param pattern: Glob pattern of the log files in the directory.
+    :param max_age: Age (in seconds) of the log files removed.
+    :return: Number of files removed.
+    """
+    removed = 0
+    limit = time.time() - max_age
+    for path in directory.glob(pattern):
+        try:
+            if path.stat().st_mtime < limit:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            # Removed by a concurrent job
+            continue
+    return removed
@@ -0,0 +1,228 @@
+"""Node-local cache of the extracted sandboxes.
+
+Sandbox PFNs embed the checksum of their content: the jobs of a node sharing the
+same sandbox extract it once into the cache, and then get copies of the cached
+files instead of downloading and extracting the archive again. The copies are
+copy-on-write clones (reflinks) where the filesystem supports them, so the jobs
+may modify their files without ever touching the cached ones.
+"""
+
+import asyncio
+import errno
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable
+
+from dirac_cwl.core.utility import cache_dir
+
+logger = logging.getLogger(__name__)
+
+#: Environment variable overriding the location of the sandbox cache
+SANDBOX_CACHE_DIR_ENV = "DIRAC_CWL_SANDBOX_CACHE"
+#: Environment variable overriding the maximum size of the sandbox cache, in bytes
+SANDBOX_CACHE_SIZE_ENV = "DIRAC_CWL_SANDBOX_CACHE_SIZE"
+#: Default maximum size of the sandbox cache, in bytes
+DEFAULT_SANDBOX_CACHE_SIZE = 5 * 1024**3
+#: ioctl cloning a file on Linux (btrfs, XFS, ...), from linux/fs.h
+FICLONE = 0x40049409
+
+
+class SandboxCache:
+    """Size-bounded LRU cache of the extracted sandboxes, shared by the jobs of a node.
+
+    Each sandbox is extracted once into ``entries/<key>``, ``<key>`` being the
+    SHA-256 of its PFN. A shared lock per entry protects the jobs copying its
+    files from an eviction, an exclusive one serializes its extraction. The cache
+    is only accessible to its owner.
+
+    :param directory: Location of the cache, defaults to ``$DIRAC_CWL_SANDBOX_CACHE`` or the user cache.
+    :param max_size: Maximum size of the cached files, defaults to ``$DIRAC_CWL_SANDBOX_CACHE_SIZE`` or 5 GiB.
+    """
+
+    def __init__(self, directory: Path | None = None, max_size: int | None = None):
+        """Initialize the cache."""
+        if directory is None:
+            directory = Path(os.environ.get(SANDBOX_CACHE_DIR_ENV) or cache_dir("sandboxes"))
+        if max_size is None:
+            max_size = int(os.environ.get(SANDBOX_CACHE_SIZE_ENV) or DEFAULT_SANDBOX_CACHE_SIZE)
+        self.directory = directory
+        self.max_size = max_size
+        self._entries = directory / "entries"
+        self._locks = directory / "locks"
+        self._tmp = directory / "tmp"
+
+    async def fetch(
+        self,
+        pfn: str,
+        destination: Path,
+        download: Callable[[str, Path], Awaitable[None]],
+    ) -> bool:
+        """Populate a directory with the content of a sandbox.
+
+        :param pfn: The PFN of the sandbox.
+        :param destination: The directory receiving the files of the sandbox.
+        :param download: Coroutine function extracting a sandbox into a directory, called on cache misses.
+        :return: True if the sandbox was already in the cache, False otherwise.
+        """
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        for directory in (self._entries, self._locks, self._tmp):
+            directory.mkdir(mode=0o700, exist_ok=True)
+
+        key = hashlib.sha256(pfn.encode()).hexdigest()
+        entry = self._entries / key
+
+        hit = True
+        if not entry.exists():
+            async with self._lock(key, fcntl.LOCK_EX):
+                # Another job may have extracted it while we were waiting
+                if not entry.exists():
+                    hit = False
+                    await self._populate(pfn, entry, download)
+
+        async with self._lock(key, fcntl.LOCK_SH):
+            if not entry.exists():
+                # Evicted in the meantime: do not fail the job because of the cache
+                logger.warning("Sandbox %s was evicted from the cache, downloading it", pfn)
+                await download(pfn, destination)
+                return False
+            # Mark the entry as recently used
+            os.utime(entry)
+            await asyncio.to_thread(_clone_tree, entry, destination)
+
+        logger.debug("Sandbox %s %s the cache", pfn, "found in" if hit else "added to")
+        if not hit:
+            await asyncio.to_thread(self._evict, keep=key)
+        return hit
+
+    @asynccontextmanager
+    async def _lock(self, key: str, operation: int) -> AsyncIterator[None]:
+        """Hold a lock on a cache entry.
+
+        :param key: The key of the entry.
+        :param operation: fcntl.LOCK_SH or fcntl.LOCK_EX.
+        """
+        fd = os.open(self._locks / f"{key}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            await asyncio.to_thread(fcntl.flock, fd, operation)
+            yield
+        finally:
+            # Closing the descriptor releases the lock
+            os.close(fd)
+
+    async def _populate(self, pfn: str, entry: Path, download: Callable[[str, Path], Awaitable[None]]) -> None:
+        """Extract a sandbox into a cache entry.
+
+        The sandbox is extracted aside and renamed, so an entry is either complete or absent.
+
+        :param pfn: The PFN of the sandbox.
+        :param entry: The directory of the entry.
+        :param download: Coroutine function extracting a sandbox into a directory.
+        """
+        staging = Path(tempfile.mkdtemp(prefix=f"{entry.name}-", dir=self._tmp))
+        try:
+            await download(pfn, staging)
+            os.rename(staging, entry)
+        except BaseException:
+            await asyncio.to_thread(_remove_tree, staging)
+            raise
+
+    def _evict(self, keep: str) -> None:
+        """Remove the least recently used entries until the cache fits in its maximum size.
+
+        Entries being used by a job are skipped, as are the entries evicted
+        meanwhile by another job.
+
+        :param keep: The key of an entry that must not be evicted.
+        """
+        entries = []
+        total_size = 0
+        for entry in self._entries.iterdir():
+            try:
+                size = _tree_size(entry)
+                entries.append((entry.stat().st_mtime, size, entry))
+            except FileNotFoundError:
+                continue
+            total_size += size
+
+        for _, size, entry in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if entry.name == keep:
+                continue
+
+            fd = os.open(self._locks / f"{entry.name}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                # Rename first so that jobs never see a partially removed entry
+                trash = Path(tempfile.mkdtemp(prefix=f"{entry.name}-", dir=self._tmp))
+                try:
+                    os.rename(entry, trash / entry.name)
+                except FileNotFoundError:
+                    # Evicted by another job
+                    trash.rmdir()
+                    continue
+            finally:
+                os.close(fd)
+            _remove_tree(trash)
+            total_size -= size
+            logger.debug("Evicted sandbox %s from the cache", entry.name)
+
+
+def _clone_tree(source: Path, destination: Path) -> None:
+    """Reproduce a directory tree with copies of its files, cloned when the filesystem supports it.
+
+    :param source: The directory to reproduce.
+    :param destination: The directory where the tree is reproduced.
+    """
+
+    def copy(src: str, dst: str) -> None:
+        if not _clone_file(Path(src), Path(dst)):
+            shutil.copy2(src, dst)
+
+    # The symbolic links, to files or directories, are reproduced as links
+    shutil.copytree(source, destination, symlinks=True, copy_function=copy, dirs_exist_ok=True)
+
+
+def _clone_file(source: Path, destination: Path) -> bool:
+    """Clone a file, sharing its blocks until either copy is modified.
+
+    :param source: The file to clone.
+    :param destination: The path of the clone.
+    :return: True if the file was cloned, False if the filesystem cannot clone it.
+    """
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError as e:
+            # Filesystem without reflinks, or cache on another filesystem
+            if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EXDEV, errno.EPERM):
+                raise
+            return False
+    shutil.copystat(source, destination)
+    return True
+
+
+def _tree_size(directory: Path) -> int:
+    """Get the size of the files of a directory tree.
+
+    :param directory: The directory tree.
+    :return: The size in bytes.
+    """
+    return sum(Path(root, name).lstat().st_size for root, _, files in os.walk(directory) for name in files)
+
+
+def _remove_tree(directory: Path) -> None:
+    """Remove a directory tree, ignoring errors.
+
+    :param directory: The directory tree.
+    """
+    shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,167 @@
+"""Aggregation of the status updates of the jobs running on a node.
+
+The body of the DiracX ``set_job_statuses`` call is keyed by job: the updates
+of all the jobs running in the same process (in-process jobs of the router, or
+payloads of a pilot) are gathered and sent together at a regular interval, by a
+single client running in a background thread, instead of each job opening its
+own connection and sending its own updates.
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future
+from contextlib import AbstractAsyncContextManager
+
+from diracx.client.aio import AsyncDiracClient
+
+logger = logging.getLogger(__name__)
+
+#: Number of seconds between two sends of the aggregated updates
+AGGREGATION_INTERVAL = 2.0
+
+
+class JobStatusAggregator:
+    """Send the status updates of many jobs in a single call per interval.
+
+    The background thread and its client are started with the first updates.
+
+    :param client_factory: Build the client sending the updates, used as an async context manager
+    :param interval: Number of seconds between two sends
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], AbstractAsyncContextManager] = AsyncDiracClient,
+        interval: float = AGGREGATION_INTERVAL,
+    ):
+        """Initialize the aggregator, without starting it."""
+        self.client_factory = client_factory
+        self.interval = interval
+        self._lock = threading.Lock()
+        # Updates to send, by job and timestamp, and the futures of the jobs waiting for them
+        self._pending: dict[int, dict[str, dict]] = {}
+        self._waiters: list[Future] = []
+        self._thread: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._closing: asyncio.Event | None = None
+
+    def submit(self, job_id: int, updates: dict[str, dict]) -> Future:
+        """Add status updates of a job to the next send.
+
+        :param job_id: The job ID
+        :param updates: The updates of the job, by timestamp
+        :return: A future resolved once the updates are sent, or failed with the error of the send
+        """
+        future: Future = Future()
+        with self._lock:
+            self._pending.setdefault(job_id, {}).update(updates)
+            self._waiters.append(future)
+            if self._thread is None:
+                self._start()
+        return future
+
+    def _start(self) -> None:
+        """Start the background thread sending the updates."""
+        started = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(started,), name="JobStatusAggregator", daemon=True)
+        self._thread.start()
+        started.wait()
+        atexit.register(self.close)
+
+    def _run(self, started: threading.Event) -> None:
+        """Run the event loop of the background thread.
+
+        :param started: Set once the loop is ready
+        """
+        self._loop = asyncio.new_event_loop()
+        self._closing = asyncio.Event()
+        started.set()
+        try:
+            self._loop.run_until_complete(self._send_periodically())
+        except Exception:
+            logger.exception("The job status aggregator stopped")
+        finally:
+            self._loop.close()
+            # The updates submitted too late, or left by an error, are not sent
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+                waiters, self._waiters, self._pending = self._waiters, [], {}
+            for waiter in waiters:
+                waiter.set_exception(RuntimeError("The job status aggregator stopped"))
+
+    async def _send_periodically(self) -> None:
+        """Send the pending updates at each interval, until closed."""
+        assert self._closing is not None
+        async with self.client_factory() as client:
+            while not self._closing.is_set():
+                try:
+                    async with asyncio.timeout(self.interval):
+                        await self._closing.wait()
+                except TimeoutError:
+                    pass
+                await self._send(client)
+
+    async def _send(self, client) -> None:
+        """Send the pending updates in a single call.
+
+        :param client: The DiracX client
+        """
+        with self._lock:
+            body, self._pending = self._pending, {}
+            waiters, self._waiters = self._waiters, []
+        if not body:
+            return
+        try:
+            ret = await client.jobs.set_job_statuses(body)
+            if not ret.success:
+                raise RuntimeError(f"Could not set job statuses: {ret}")
+        except Exception as e:
+            logger.warning("Could not send the statuses of %d job(s): %s", len(body), e)
+            for waiter in waiters:
+                waiter.set_exception(e)
+            return
+        logger.debug("Sent the statuses of %d job(s)", len(body))
+        for waiter in waiters:
+            waiter.set_result(None)
+
+    def close(self) -> None:
+        """Send the pending updates and stop the background thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        atexit.unregister(self.close)
+        assert self._loop is not None and self._closing is not None
+        try:
+            self._loop.call_soon_threadsafe(self._closing.set)
+        except RuntimeError:
+            # The loop already stopped on an error
+            pass
+        thread.join()
+
+
+_aggregator: JobStatusAggregator | None = None
+_aggregator_lock = threading.Lock()
+
+
+def get_status_aggregator() -> JobStatusAggregator:
+    """Get the aggregator of the job status updates of the current process.
+
+    Locally (``DIRAC_PROTO_LOCAL=1``), the updates are written to the status files of the jobs.
+    """
+    global _aggregator
+    with _aggregator_lock:
+        if _aggregator is None:
+            if os.getenv("DIRAC_PROTO_LOCAL") == "1":
+                # Import here: the mocks are only needed locally
+                from dirac_cwl.mocks.status import StatusClientMock
+
+                _aggregator = JobStatusAggregator(StatusClientMock)
+            else:
+                _aggregator = JobStatusAggregator()
+        return _aggregator
@@ -5,7 +5,9 @@ This module contains functions to manage job submission to the prototype, DIRAC,
 It is not meant to be integrated to DiracX logic itself in the future.
 """
 
+import asyncio
 from abc import ABC, abstractmethod
+from enum import StrEnum
 from pathlib import Path
 
 from diracx.api.jobs import create_sandbox
@@ -43,9 +45,32 @@ class SubmissionClient(ABC):
         pass
 
 
+class JobIsolation(StrEnum):
+    """How the local router isolates the jobs it executes."""
+
+    #: Each job runs the job wrapper in a dedicated Python interpreter
+    SUBPROCESS = "subprocess"
+    #: Jobs run the job wrapper in the router interpreter, reusing the parsed task
+    IN_PROCESS = "in-process"
+
+
 class PrototypeSubmissionClient(SubmissionClient):
     """Submission client for local/prototype execution."""
 
+    def __init__(
+        self,
+        max_parallel_jobs: int | None = None,
+        isolation: JobIsolation = JobIsolation.SUBPROCESS,
+    ) -> None:
+        """
+        Initialize the local submission client.
+
+        :param max_parallel_jobs: Maximum number of jobs run in parallel by the local router
+        :param isolation: How the local router isolates the jobs
+        """
+        self.max_parallel_jobs = max_parallel_jobs
+        self.isolation = isolation
+
     async def create_sandbox(self, isb_file_paths: list[Path]) -> str | None:
         """
         Upload files to the local sandbox store.
@@ -71,7 +96,11 @@ class PrototypeSubmissionClient(SubmissionClient):
         """
         from dirac_cwl.job import submit_job_router
 
-        result = submit_job_router(job_submission)
+        result = submit_job_router(
+            job_submission,
+            max_parallel_jobs=self.max_parallel_jobs,
+            isolation=self.isolation,
+        )
         if result:
             console.print("[green]:heavy_check_mark:[/green] [bold]CLI:[/bold] Job(s) done.")
         return result
@@ -99,21 +128,22 @@ class DIRACSubmissionClient(SubmissionClient):
         :param job_submission: Job submission model
         """
         from dirac_cwl.job import validate_jobs
+        from dirac_cwl.job.job_batch import JobBatch
 
-        jdls = []
-        job_submission_path = Path("job.json")
-        for job in validate_jobs(job_submission):
-            # Dump the job model to a file
-            with open(job_submission_path, "w") as f:
-                f.write(job.model_dump_json())
+        jobs = validate_jobs(job_submission)
 
-            # Convert job.json to jdl
-            console.print("\t\t[blue]:information_source:[/blue] [bold]CLI:[/bold] Converting job model to jdl...")
-            sandbox_id = await create_sandbox([job_submission_path])
-            job_submission_path.unlink()
+        # Upload the task document once in a sandbox shared by the jobs, and each small job file in its own
+        console.print("\t\t[blue]:information_source:[/blue] [bold]CLI:[/bold] Converting job models to jdl...")
+        with JobBatch(job_submission.task) as batch:
+            assert batch.task_path
+            job_files = [batch.write_job(f"job_{index}", job.input) for index, job in enumerate(jobs)]
+            task_sandbox_id = await create_sandbox([batch.task_path])
+            job_sandbox_ids = await asyncio.gather(*(create_sandbox([job_file]) for job_file in job_files))
 
-            jdl = self.convert_to_jdl(job, sandbox_id)
-            jdls.append(jdl)
+        jdls = [
+            self.convert_to_jdl(job, task_sandbox_id, job_file.name, job_sandbox_id)
+            for job, job_file, job_sandbox_id in zip(jobs, job_files, job_sandbox_ids)
+        ]
 
         console.print("\t\t[blue]:information_source:[/blue] [bold]CLI:[/bold] Call diracx: jobs/jdl router...")
 
@@ -126,17 +156,21 @@ class DIRACSubmissionClient(SubmissionClient):
         )
         return True
 
-    def convert_to_jdl(self, job: JobModel, sandbox_pfn: str) -> str:
+    def convert_to_jdl(
+        self, job: JobModel, sandbox_pfn: str, job_file: str = "job.json", job_sandbox_pfn: str | None = None
+    ) -> str:
         """
         Convert job model to jdl.
 
         :param job: The task to execute
-        :param sandbox_pfn: The sandbox PFN
+        :param sandbox_pfn: The sandbox PFN, shared by the jobs of a submission
+        :param job_file: The name of the job file in the sandbox
+        :param job_sandbox_pfn: The PFN of the sandbox holding the job file, if not in the shared one
         :return: JDL string
         """
         jdl_lines = []
         jdl_lines.append("Executable = dirac-cwl-exec;")
-        jdl_lines.append("Arguments = job.json;")
+        jdl_lines.append(f"Arguments = {job_file};")
 
         if job.task.requirements and job.task.requirements[0].coresMin:
             jdl_lines.append(f"NumberOfProcessors = {job.task.requirements[0].coresMin};")
@@ -151,7 +185,10 @@ class DIRACSubmissionClient(SubmissionClient):
         if job_scheduling.sites:
             jdl_lines.append(f"Site = {job_scheduling.sites};")
 
-        jdl_lines.append(f"InputSandbox = {sandbox_pfn};")
+        if job_sandbox_pfn:
+            jdl_lines.append(f"InputSandbox = {{{sandbox_pfn}, {job_sandbox_pfn}}};")
+        else:
+            jdl_lines.append(f"InputSandbox = {sandbox_pfn};")
         if job.input:
             formatted_lfns = []
             lfns_list = get_lfns(job.input.cwl).values()
@@ -0,0 +1,170 @@
+"""Notification of the files stored in the local file catalog.
+
+The processes waiting for new files in the local file catalog (e.g. the routers of
+downstream transformations) each bind a UNIX datagram socket in a directory
+derived from the catalog location. The processes storing files send the path of
+each new file to all of them, so that they wake up as soon as their inputs are
+available instead of polling the catalog.
+
+Notifications are best effort: listeners still look at the catalog from time to
+time, for the files stored by other means.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import logging
+import os
+import select
+import socket
+import tempfile
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+#: Maximum size of a notification (bytes)
+MAX_EVENT_SIZE = 4096
+
+_EVENTS_SUPPORTED = hasattr(socket, "AF_UNIX")
+_listener_ids = itertools.count()
+
+
+def events_directory(root: Path | str) -> Path:
+    """Get the directory of the sockets listening to the files stored in a catalog.
+
+    The directory is kept short, as UNIX socket paths are limited to about a hundred bytes.
+
+    :param root: The root of the file catalog.
+    :return: The directory, shared by all the processes using the same catalog.
+    """
+    digest = hashlib.sha256(str(Path(root).resolve()).encode()).hexdigest()[:16]
+    return Path(tempfile.gettempdir()) / f"dirac-cwl-events-{digest}"
+
+
+def publish(root: Path | str, paths: Iterable[str]) -> None:
+    """Notify the listeners that files were stored in a catalog.
+
+    :param root: The root of the file catalog.
+    :param paths: The paths of the new files, relative to the root.
+    """
+    _send(root, [path.encode()[:MAX_EVENT_SIZE] for path in paths])
+
+
+def _send(root: Path | str, events: list[bytes]) -> None:
+    """Send notifications to the listeners of a catalog.
+
+    :param root: The root of the file catalog.
+    :param events: The notifications.
+    """
+    if not _EVENTS_SUPPORTED or not events:
+        return
+    try:
+        sockets = list(os.scandir(events_directory(root)))
+    except FileNotFoundError:
+        return
+    if not sockets:
+        return
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+        sender.setblocking(False)
+        for entry in sockets:
+            for event in events:
+                try:
+                    sender.sendto(event, entry.path)
+                except BlockingIOError:
+                    # The listener has pending notifications already, it will wake up
+                    break
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # The listener stopped without removing its socket
+                    Path(entry.path).unlink(missing_ok=True)
+                    break
+                except OSError as e:
+                    logger.debug("Could not notify %s: %s", entry.path, e)
+                    break
+
+
+class CatalogEventListener:
+    """Wait for the files stored in a catalog.
+
+    :param root: The root of the file catalog.
+    """
+
+    def __init__(self, root: Path | str = "filecatalog"):
+        """Start listening."""
+        self._socket: socket.socket | None = None
+        self._path: Path | None = None
+        if not _EVENTS_SUPPORTED:
+            return
+        directory = events_directory(root)
+        directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self._path = directory / f"{os.getpid()}-{next(_listener_ids)}"
+        self._path.unlink(missing_ok=True)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(str(self._path))
+        self._socket.setblocking(False)
+
+    def wait(self, timeout: float) -> list[str]:
+        """Wait for files to be stored.
+
+        :param timeout: Maximum number of seconds to wait.
+        :return: The paths of the files notified, empty if none was notified in time.
+        """
+        if self._socket is None:
+            time.sleep(timeout)
+            return []
+        ready, _, _ = select.select([self._socket], [], [], timeout)
+        if not ready:
+            return []
+        return self._receive()
+
+    async def wait_async(self, timeout: float) -> list[str]:
+        """Wait for files to be stored, without blocking the event loop.
+
+        :param timeout: Maximum number of seconds to wait.
+        :return: The paths of the files notified, as returned by wait.
+        """
+        if self._socket is None:
+            await asyncio.sleep(timeout)
+            return []
+        loop = asyncio.get_running_loop()
+        readable = asyncio.Event()
+        loop.add_reader(self._socket.fileno(), readable.set)
+        try:
+            await asyncio.wait_for(readable.wait(), timeout)
+        except TimeoutError:
+            return []
+        finally:
+            loop.remove_reader(self._socket.fileno())
+        return self._receive()
+
+    def _receive(self) -> list[str]:
+        """Receive the pending notifications.
+
+        :return: The paths of the files notified.
+        """
+        assert self._socket is not None
+        paths = []
+        while True:
+            try:
+                paths.append(self._socket.recv(MAX_EVENT_SIZE).decode(errors="replace"))
+            except BlockingIOError:
+                return paths
+
+    def close(self) -> None:
+        """Stop listening."""
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        if self._path is not None:
+            self._path.unlink(missing_ok=True)
+            self._path = None
+
+    def __enter__(self) -> "CatalogEventListener":
+        """Use the listener as a context manager stopping it."""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop listening."""
+        self.close()
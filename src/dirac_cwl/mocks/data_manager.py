@@ -6,6 +6,7 @@ from DIRAC.DataManagementSystem.Client.DataManager import DataManager  # type: i
 from DIRAC.Resources.Storage.FileStorage import FileStorage  # type: ignore[import-untyped]
 from DIRACCommon.Core.Utilities.ReturnValues import S_ERROR, S_OK, returnSingleResult  # type: ignore[import-untyped]
 
+from dirac_cwl.mocks.catalog_events import publish
 from dirac_cwl.mocks.file_catalog import LocalFileCatalog
 
 
@@ -15,9 +16,29 @@ class MockDataManager(DataManager):
     def __init__(self):
         """Initialize the mock data manager with local file catalog."""
         self.base_storage_path = "filecatalog"
-        self.storage_element = FileStorage("local", {"Path": self.base_storage_path})
+        self.storage_element_name = "local"
+        self.storage_element = FileStorage(self.storage_element_name, {"Path": self.base_storage_path})
         self.fileCatalog = LocalFileCatalog()
 
+    def getActiveReplicas(self, lfns, getUrl=True, diskOnly=False, preferDisk=False):
+        """Get the active replicas of LFN(s).
+
+        :param lfns: a single LFN or list of LFNs.
+        :return: S_OK({"Successful": {lfn: {se: pfn}}, "Failed": {lfn: errMessage}})/S_ERROR(errMessage).
+        """
+        if isinstance(lfns, str):
+            lfns = [lfns]
+
+        success = {}
+        fail = {}
+        for lfn in lfns:
+            path = Path(self.base_storage_path) / str(lfn).removeprefix("lfn:").removeprefix("LFN:").removeprefix("/")
+            if path.exists():
+                success[lfn] = {self.storage_element_name: str(path)}
+            else:
+                fail[lfn] = "No such file or directory"
+        return S_OK({"Successful": success, "Failed": fail})
+
     def getFile(self, lfn, destinationDir=".", sourceSE=None, diskOnly=False):
         """Get local copy of LFN(s) from Storage Elements.
 
@@ -35,7 +56,8 @@ class MockDataManager(DataManager):
         else:
             return S_ERROR(f"wrong type for lfn: {lfn}, expected str or list[str]")
 
-        if not sourceSE:
+        # A single local storage element: names are resolved to it
+        if not sourceSE or isinstance(sourceSE, str):
             sourceSE = self.storage_element
 
         success = {}
@@ -96,4 +118,6 @@ class MockDataManager(DataManager):
         res = returnSingleResult(se.putFile({dest: fileName}))
         if not res["OK"]:
             return S_OK({"Successful": {}, "Failed": {lfn: res["Message"]}})
+        # Wake up the transformations waiting for this file
+        publish(self.base_storage_path, [path])
         return S_OK({"Successful": {lfn: res["Value"]}, "Failed": {}})
@@ -1,7 +1,11 @@
 """Mock file catalog implementations for local testing."""
 
 import json
+import sqlite3
+import threading
 import time
+from contextlib import contextmanager
+from itertools import groupby
 from pathlib import Path
 
 from DIRAC import S_ERROR, S_OK  # type: ignore[import-untyped]
@@ -53,16 +57,25 @@ class InMemoryFileCatalog(FileCatalog):
 
 
 class LocalFileCatalog(FileCatalog):
-    """File catalog implementation using local filesystem storage."""
+    """File catalog implementation using a local SQLite database.
 
-    def __init__(self, catalogs=None, vo=None):
+    Files and their metadata are stored in ``filecatalog/catalog.db``: updates are
+    transactional and indexed, so that several processes can register files
+    concurrently without rewriting the whole catalog.
+    """
+
+    def __init__(self, catalogs=None, vo=None, databasePath=None):
         """Initialize the local file catalog.
 
         :param catalogs: Catalog configuration (unused).
         :param vo: Virtual organization (unused).
+        :param databasePath: Path to the catalog database (default: filecatalog/catalog.db).
         """
         self._eligibleCatalogs = {"MyMockCatalog": {"Type": "MockFileCatalog", "Backend": "LocalFileSystem"}}
-        self._metadataPath = "filecatalog/metadata.json"
+        self._databasePath = Path(databasePath or "filecatalog/catalog.db")
+        # Catalog of the previous implementation, imported on first use
+        self._metadataPath = self._databasePath.with_name("metadata.json")
+        self._local = threading.local()
         super(FileCatalog, self).__init__()
 
     def _getEligibleCatalogs(self):
@@ -72,61 +85,268 @@ class LocalFileCatalog(FileCatalog):
         """
         return S_OK(self._eligibleCatalogs)
 
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+
     def getFileMetadata(self, lfn):
-        """Get metadata for a file.
+        """Get metadata for file(s).
 
-        :param lfn: Logical file name.
+        :param lfn: Logical file name or list of logical file names.
         :return: S_OK with metadata dict or failed dict.
         """
-        metaAll = self._getAllMetadata()
-        if lfn not in metaAll:
-            return S_OK({"Successful": {}, "Failed": {lfn: f"File {lfn} not found"}})
-        return S_OK({"Successful": {lfn: metaAll[lfn]}, "Failed": {}})
+        lfns = _asList(lfn)
+        successful = {}
+        failed = {}
+        for key, metadata in zip(lfns, self._getMetadata([_normalizeLFN(lfn) for lfn in lfns])):
+            if metadata is None:
+                failed[key] = f"File {key} not found"
+            else:
+                successful[key] = metadata
+        return S_OK({"Successful": successful, "Failed": failed})
+
+    def listDirectory(self, path):
+        """List the files and subdirectories of directory(ies).
+
+        :param path: Directory path or list of directory paths.
+        :return: S_OK with the files (and their metadata) and subdirectories of each directory.
+        """
+        successful = {}
+        for directory in _asList(path):
+            prefix = _normalizeLFN(directory).rstrip("/") + "/"
+            files = {}
+            subDirs = {}
+            for lfn, metadata in self._iterFiles(prefix):
+                name, _, rest = lfn[len(prefix) :].partition("/")
+                if rest:
+                    subDirs[prefix + name] = True
+                else:
+                    files[lfn] = {"MetaData": metadata}
+            successful[directory] = {"Files": files, "SubDirs": subDirs}
+        return S_OK({"Successful": successful, "Failed": {}})
+
+    def findFilesByMetadata(self, metaDict, path="/"):
+        """Find the files matching all the given metadata values.
+
+        :param metaDict: Metadata keys and the values they must have.
+        :param path: Only consider the files under this directory.
+        :return: S_OK with the list of matching LFNs.
+        """
+        prefix = _normalizeLFN(path).rstrip("/") + "/"
+        query = "SELECT lfn FROM files WHERE lfn >= ? AND lfn < ?"
+        params: list = [prefix, prefix + _PREFIX_UPPER_BOUND]
+        for key, value in metaDict.items():
+            query += " AND file_id IN (SELECT file_id FROM metadata WHERE key = ? AND value = ?)"
+            params.extend((key, json.dumps(value)))
+        try:
+            rows = self._connection().execute(query + " ORDER BY lfn", params).fetchall()
+        except sqlite3.Error as e:
+            return S_ERROR(f"Could not query the catalog: {e}")
+        return S_OK([row[0] for row in rows])
+
+    # -------------------------------------------------------------------------
+    # Updates
+    # -------------------------------------------------------------------------
 
     def addFile(self, lfn):
-        """Add a file to the catalog.
+        """Add file(s) to the catalog.
 
-        :param lfn: Logical file name.
-        :return: S_OK with success/failed dict or S_ERROR if file exists.
+        :param lfn: Logical file name or list of logical file names.
+        :return: S_OK with success/failed dict or S_ERROR if a single file exists.
         """
-        if lfn in self._getAllMetadata():
-            return S_ERROR(f"File {lfn} already exists")
-        self.setMetadata(lfn, {"CreationDate": time.time()})
-        return S_OK({"Successful": {lfn: True}, "Failed": {}})
+        lfns = _asList(lfn)
+        successful = {}
+        failed = {}
+        creationDate = json.dumps(time.time())
+        try:
+            with self._transaction() as connection:
+                for key in lfns:
+                    cursor = connection.execute(
+                        "INSERT INTO files (lfn) VALUES (?) ON CONFLICT (lfn) DO NOTHING", (_normalizeLFN(key),)
+                    )
+                    if not cursor.rowcount:
+                        failed[key] = f"File {key} already exists"
+                        continue
+                    connection.execute(
+                        "INSERT INTO metadata (file_id, key, value) VALUES (?, 'CreationDate', ?)",
+                        (cursor.lastrowid, creationDate),
+                    )
+                    successful[key] = True
+        except sqlite3.Error as e:
+            return S_ERROR(f"Could not add files: {e}")
+
+        if isinstance(lfn, (str, Path)) and failed:
+            return S_ERROR(failed[lfn])
+        return S_OK({"Successful": successful, "Failed": failed})
 
     def setMetadata(self, lfn, metadataDict):
-        """Set metadata for a file.
+        """Set metadata for a file, replacing its previous metadata.
 
         :param lfn: Logical file name.
         :param metadataDict: Metadata dictionary to set.
         :return: S_OK with success/failed dict or S_ERROR on failure.
         """
-        meta = self._getAllMetadata()
-        meta[lfn] = metadataDict
+        return self.setMetadataBulk({lfn: metadataDict})
+
+    def setMetadataBulk(self, pathMetadataDict):
+        """Set metadata for several files in a single transaction, replacing their previous metadata.
 
+        :param pathMetadataDict: Metadata dictionary to set for each logical file name.
+        :return: S_OK with success/failed dict or S_ERROR on failure.
+        """
         try:
-            self._setAllMetadata(meta)
-        except Exception as e:
+            with self._transaction() as connection:
+                for lfn, metadataDict in pathMetadataDict.items():
+                    self._replaceMetadata(connection, _normalizeLFN(lfn), metadataDict)
+        except (sqlite3.Error, TypeError, ValueError) as e:
             return S_ERROR(f"Could set metadata: {e}")
-        return S_OK({"Successful": {lfn: True}, "Failed": {}})
+        return S_OK({"Successful": {lfn: True for lfn in pathMetadataDict}, "Failed": {}})
+
+    # -------------------------------------------------------------------------
+    # Storage
+    # -------------------------------------------------------------------------
 
-    def _getAllMetadata(self):
-        """Get all metadata from the local file.
+    def _connection(self):
+        """Get the database connection of the current thread, creating the database if needed.
 
-        :return: Dictionary of all file metadata.
+        :return: The SQLite connection.
         """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self._databasePath.parent.mkdir(parents=True, exist_ok=True)
+            # Autocommit mode: transactions are explicitly started by _transaction
+            connection = sqlite3.connect(self._databasePath, timeout=_BUSY_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+            self._importLegacyMetadata()
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements in a write transaction.
+
+        The write lock is taken when the transaction starts, so that concurrent
+        writers wait for each other rather than fail on upgrade.
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
         try:
-            with open(self._metadataPath, "r") as file:
-                meta = json.load(file)
-        except Exception:
-            meta = {}
-        return meta
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _replaceMetadata(self, connection, lfn, metadataDict):
+        """Replace the metadata of a file, adding the file if needed.
+
+        :param connection: The connection, within a transaction.
+        :param lfn: Normalized logical file name.
+        :param metadataDict: Metadata dictionary to set.
+        """
+        connection.execute("INSERT INTO files (lfn) VALUES (?) ON CONFLICT (lfn) DO NOTHING", (lfn,))
+        (fileId,) = connection.execute("SELECT file_id FROM files WHERE lfn = ?", (lfn,)).fetchone()
+        connection.execute("DELETE FROM metadata WHERE file_id = ?", (fileId,))
+        connection.executemany(
+            "INSERT INTO metadata (file_id, key, value) VALUES (?, ?, ?)",
+            [(fileId, key, json.dumps(value)) for key, value in metadataDict.items()],
+        )
+
+    def _getMetadata(self, lfns):
+        """Get the metadata of files.
+
+        :param lfns: Normalized logical file names.
+        :return: The metadata of each file, None for unknown files.
+        """
+        connection = self._connection()
+        metadata = {}
+        for index in range(0, len(lfns), _QUERY_BATCH_SIZE):
+            batch = lfns[index : index + _QUERY_BATCH_SIZE]
+            rows = connection.execute(
+                "SELECT files.lfn, metadata.key, metadata.value FROM files "
+                "LEFT JOIN metadata ON metadata.file_id = files.file_id "
+                f"WHERE files.lfn IN ({', '.join('?' * len(batch))})",
+                batch,
+            )
+            for lfn, key, value in rows:
+                fileMetadata = metadata.setdefault(lfn, {})
+                if key is not None:
+                    fileMetadata[key] = json.loads(value)
+        return [metadata.get(lfn) for lfn in lfns]
 
-    def _setAllMetadata(self, metadata):
-        """Save all metadata to the local file.
+    def _iterFiles(self, prefix):
+        """Iterate over the files whose LFN starts with a prefix, with their metadata.
 
-        :param metadata: Dictionary of file metadata to save.
+        :param prefix: The prefix of the LFNs.
+        :return: Iterator of (lfn, metadata).
         """
-        Path(self._metadataPath).parent.mkdir(parents=True, exist_ok=True)
-        with open(self._metadataPath, "w+") as file:
-            json.dump(metadata, file)
+        rows = self._connection().execute(
+            "SELECT files.lfn, metadata.key, metadata.value FROM files "
+            "LEFT JOIN metadata ON metadata.file_id = files.file_id "
+            "WHERE files.lfn >= ? AND files.lfn < ? ORDER BY files.lfn",
+            (prefix, prefix + _PREFIX_UPPER_BOUND),
+        )
+        for lfn, group in groupby(rows, key=lambda row: row[0]):
+            yield lfn, {key: json.loads(value) for _, key, value in group if key is not None}
+
+    def _importLegacyMetadata(self):
+        """Import the JSON catalog of the previous implementation, if any."""
+        if not self._metadataPath.exists():
+            return
+        with self._transaction() as connection:
+            # Another process may have imported it in the meantime
+            if not self._metadataPath.exists():
+                return
+            try:
+                with open(self._metadataPath, "r") as file:
+                    legacy = json.load(file)
+            except ValueError:
+                legacy = {}
+            for lfn, metadataDict in legacy.items():
+                self._replaceMetadata(connection, _normalizeLFN(lfn), metadataDict)
+            self._metadataPath.rename(self._metadataPath.with_name(self._metadataPath.name + ".imported"))
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_id INTEGER PRIMARY KEY,
+    lfn TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    file_id INTEGER NOT NULL REFERENCES files (file_id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (file_id, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS metadata_key_value ON metadata (key, value);
+"""
+
+# Seconds to wait for the lock of the database held by another writer
+_BUSY_TIMEOUT = 60.0
+# Maximum number of LFNs per query, below the SQLite limit of variables
+_QUERY_BATCH_SIZE = 500
+# Greater than any character of an LFN: [prefix, prefix + bound) is the range of LFNs starting with prefix
+_PREFIX_UPPER_BOUND = "\U0010ffff"
+
+
+def _asList(lfn):
+    """Get a list of LFNs from a single LFN or a collection of LFNs.
+
+    :param lfn: Logical file name or collection of logical file names.
+    :return: List of logical file names.
+    """
+    if isinstance(lfn, (str, Path)):
+        return [lfn]
+    return list(lfn)
+
+
+def _normalizeLFN(lfn):
+    """Get the path of an LFN, without its scheme.
+
+    :param lfn: Logical file name.
+    :return: The normalized logical file name.
+    """
+    return str(lfn).removeprefix("lfn:").removeprefix("LFN:")
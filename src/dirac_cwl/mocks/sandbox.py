@@ -6,7 +6,7 @@ import os
 import tarfile
 import tempfile
 from pathlib import Path
-from typing import Literal, Sequence
+from typing import IO, Literal, Sequence, cast
 
 import zstandard
 from diracx.core.models.sandbox import SandboxInfo
@@ -21,59 +21,142 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
 SANDBOX_STORE_DIR = PROJECT_ROOT / "sandboxstore"
 
 
-async def create_sandbox(paths: Sequence[str | Path]):
+#: Default zstd compression level of the sandboxes
+SANDBOX_COMPRESSION_LEVEL = 18
+#: Default number of zstd compression threads (0: compress in the calling thread, -1: one per core)
+SANDBOX_COMPRESSION_THREADS = 0
+# Directory of the sandbox store mapping the state of input files to the sandbox archiving them
+SANDBOX_INDEX_DIR_NAME = ".index"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class _HashingWriter:
+    """File-like object hashing the data written to an underlying file."""
+
+    def __init__(self, fileobj, hasher):
+        self._fileobj = fileobj
+        self._hasher = hasher
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._hasher.update(data)
+        self.size += len(data)
+        return self._fileobj.write(data)
+
+    def flush(self) -> None:
+        self._fileobj.flush()
+
+
+def _input_state_key(paths: Sequence[Path], compression_level: int, threads: int) -> str:
+    """Compute a key identifying the state of the files to archive.
+
+    The key covers the archive names, paths, sizes and modification times of all the
+    files (recursively), so any change to the inputs leads to a different key.
+
+    :param paths: The paths given to create_sandbox.
+    :param compression_level: The compression level of the archive.
+    :param threads: The number of compression threads.
+    :return: The hexadecimal key.
+    """
+    hasher = hashlib.sha256(f"{compression_level}:{threads}".encode())
+    for path in paths:
+        resolved = path.resolve()
+        entries = [(path.name, resolved)]
+        if resolved.is_dir():
+            entries.extend(
+                (f"{path.name}/{child.relative_to(resolved)}", child) for child in sorted(resolved.rglob("*"))
+            )
+        for arcname, entry in entries:
+            stat = entry.stat()
+            hasher.update(f"{arcname}\0{entry}\0{stat.st_mode}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return hasher.hexdigest()
+
+
+async def create_sandbox(
+    paths: Sequence[str | Path],
+    compression_level: int = SANDBOX_COMPRESSION_LEVEL,
+    threads: int = SANDBOX_COMPRESSION_THREADS,
+):
     """Upload a sandbox archive to the sandboxstore.
 
+    The archive is compressed and hashed in a single pass, straight into the store,
+    and renamed once complete. Archiving the same unchanged files again is skipped.
+
     :param paths: File paths to be uploaded in the sandbox.
+    :param compression_level: zstd compression level.
+    :param threads: Number of zstd compression threads.
     """
-    with tempfile.TemporaryFile(mode="w+b") as tar_fh:
-        # Create zstd compressed tar with level 18 and long matching enabled
-        compression_params = zstandard.ZstdCompressionParameters.from_level(18, enable_ldm=1)
-        cctx = zstandard.ZstdCompressor(compression_params=compression_params)
-        with cctx.stream_writer(tar_fh, closefd=False) as compressor:
-            with tarfile.open(fileobj=compressor, mode="w|") as tf:
-                for path in paths:
-                    if isinstance(path, str):
-                        path = Path(path)
-                    logger.debug("Adding %s to sandbox as %s", path.resolve(), path.name)
-                    tf.add(path.resolve(), path.name, recursive=True)
-        tar_fh.seek(0)
-
-        # Generate sandbox checksum
-        hasher = getattr(hashlib, SANDBOX_CHECKSUM_ALGORITHM)()
-        while data := tar_fh.read(512 * 1024):
-            hasher.update(data)
-        checksum = hasher.hexdigest()
-        tar_fh.seek(0)
-        logger.debug("Sandbox checksum is %s", checksum)
-
-        # Store sandbox info
-        sandbox_info = SandboxInfo(
-            checksum_algorithm=SANDBOX_CHECKSUM_ALGORITHM,
-            checksum=checksum,
-            size=os.stat(tar_fh.fileno()).st_size,
-            format=f"tar.{SANDBOX_COMPRESSION}",
-        )
-
-        # Create PFN
-        pfn = f"{sandbox_info.checksum_algorithm}:{sandbox_info.checksum}.{sandbox_info.format}"
-        logger.debug("Sandbox PFN is %s", pfn)
-
-        # Create sandbox in sandboxstore
-        SANDBOX_STORE_DIR.mkdir(exist_ok=True)
-        sandbox_path = SANDBOX_STORE_DIR / pfn
-        if not sandbox_path.exists():
-            with tarfile.open(sandbox_path, "w:gz") as tar:
-                for file in paths:
-                    if not file:
-                        break
-                    if isinstance(file, str):
-                        file = Path(file)
-                    tar.add(file, arcname=file.name)
-            logger.debug("Sandbox uploaded for %s", pfn)
-        else:
+    sandbox_paths = [Path(path) for path in paths if path]
+
+    SANDBOX_STORE_DIR.mkdir(exist_ok=True)
+    index_dir = SANDBOX_STORE_DIR / SANDBOX_INDEX_DIR_NAME
+    index_dir.mkdir(exist_ok=True)
+
+    # Skip the archiving if the same files have already been uploaded
+    index_path = index_dir / _input_state_key(sandbox_paths, compression_level, threads)
+    if index_path.exists():
+        pfn = index_path.read_text()
+        if (SANDBOX_STORE_DIR / pfn).exists():
             logger.debug("Sandbox already exists for %s", pfn)
-        return pfn
+            return pfn
+
+    hasher = getattr(hashlib, SANDBOX_CHECKSUM_ALGORITHM)()
+    with tempfile.NamedTemporaryFile(
+        mode="wb", dir=SANDBOX_STORE_DIR, prefix=".tmp-", suffix=".part", delete=False
+    ) as tar_fh:
+        try:
+            # Create zstd compressed tar with long matching enabled, hashing it on the fly
+            writer = _HashingWriter(tar_fh, hasher)
+            compression_params = zstandard.ZstdCompressionParameters.from_level(
+                compression_level, enable_ldm=1, threads=threads
+            )
+            cctx = zstandard.ZstdCompressor(compression_params=compression_params)
+            with cctx.stream_writer(cast(IO[bytes], writer), closefd=False) as compressor:
+                with tarfile.open(fileobj=compressor, mode="w|") as tf:
+                    for path in sandbox_paths:
+                        logger.debug("Adding %s to sandbox as %s", path.resolve(), path.name)
+                        tf.add(path.resolve(), path.name, recursive=True)
+        except BaseException:
+            os.unlink(tar_fh.name)
+            raise
+
+    checksum = hasher.hexdigest()
+    logger.debug("Sandbox checksum is %s", checksum)
+
+    # Store sandbox info
+    sandbox_info = SandboxInfo(
+        checksum_algorithm=SANDBOX_CHECKSUM_ALGORITHM,
+        checksum=checksum,
+        size=writer.size,
+        format=f"tar.{SANDBOX_COMPRESSION}",
+    )
+
+    # Create PFN
+    pfn = f"{sandbox_info.checksum_algorithm}:{sandbox_info.checksum}.{sandbox_info.format}"
+    logger.debug("Sandbox PFN is %s", pfn)
+
+    # Move the complete archive to its final location
+    sandbox_path = SANDBOX_STORE_DIR / pfn
+    if not sandbox_path.exists():
+        os.replace(tar_fh.name, sandbox_path)
+        logger.debug("Sandbox uploaded for %s", pfn)
+    else:
+        os.unlink(tar_fh.name)
+        logger.debug("Sandbox already exists for %s", pfn)
+
+    _write_atomically(index_path, pfn)
+    return pfn
+
+
+def _write_atomically(path: Path, content: str) -> None:
+    """Write a file, so that readers see either nothing or its whole content.
+
+    :param path: The file to write.
+    :param content: The content of the file.
+    """
+    with tempfile.NamedTemporaryFile("w", dir=path.parent, prefix=".tmp-", delete=False) as f:
+        f.write(content)
+    os.replace(f.name, path)
 
 
 async def download_sandbox(pfn: str, destination: Path):
@@ -84,6 +167,15 @@ async def download_sandbox(pfn: str, destination: Path):
     """
     logger.debug("Retrieving sandbox for %s", pfn)
     sandbox_archive = SANDBOX_STORE_DIR / pfn
-    with tarfile.open(sandbox_archive) as tf:
-        tf.extractall(path=Path(destination), filter="data")
+    with open(sandbox_archive, "rb") as fh:
+        if fh.read(len(_ZSTD_MAGIC)) == _ZSTD_MAGIC:
+            # Decompress while extracting, tarfile does not support zstd
+            fh.seek(0)
+            with zstandard.ZstdDecompressor().stream_reader(fh) as reader:
+                with tarfile.open(fileobj=reader, mode="r|") as tf:
+                    tf.extractall(path=Path(destination), filter="data")
+        else:
+            # Sandboxes created before the store was zstd compressed
+            with tarfile.open(sandbox_archive) as tf:
+                tf.extractall(path=Path(destination), filter="data")
     logger.debug("Extracted %s to %s", pfn, destination)
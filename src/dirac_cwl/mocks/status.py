@@ -1,6 +1,7 @@
 """Mock for status reports."""
 
 from pathlib import Path
+from types import SimpleNamespace
 
 from dirac_cwl.job.job_report import JobReport
 
@@ -8,14 +9,17 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
 STATUS_DIR = PROJECT_ROOT / "status"
 
 
-class JobReportMock(JobReport):
-    """Mock JobReport."""
+def write_status_file(job_id: int, job_status_info: dict[str, dict], append: bool = False) -> None:
+    """Write the status updates of a job to its status file.
 
-    async def send_stored_status_info(self):
-        """Mock sendStoredStatusInfo."""
-        STATUS_DIR.mkdir(exist_ok=True)
-        file_path = STATUS_DIR / f"status_{self.job_id}"
-        with open(file_path, "w+") as f:
+    :param job_id: The job ID
+    :param job_status_info: The updates, by timestamp
+    :param append: Add the updates to the file instead of replacing it
+    """
+    STATUS_DIR.mkdir(exist_ok=True)
+    file_path = STATUS_DIR / f"status_{job_id}"
+    with open(file_path, "a" if append else "w+") as f:
+        if f.tell() == 0:
             f.write(
                 " | ".join(
                     (
@@ -29,20 +33,56 @@ class JobReportMock(JobReport):
                 + "\n"
             )
             f.write(" | ".join(("-" * 32, "-" * 10, "-" * 20, "-" * 35, "-" * 18)) + "\n")
-            for timestamp, info in self.job_status_info.items():
-                status = info["Status"] or ""
-                minor_status = info["MinorStatus"] or ""
-                application_status = info["ApplicationStatus"] or ""
-                source = info["Source"] or ""
-                f.write(
-                    " | ".join(
-                        (
-                            timestamp.ljust(32),
-                            source.ljust(10),
-                            status.ljust(20),
-                            minor_status.ljust(35),
-                            application_status,
-                        )
+        for timestamp, info in job_status_info.items():
+            status = info["Status"] or ""
+            minor_status = info["MinorStatus"] or ""
+            application_status = info["ApplicationStatus"] or ""
+            source = info["Source"] or ""
+            f.write(
+                " | ".join(
+                    (
+                        timestamp.ljust(32),
+                        source.ljust(10),
+                        status.ljust(20),
+                        minor_status.ljust(35),
+                        application_status,
                     )
-                    + "\n"
                 )
+                + "\n"
+            )
+
+
+class JobReportMock(JobReport):
+    """Mock JobReport."""
+
+    async def send_stored_status_info(self):
+        """Mock sendStoredStatusInfo."""
+        write_status_file(self.job_id, self.job_status_info)
+
+
+class StatusClientMock:
+    """Mock DiracX client receiving the job statuses, writing them to the status files of the jobs.
+
+    Used as the client of the job status aggregator, as an async context manager.
+    """
+
+    def __init__(self):
+        """Initialize the mock client."""
+        self.jobs = self
+
+    async def __aenter__(self) -> "StatusClientMock":
+        """Open the client."""
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Close the client."""
+
+    async def set_job_statuses(self, body: dict[int, dict[str, dict]]) -> SimpleNamespace:
+        """Add the updates of each job to its status file.
+
+        :param body: The updates of the jobs, by job and timestamp
+        :return: The result of the call
+        """
+        for job_id, job_status_info in body.items():
+            write_status_file(job_id, job_status_info, append=True)
+        return SimpleNamespace(success=True)
@@ -5,9 +5,9 @@ This module provides:
 - CLI interface to run a workflow as a production
 """
 
+import asyncio
 import logging
 import os
-from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
 
 import typer
@@ -29,9 +29,7 @@ from dirac_cwl.submission_models import (
     ProductionSubmissionModel,
     TransformationSubmissionModel,
 )
-from dirac_cwl.transformation import (
-    submit_transformation_router,
-)
+from dirac_cwl.transformation.scheduler import TransformationScheduler, build_dag
 
 # Plugin system exports
 from .core import InputDatasetPluginBase, ProductionHint
@@ -41,16 +39,9 @@ from .registry import (
     get_registry,
 )
 
-# Initialize the registry and discover plugins
+# The plugins are discovered on the first lookup in the registry
 _registry = get_registry()
 
-# Auto-discover plugins on import
-try:
-    discover_plugins()
-except Exception:
-    # Fail silently if plugin discovery fails during import
-    pass
-
 __all__ = [
     # Plugin system
     "ProductionHint",
@@ -79,6 +70,9 @@ def submit_production_client(
     chunk: str | None = typer.Option(None, help="Split an array input into jobs: PARAM=SIZE (e.g., input-data=3)"),
     # Specific parameter for the purpose of the prototype
     local: Optional[bool] = typer.Option(True, help="Run the job locally instead of submitting it to the router"),
+    max_parallel_jobs: int | None = typer.Option(
+        None, min=1, help="Maximum number of jobs run in parallel by the local router (default: number of cores)"
+    ),
 ):
     """
     Correspond to the dirac-cli command to submit productions.
@@ -147,7 +141,7 @@ def submit_production_client(
     # Submit the transformation
     console.print("[blue]:information_source:[/blue] [bold]CLI:[/bold] Submitting the production...")
     print_json(production.model_dump_json(indent=4))
-    if not submit_production_router(production):
+    if not submit_production_router(production, max_parallel_jobs=max_parallel_jobs):
         console.print("[red]:heavy_multiplication_x:[/red] [bold]CLI:[/bold] Failed to run production.")
         return typer.Exit(code=1)
     console.print("[green]:heavy_check_mark:[/green] [bold]CLI:[/bold] Production done.")
@@ -158,10 +152,15 @@ def submit_production_client(
 # -----------------------------------------------------------------------------
 
 
-def submit_production_router(production: ProductionSubmissionModel) -> bool:
+def submit_production_router(production: ProductionSubmissionModel, max_parallel_jobs: int | None = None) -> bool:
     """Submit a production to the router.
 
+    The transformations run concurrently, following the dependencies between
+    the steps of the production.
+
     :param production: The production to submit
+    :param max_parallel_jobs: Maximum number of jobs running at the same time,
+        defaults to the number of cores available to the router
 
     :return: True if the production was submitted successfully, False otherwise
     """
@@ -179,8 +178,10 @@ def submit_production_router(production: ProductionSubmissionModel) -> bool:
 
     # Submit the transformations
     logger.info("Submitting transformations...")
-    with ThreadPoolExecutor() as executor:
-        results = list(executor.map(submit_transformation_router, transformations))
+    scheduler = TransformationScheduler(
+        build_dag(transformations, _get_upstream_steps(production.task)), max_parallel_jobs=max_parallel_jobs
+    )
+    results = asyncio.run(scheduler.run())
 
     return all(results)
 
@@ -206,6 +207,28 @@ def _get_transformations(
     return transformations
 
 
+def _get_upstream_steps(workflow: Workflow) -> List[set[int]]:
+    """Find the steps consuming the outputs of other steps.
+
+    :param workflow: The production workflow
+
+    :return: For each step, the indexes of the steps producing its inputs
+    """
+    indexes = {step.id.split("#")[-1].split("/")[-1]: index for index, step in enumerate(workflow.steps)}
+    upstream_steps = []
+    for step in workflow.steps:
+        upstream = set()
+        for step_in in step.in_:
+            sources = step_in.source if isinstance(step_in.source, list) else [step_in.source]
+            for source in filter(None, sources):
+                # Step outputs are referenced as <step>/<output>
+                parts = source.split("#")[-1].split("/")
+                if len(parts) > 1 and parts[-2] in indexes:
+                    upstream.add(indexes[parts[-2]])
+        upstream_steps.append(upstream)
+    return upstream_steps
+
+
 def _create_subworkflow(
     wf_step: WorkflowStep, cwlVersion: str, inputs: List[WorkflowInputParameter]
 ) -> Workflow | CommandLineTool | ExpressionTool:
@@ -228,6 +251,7 @@ def _create_subworkflow(
             outputs=wf_step.run.outputs,
             steps=wf_step.run.steps,
             requirements=wf_step.run.requirements,
+            hints=wf_step.run.hints,
         )
     else:
         # Handle command line tools
@@ -238,6 +262,7 @@ def _create_subworkflow(
             inputs=wf_step.run.inputs,
             outputs=wf_step.run.outputs,
             requirements=wf_step.run.requirements,
+            hints=wf_step.run.hints,
         )
 
     # Add the default value to the inputs if any
@@ -24,7 +24,7 @@ class InputDatasetPluginBase(ABC):
     Subclasses must implement the `generate_inputs` method.
     """
 
-    vo: ClassVar[str] = "generic"
+    vo: ClassVar[str | None] = "generic"
     version: ClassVar[str] = "1.0.0"
     description: ClassVar[str] = "Base input dataset plugin"
 
@@ -10,25 +10,28 @@ import logging
 from importlib.metadata import entry_points
 from typing import Any
 
+from dirac_cwl.core.entry_points import EntryPointsCache, EntryPointsPluginRegistry
+
 from .core import InputDatasetPluginBase, ProductionHint
 
 logger = logging.getLogger(__name__)
 
 
-class InputDatasetPluginRegistry:
+class InputDatasetPluginRegistry(EntryPointsPluginRegistry[InputDatasetPluginBase]):
     """Registry for input dataset plugins.
 
     This class manages the registration and retrieval of input dataset plugins.
     Plugins are discovered via entry points and can be retrieved by name.
+
+    :param lazy_discovery: Discover the plugins of the entry points on the first
+        use of the registry, instead of waiting for discover_plugins to be called.
+    :param cache: Cache of the plugins discovered: the plugins it holds are only
+        imported when they are looked up.
     """
 
     ENTRY_POINT_GROUP = "dirac_cwl.input_dataset_plugins"
-
-    def __init__(self) -> None:
-        """Initialize the input dataset plugin registry."""
-        self._plugins: dict[str, type[InputDatasetPluginBase]] = {}
-        self._vo_plugins: dict[str, dict[str, type[InputDatasetPluginBase]]] = {}
-        self._plugin_info: dict[str, dict[str, Any]] = {}
+    PLUGIN_BASE = InputDatasetPluginBase
+    GENERIC_VO = "generic"
 
     def register_plugin(self, plugin_class: type[InputDatasetPluginBase], override: bool = False) -> None:
         """Register an input dataset plugin.
@@ -39,17 +42,13 @@ class InputDatasetPluginRegistry:
         """
         if not issubclass(plugin_class, InputDatasetPluginBase):
             raise ValueError(f"Plugin {plugin_class} must inherit from InputDatasetPluginBase")
+        # The plugins of the entry points come first, as when they are discovered on import
+        self._ensure_discovered()
 
         plugin_key = plugin_class.name()
         vo = plugin_class.vo
 
-        if plugin_key in self._plugins and not override:
-            existing = self._plugins[plugin_key]
-            raise ValueError(
-                f"Plugin '{plugin_key}' already registered by "
-                f"{existing.__module__}.{existing.__name__}. "
-                f"Use override=True to replace."
-            )
+        self._check_override(plugin_key, override)
 
         self._plugins[plugin_key] = plugin_class
         self._plugin_info[plugin_key] = plugin_class.get_schema_info()
@@ -68,19 +67,6 @@ class InputDatasetPluginRegistry:
             vo_suffix,
         )
 
-    def get_plugin(self, plugin_key: str, vo: str | None = None) -> type[InputDatasetPluginBase] | None:
-        """Get a registered plugin by name.
-
-        :param plugin_key: The plugin identifier.
-        :param vo: Virtual Organization namespace to search first.
-        :return: The plugin class or None if not found.
-        """
-        if vo and vo in self._vo_plugins:
-            if plugin_key in self._vo_plugins[vo]:
-                return self._vo_plugins[vo][plugin_key]
-
-        return self._plugins.get(plugin_key)
-
     def instantiate(self, hint: ProductionHint, **kwargs: Any) -> InputDatasetPluginBase:
         """Instantiate a plugin from a ProductionHint.
 
@@ -104,52 +90,35 @@ class InputDatasetPluginRegistry:
         except Exception as e:
             raise ValueError(f"Failed to instantiate plugin '{hint.input_dataset_plugin}': {e}") from e
 
-    def list_plugins(self, vo: str | None = None) -> list[str]:
-        """List available plugins.
+    def _scan_entry_points(self) -> tuple[list[type[InputDatasetPluginBase]], bool]:
+        """Import the plugins of the entry points.
 
-        :param vo: Filter by Virtual Organization.
-        :return: List of available plugin names.
-        """
-        if vo and vo in self._vo_plugins:
-            return list(self._vo_plugins[vo].keys())
-        return list(self._plugins.keys())
-
-    def list_virtual_organizations(self) -> list[str]:
-        """List Virtual Organizations with registered plugins."""
-        return list(self._vo_plugins.keys())
-
-    def get_plugin_info(self, plugin_key: str) -> dict[str, Any] | None:
-        """Get detailed information about a plugin."""
-        return self._plugin_info.get(plugin_key)
-
-    def discover_plugins(self) -> int:
-        """Discover and register plugins from entry points.
-
-        :return: Number of plugins discovered and registered.
+        :return: The plugin classes, and whether all the entry points were plugins.
         """
         eps = entry_points(group=self.ENTRY_POINT_GROUP)
-        discovered = 0
+        plugin_classes: list[type[InputDatasetPluginBase]] = []
+        complete = True
 
         for ep in eps:
             try:
                 plugin_class = ep.load()
                 if issubclass(plugin_class, InputDatasetPluginBase):
-                    self.register_plugin(plugin_class)
-                    discovered += 1
+                    plugin_classes.append(plugin_class)
                 else:
+                    complete = False
                     logger.warning(
                         "Entry point '%s' does not inherit from %s",
                         ep.name,
                         InputDatasetPluginBase.__name__,
                     )
             except Exception as e:
+                complete = False
                 logger.error("Failed to load plugin %s: %s", ep.name, e)
-
-        return discovered
+        return plugin_classes, complete
 
 
-# Global registry instance
-_registry = InputDatasetPluginRegistry()
+# Global registry instance, discovering the plugins when first used
+_registry = InputDatasetPluginRegistry(lazy_discovery=True, cache=EntryPointsCache.load())
 
 
 def get_registry() -> InputDatasetPluginRegistry:
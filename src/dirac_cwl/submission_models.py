@@ -99,6 +99,17 @@ class JobModel(BaseJobModel):
     input: Optional[JobInputModel] = None
 
 
+class JobReferenceModel(BaseModel):
+    """Job definition referring to a task document shared by the jobs of a batch.
+
+    The task is identified by the SHA-256 digest of its serialized document,
+    so that it is written once per submission rather than once per job.
+    """
+
+    task_digest: str
+    input: Optional[JobInputModel] = None
+
+
 # -----------------------------------------------------------------------------
 # Transformation models
 # -----------------------------------------------------------------------------
@@ -0,0 +1,291 @@
+"""Incremental feeding of a transformation with its input files.
+
+The input files of each transformation are recorded in a SQLite database with
+their state, so that a file is assigned to a single group of a single job and
+is not processed again when the transformation is restarted. Each poll only
+lists the query directories that changed since the previous one, and only
+records the files that appeared meanwhile.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Sequence
+from contextlib import contextmanager
+from enum import StrEnum
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+#: Directory of the files matched by the input queries
+FILE_CATALOG_ROOT = Path("filecatalog")
+#: Database of the transformation files
+DEFAULT_DATABASE_PATH = FILE_CATALOG_ROOT / "transformations.db"
+
+
+class FileStatus(StrEnum):
+    """State of an input file of a transformation."""
+
+    UNUSED = "Unused"
+    ASSIGNED = "Assigned"
+    PROCESSED = "Processed"
+    FAILED = "Failed"
+
+
+class TransformationFeeder:
+    """Discover the new input files of a transformation and group them for its jobs.
+
+    :param transformation_id: Identifier of the transformation, its files are kept under it
+    :param input_query: Directory or directories, relative to the file catalog root, containing the input files
+    :param group_size: Number of input files of each job
+    :param database_path: Path to the database of the transformation files
+    :param root: Root of the file catalog
+    :param group_target: Total weight of the files of each group, groups of group_size files if not given
+    :param weigh: Weigh files given by their paths, each file weighing 1 if not given
+    """
+
+    def __init__(
+        self,
+        transformation_id: str,
+        input_query: Path | list[Path],
+        group_size: int,
+        database_path: Path = DEFAULT_DATABASE_PATH,
+        root: Path = FILE_CATALOG_ROOT,
+        group_target: float | None = None,
+        weigh: Callable[[Sequence[str]], list[float]] | None = None,
+    ):
+        """Open the database and load the files already known."""
+        self.transformation_id = transformation_id
+        self.queries = [input_query] if isinstance(input_query, Path) else list(input_query)
+        self.group_size = group_size
+        self.group_target = group_target
+        self.weigh = weigh
+        self.root = root
+        # Weight of the unused files, weighed once
+        self._weights: dict[str, float] = {}
+        self.database_path = database_path
+        self._lock = threading.Lock()
+        # Modification time of each query directory when it was last listed
+        self._listed: dict[Path, int] = {}
+
+        database_path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode: transactions are explicitly started by _transaction
+        self._connection = sqlite3.connect(
+            database_path, timeout=_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+        with self._transaction() as connection:
+            # The groups assigned by a router that stopped before they ran are assigned again
+            connection.execute(
+                "UPDATE transformation_files SET status = ?, group_id = NULL WHERE transformation = ? AND status = ?",
+                (FileStatus.UNUSED, transformation_id, FileStatus.ASSIGNED),
+            )
+            rows = connection.execute(
+                "SELECT path FROM transformation_files WHERE transformation = ?", (transformation_id,)
+            ).fetchall()
+        self._known = {path for (path,) in rows}
+
+    def close(self) -> None:
+        """Close the database."""
+        self._connection.close()
+
+    def __enter__(self) -> "TransformationFeeder":
+        """Use the feeder as a context manager closing its database."""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Close the database."""
+        self.close()
+
+    def poll(self) -> int:
+        """Record the input files that appeared since the previous poll.
+
+        :return: The number of new files
+        """
+        new_paths = []
+        for query in self.queries:
+            new_paths.extend(self._list_new(query))
+        if new_paths:
+            with self._lock, self._transaction() as connection:
+                connection.executemany(
+                    "INSERT INTO transformation_files (transformation, path, status) VALUES (?, ?, ?) "
+                    "ON CONFLICT (transformation, path) DO NOTHING",
+                    [(self.transformation_id, path, FileStatus.UNUSED) for path in new_paths],
+                )
+            self._known.update(new_paths)
+            logger.debug("%d new input file(s) for transformation %s", len(new_paths), self.transformation_id)
+        return len(new_paths)
+
+    def _list_new(self, query: Path) -> list[str]:
+        """List the files of a query directory that are not known yet.
+
+        :param query: The query directory, relative to the file catalog root
+        :return: The paths of the new files, relative to the file catalog root
+        """
+        directory = self.root / query
+        try:
+            mtime = directory.stat().st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if self._listed.get(query) == mtime:
+            return []
+
+        try:
+            with os.scandir(directory) as entries:
+                names = sorted(entry.name for entry in entries if entry.is_file())
+        except FileNotFoundError:
+            return []
+        # A directory modified within the timestamp granularity may be modified again
+        # without its modification time changing: it is listed again at the next poll
+        if time.time_ns() - mtime > _MTIME_GRANULARITY_NS:
+            self._listed[query] = mtime
+        paths = (str(query / name) for name in names)
+        return [path for path in paths if path not in self._known]
+
+    def assign_groups(self, partial: bool = False) -> list[tuple[int, list[str]]]:
+        """Assign the unused files to as many full groups as possible.
+
+        A group is full when it has group_size files or, with a group target, when
+        the weight left to reach the target is below the weight of any unused file.
+
+        :param partial: Also assign the files left over to last, smaller groups
+        :return: The identifier and the files of each new group, in the order the files were discovered
+        """
+        with self._lock, self._transaction() as connection:
+            if self.group_target is None:
+                (unused,) = connection.execute(
+                    "SELECT COUNT(*) FROM transformation_files WHERE transformation = ? AND status = ?",
+                    (self.transformation_id, FileStatus.UNUSED),
+                ).fetchone()
+                nb_groups = unused // self.group_size
+                if partial and unused % self.group_size:
+                    nb_groups += 1
+                if not nb_groups:
+                    return []
+                rows = connection.execute(
+                    "SELECT file_id, path FROM transformation_files WHERE transformation = ? AND status = ? "
+                    "ORDER BY file_id LIMIT ?",
+                    (self.transformation_id, FileStatus.UNUSED, nb_groups * self.group_size),
+                ).fetchall()
+                row_groups = [rows[start : start + self.group_size] for start in range(0, len(rows), self.group_size)]
+            else:
+                rows = connection.execute(
+                    "SELECT file_id, path FROM transformation_files WHERE transformation = ? AND status = ? "
+                    "ORDER BY file_id",
+                    (self.transformation_id, FileStatus.UNUSED),
+                ).fetchall()
+                row_groups = self._pack(rows, partial)
+                if not row_groups:
+                    return []
+            (last_group,) = connection.execute(
+                "SELECT COALESCE(MAX(group_id), 0) FROM transformation_files WHERE transformation = ?",
+                (self.transformation_id,),
+            ).fetchone()
+
+            groups = []
+            assignments: list[tuple[FileStatus, int, int]] = []
+            for index, group_rows in enumerate(row_groups):
+                group_id = last_group + index + 1
+                groups.append((group_id, [path for _, path in group_rows]))
+                assignments.extend((FileStatus.ASSIGNED, group_id, file_id) for file_id, _ in group_rows)
+            connection.executemany(
+                "UPDATE transformation_files SET status = ?, group_id = ? WHERE file_id = ?", assignments
+            )
+        for _, paths in groups:
+            for path in paths:
+                self._weights.pop(path, None)
+        return groups
+
+    def _pack(self, rows: list[tuple[int, str]], partial: bool) -> list[list[tuple[int, str]]]:
+        """Pack unused files into groups of the target weight.
+
+        :param rows: The identifier and the path of the unused files
+        :param partial: Also keep the groups that are not full
+        :return: The files of each group
+        """
+        # Import here to avoid circular imports
+        from dirac_cwl.transformation.grouping import pack_groups
+
+        assert self.group_target is not None
+        new_paths = [path for _, path in rows if path not in self._weights]
+        if new_paths:
+            weights = self.weigh(new_paths) if self.weigh is not None else [1.0] * len(new_paths)
+            self._weights.update(zip(new_paths, weights))
+
+        weights = [self._weights[path] for _, path in rows]
+        row_groups = pack_groups(rows, weights, self.group_target, self.group_size)
+        if partial:
+            return row_groups
+        # The weights rarely add up to the target exactly: a group is also full when
+        # the weight left is below the one of the lightest unused file
+        lightest = min(weights, default=0.0)
+        full_groups = []
+        for group_rows in row_groups:
+            left = self.group_target - sum(self._weights[path] for _, path in group_rows)
+            if len(group_rows) >= self.group_size or left <= 0 or left < lightest:
+                full_groups.append(group_rows)
+        return full_groups
+
+    def set_group_status(self, group_ids: list[int], status: FileStatus) -> None:
+        """Set the state of the files of groups.
+
+        :param group_ids: The identifiers of the groups
+        :param status: The new state of their files
+        """
+        with self._lock, self._transaction() as connection:
+            connection.executemany(
+                "UPDATE transformation_files SET status = ? WHERE transformation = ? AND group_id = ?",
+                [(status, self.transformation_id, group_id) for group_id in group_ids],
+            )
+
+    def counts(self) -> dict[FileStatus, int]:
+        """Count the files of the transformation in each state.
+
+        :return: The number of files of each state
+        """
+        rows = self._connection.execute(
+            "SELECT status, COUNT(*) FROM transformation_files WHERE transformation = ? GROUP BY status",
+            (self.transformation_id,),
+        ).fetchall()
+        counts = dict.fromkeys(FileStatus, 0)
+        counts.update({FileStatus(status): count for status, count in rows})
+        return counts
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements in a write transaction.
+
+        The write lock is taken when the transaction starts, so that concurrent
+        writers wait for each other rather than fail on upgrade.
+        """
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._connection
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transformation_files (
+    file_id INTEGER PRIMARY KEY,
+    transformation TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    group_id INTEGER,
+    UNIQUE (transformation, path)
+);
+CREATE INDEX IF NOT EXISTS transformation_files_status ON transformation_files (transformation, status, file_id);
+CREATE INDEX IF NOT EXISTS transformation_files_group ON transformation_files (transformation, group_id);
+"""
+
+# Seconds to wait for the lock of the database held by another writer
+_BUSY_TIMEOUT = 60.0
+# Directories modified more recently than this are listed again at the next poll
+_MTIME_GRANULARITY_NS = 1_000_000_000
@@ -0,0 +1,218 @@
+"""Grouping of the input files of a transformation into jobs of balanced weights.
+
+Slicing the input files into groups of a fixed number of files gives jobs of
+very different lengths when the files differ in size or number of events, and
+the slowest job sets the end of the transformation. The files are instead
+weighed (size, number of events or estimated CPU time, see ``GroupWeight``) and
+packed into groups reaching a target weight, the number of files of a group
+remaining limited by ``group_size``.
+
+The weights come from the replica map (``size_bytes``) when one is given, then
+from the metadata of the file catalog (``Size``, ``NumberOfEvents``), then from
+the stored files themselves for the sizes. The files of unknown weight get the
+mean weight of the others.
+"""
+
+import bisect
+import logging
+import os
+from collections.abc import Callable, Mapping, Sequence
+from pathlib import Path
+from statistics import fmean
+from typing import TYPE_CHECKING, TypeVar
+
+from diracx.core.models.replica_map import ReplicaMap
+
+from dirac_cwl.execution_hooks import GroupWeight
+from dirac_cwl.transformation.feeder import FILE_CATALOG_ROOT
+
+if TYPE_CHECKING:
+    from dirac_cwl.mocks.file_catalog import LocalFileCatalog
+
+logger = logging.getLogger(__name__)
+
+#: Metadata of the file catalog giving the size of a file (bytes)
+SIZE_METADATA = "Size"
+#: Metadata of the file catalog giving the number of events of a file
+EVENTS_METADATA = "NumberOfEvents"
+
+T = TypeVar("T")
+#: Function returning the weight of each of the input files given
+Weigher = Callable[[Sequence[str]], list[float]]
+
+
+def to_lfn(location: str) -> str | None:
+    """Get the LFN of an input file.
+
+    :param location: The location of the file, as given in the inputs of the jobs
+    :return: The LFN, None if the file is not in the file catalog
+    """
+    for prefix in ("lfn:", "LFN:"):
+        if location.startswith(prefix):
+            return "/" + location.removeprefix(prefix).lstrip("/")
+    return None
+
+
+def open_catalog() -> "LocalFileCatalog":
+    """Open the file catalog of the input files.
+
+    :return: The file catalog
+    """
+    # Import here: the catalog is only needed to weigh files
+    from dirac_cwl.mocks.file_catalog import LocalFileCatalog
+
+    return LocalFileCatalog(databasePath=FILE_CATALOG_ROOT / "catalog.db")
+
+
+def get_catalog_metadata(lfns: Sequence[str], catalog: "LocalFileCatalog | None" = None) -> dict[str, dict]:
+    """Get the metadata of files from the file catalog.
+
+    :param lfns: The LFNs of the files
+    :param catalog: The file catalog, opened for this call if not given
+    :return: The metadata of the files found in the catalog
+    """
+    if not lfns:
+        return {}
+    result = (catalog or open_catalog()).getFileMetadata(list(lfns))
+    if not result["OK"]:
+        logger.warning("Could not get the metadata of the input files: %s", result["Message"])
+        return {}
+    return result["Value"]["Successful"]
+
+
+def file_weights(
+    locations: Sequence[str],
+    weight: GroupWeight,
+    metadata: Mapping[str, Mapping] | None = None,
+    replica_map: ReplicaMap | None = None,
+    cpu_per_event: float | None = None,
+    root: Path = FILE_CATALOG_ROOT,
+) -> list[float]:
+    """Weigh input files.
+
+    :param locations: The locations of the files, LFNs prefixed by "lfn:" or local paths
+    :param weight: The quantity to weigh
+    :param metadata: The catalog metadata of the files, by LFN
+    :param replica_map: The replica map of the files, giving their sizes
+    :param cpu_per_event: The estimated CPU time per event (seconds), 1 by default
+    :param root: The root of the file catalog, storing the files of the LFNs
+    :return: The weight of each file
+    """
+    if weight == GroupWeight.FILES:
+        return [1.0] * len(locations)
+
+    metadata = metadata or {}
+    weights: list[float | None] = []
+    for location in locations:
+        lfn = to_lfn(location)
+        file_metadata = metadata.get(lfn, {}) if lfn else {}
+        if weight == GroupWeight.SIZE:
+            weights.append(_file_size(location, lfn, file_metadata, replica_map, root))
+        else:
+            events = file_metadata.get(EVENTS_METADATA)
+            if events is not None and weight == GroupWeight.CPU:
+                events *= cpu_per_event or 1.0
+            weights.append(events)
+
+    known = [value for value in weights if value is not None]
+    if len(known) < len(weights):
+        default = fmean(known) if known else 1.0
+        logger.debug("%d input file(s) of unknown %s, weighed %s", len(weights) - len(known), weight, default)
+        return [default if value is None else float(value) for value in weights]
+    return [float(value) for value in known]
+
+
+def _file_size(
+    location: str, lfn: str | None, metadata: Mapping, replica_map: ReplicaMap | None, root: Path
+) -> float | None:
+    """Get the size of a file.
+
+    :param location: The location of the file
+    :param lfn: The LFN of the file, if it is in the file catalog
+    :param metadata: The catalog metadata of the file
+    :param replica_map: The replica map of the files
+    :param root: The root of the file catalog
+    :return: The size of the file (bytes), None if unknown
+    """
+    if lfn is not None and replica_map is not None and (entry := replica_map.root.get(lfn)):
+        if entry.size_bytes is not None:
+            return entry.size_bytes
+    if (size := metadata.get(SIZE_METADATA)) is not None:
+        return size
+    path = root / lfn.lstrip("/") if lfn is not None else Path(location.removeprefix("file://"))
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return None
+
+
+def pack_groups(
+    items: Sequence[T], weights: Sequence[float], target: float, max_items: int | None = None
+) -> list[list[T]]:
+    """Pack items into groups of a target total weight.
+
+    The items are placed heaviest first, each in the group it fills best (best fit
+    decreasing): the groups are as close to the target as the items allow, and
+    an item heavier than the target gets a group of its own.
+
+    :param items: The items
+    :param weights: The weight of each item
+    :param target: The total weight of a group
+    :param max_items: The maximum number of items of a group
+    :return: The groups, with their items in their original order, ordered by their first item
+    """
+    groups: list[list[int]] = []
+    # Remaining weight of the groups that can take more items, increasing
+    free: list[tuple[float, int]] = []
+    for index in sorted(range(len(items)), key=lambda i: weights[i], reverse=True):
+        weight = weights[index]
+        position = bisect.bisect_left(free, (weight, -1))
+        if position < len(free):
+            remaining, group = free.pop(position)
+        else:
+            remaining, group = target, len(groups)
+            groups.append([])
+        groups[group].append(index)
+        remaining -= weight
+        if remaining > 0 and (max_items is None or len(groups[group]) < max_items):
+            bisect.insort(free, (remaining, group))
+
+    ordered = sorted(sorted(group) for group in groups)
+    return [[items[index] for index in group] for group in ordered]
+
+
+def catalog_weigher(weight: GroupWeight, cpu_per_event: float | None = None) -> Weigher:
+    """Get a function weighing files with the metadata of the file catalog.
+
+    :param weight: The quantity to weigh
+    :param cpu_per_event: The estimated CPU time per event (seconds)
+    :return: The function, returning the weight of each of the files given
+    """
+    # Shared by the calls, not to connect to the catalog database each time the files are weighed
+    catalog = open_catalog() if weight != GroupWeight.FILES else None
+
+    def weigh(locations: Sequence[str]) -> list[float]:
+        if catalog is None:
+            return file_weights(locations, weight)
+        lfns = [lfn for location in locations if (lfn := to_lfn(location)) is not None]
+        return file_weights(locations, weight, get_catalog_metadata(lfns, catalog), cpu_per_event=cpu_per_event)
+
+    return weigh
+
+
+def group_files(
+    locations: Sequence[str], group_size: int | None, target: float | None = None, weigh: Weigher | None = None
+) -> list[list[str]]:
+    """Group input files for the jobs of a transformation.
+
+    :param locations: The locations of the files, in the order they are given to the jobs
+    :param group_size: The maximum number of files of a group
+    :param target: The total weight of a group, groups of group_size files if not given
+    :param weigh: Weigh the files, each file weighing 1 if not given
+    :return: The groups of files
+    """
+    if target is None:
+        size = group_size or 1
+        return [list(locations[start : start + size]) for start in range(0, len(locations), size)]
+    weights = weigh(locations) if weigh is not None else [1.0] * len(locations)
+    return pack_groups(locations, weights, target, group_size)
@@ -0,0 +1,488 @@
+"""Scheduling of the jobs of transformations.
+
+The transformations of a production form a DAG, from the wiring of the inputs of
+its steps to the outputs of other steps. They are all run by a single asyncio
+scheduler:
+
+- a transformation reading the outputs of others runs a job as soon as a group of
+  their outputs is available, and ends once they all ended, with a last, smaller
+  group of the files left over;
+- a transformation that cannot read the outputs of others as they come (no input
+  query) waits for them to end;
+- the jobs get the execution slots of the router by priority (``SchedulingHint``),
+  then by length of the chain of transformations depending on them (critical path
+  first), each transformation being limited to its own number of parallel jobs.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from cwl_utils.parser.cwl_v1_2 import File
+
+from dirac_cwl.core.utility import available_cores
+from dirac_cwl.execution_hooks import SchedulingHint, TransformationExecutionHooksHint
+from dirac_cwl.job import run_job
+from dirac_cwl.job.job_batch import JobBatch
+from dirac_cwl.job.submission_clients import JobIsolation
+from dirac_cwl.mocks.catalog_events import CatalogEventListener
+from dirac_cwl.submission_models import JobInputModel, JobModel, TransformationSubmissionModel
+from dirac_cwl.transformation.feeder import FILE_CATALOG_ROOT, FileStatus, TransformationFeeder
+from dirac_cwl.transformation.grouping import Weigher, catalog_weigher, group_files
+
+logger = logging.getLogger("TransformationRouter")
+job_logger = logging.getLogger("JobRouter")
+
+#: Maximum number of seconds between two looks for new input files, when no file is notified
+POLL_INTERVAL = 5.0
+
+
+@dataclass
+class TransformationInputs:
+    """Inputs of the jobs of a transformation.
+
+    The inputs are either known in advance (jobs), or discovered by an input query
+    and grouped by group_size, or by group_target with the weights given by weigh.
+    """
+
+    jobs: list[JobInputModel | None] = field(default_factory=list)
+    query: Path | list[Path] | None = None
+    group_size: int = 1
+    group_target: float | None = None
+    weigh: Weigher | None = None
+
+
+@dataclass
+class TransformationNode:
+    """Transformation of a DAG, with its scheduling parameters."""
+
+    transformation: TransformationSubmissionModel
+    #: Indexes of the transformations producing its inputs
+    upstream: set[int] = field(default_factory=set)
+    #: Indexes of the transformations consuming its outputs
+    downstream: set[int] = field(default_factory=set)
+    priority: int = 10
+    max_parallel_jobs: int | None = None
+    #: Number of transformations of the longest chain starting from this one
+    critical_path: int = 1
+
+
+def build_dag(
+    transformations: list[TransformationSubmissionModel], upstream_steps: list[set[int]] | None = None
+) -> list[TransformationNode]:
+    """Build the DAG of transformations.
+
+    :param transformations: The transformations
+    :param upstream_steps: For each transformation, the indexes of the transformations producing its inputs
+    :return: The nodes of the DAG, in the order of the transformations
+    :raises ValueError: If the hints are invalid or the transformations depend on each other in a cycle
+    """
+    if upstream_steps is None:
+        upstream_steps = [set() for _ in transformations]
+
+    nodes = []
+    for transformation, upstream in zip(transformations, upstream_steps):
+        try:
+            scheduling = SchedulingHint.from_cwl(transformation.task)
+        except Exception as exc:
+            raise ValueError(f"Invalid DIRAC hints:\n{exc}") from exc
+        if scheduling.max_parallel_jobs is not None and scheduling.max_parallel_jobs < 1:
+            raise ValueError(
+                f"Invalid DIRAC hints:\nmax_parallel_jobs must be at least 1, got {scheduling.max_parallel_jobs}"
+            )
+        nodes.append(
+            TransformationNode(
+                transformation=transformation,
+                upstream=set(upstream),
+                priority=scheduling.priority,
+                max_parallel_jobs=scheduling.max_parallel_jobs,
+            )
+        )
+    for index, node in enumerate(nodes):
+        for upstream_index in node.upstream:
+            nodes[upstream_index].downstream.add(index)
+
+    # Longest chain from each node, the downstream nodes first
+    remaining = {index: len(node.downstream) for index, node in enumerate(nodes)}
+    ready = [index for index, count in remaining.items() if not count]
+    visited = 0
+    while ready:
+        index = ready.pop()
+        visited += 1
+        node = nodes[index]
+        node.critical_path = 1 + max((nodes[d].critical_path for d in node.downstream), default=0)
+        for upstream_index in node.upstream:
+            remaining[upstream_index] -= 1
+            if not remaining[upstream_index]:
+                ready.append(upstream_index)
+    if visited != len(nodes):
+        raise ValueError("The transformations depend on each other in a cycle.")
+    return nodes
+
+
+def get_transformation_inputs(transformation: TransformationSubmissionModel) -> TransformationInputs:
+    """Get the inputs of the jobs of a transformation from its hints.
+
+    :param transformation: The transformation
+    :return: The inputs of its jobs
+    :raises ValueError: If the hints are invalid
+    :raises RuntimeError: If the input query cannot be built
+    """
+    try:
+        transformation_execution_hooks = TransformationExecutionHooksHint.from_cwl(transformation.task)
+    except Exception as exc:
+        raise ValueError(f"Invalid DIRAC hints:\n{exc}") from exc
+
+    # Inputs from static input_data (populated by --chunk on the client)
+    if transformation_execution_hooks.input_data:
+        if transformation_execution_hooks.configuration:
+            raise ValueError(
+                "Cannot specify both static input_data and dynamic input query (configuration). "
+                "Use --chunk/--inputs-file for standalone transformations with known files. "
+                "Use configuration for transformations that discover inputs from upstream outputs."
+            )
+
+        job_model_params: list[JobInputModel | None] = []
+        group_size = transformation_execution_hooks.group_size or 1
+        group_target = transformation_execution_hooks.group_target
+        weigh = _get_weigher(transformation_execution_hooks)
+        for param_name, file_list in transformation_execution_hooks.input_data.items():
+            groups = group_files(file_list, group_size, group_target, weigh)
+            logger.info(
+                "Chunking '%s': %s files into %s jobs (group_size=%s, group_target=%s %s)",
+                param_name,
+                len(file_list),
+                len(groups),
+                group_size,
+                group_target,
+                transformation_execution_hooks.group_weight,
+            )
+
+            for i, files_chunk in enumerate(groups):
+                logger.info("Group %i files: %s", i + 1, files_chunk)
+                job_model_params.append(JobInputModel(sandbox=None, cwl={param_name: files_chunk}))
+        return TransformationInputs(jobs=job_model_params)
+
+    # Inputs from DataCatalog/Bookkeeping service (dynamic query)
+    # NOTE: group_size is required here to distinguish "configuration as plugin overrides"
+    # (e.g. num_points: 2000) from "configuration as query params" (e.g. query_root, campaign).
+    # Without group_size, there's no grouping to do and no reason to query for input files.
+    # This will be cleaned up when input_query becomes the explicit trigger (#69).
+    if transformation_execution_hooks.configuration and transformation_execution_hooks.group_size:
+        # Get the metadata class
+        transformation_metadata = transformation_execution_hooks.to_runtime(transformation)
+
+        logger.info("Getting the input data for the transformation...")
+        input_query = transformation_metadata.get_input_query()
+        if not input_query:
+            raise RuntimeError("Input query not found.")
+        logger.debug("\t\t- Query: %s", input_query)
+        logger.debug("\t\t- Group Size: %s", transformation_execution_hooks.group_size)
+        logger.debug("\t\t- Group Target: %s", transformation_execution_hooks.group_target)
+        weigh = _get_weigher(transformation_execution_hooks)
+        return TransformationInputs(
+            query=input_query,
+            group_size=transformation_execution_hooks.group_size,
+            group_target=transformation_execution_hooks.group_target,
+            # The feeder gives the paths of the files relative to the catalog root
+            weigh=(lambda paths: weigh([f"lfn:/{path}" for path in paths])) if weigh else None,
+        )
+
+    # A single job, without inputs
+    return TransformationInputs(jobs=[None])
+
+
+def _get_weigher(hint: TransformationExecutionHooksHint) -> Weigher | None:
+    """Get the function weighing the input files of a transformation.
+
+    :param hint: The execution hooks hint of the transformation
+    :return: The function, None if the files are grouped by number
+    """
+    if hint.group_target is None:
+        return None
+    return catalog_weigher(hint.group_weight, hint.cpu_per_event)
+
+
+def _generate_job_model_parameter(
+    input_data_dict: dict[str, list[list[str]]],
+) -> list[JobInputModel]:
+    """Generate job model parameters from input data provided."""
+    job_model_params = []
+
+    input_names = list(input_data_dict.keys())
+    input_data_lists = [input_data_dict[input_name] for input_name in input_names]
+    grouped_input_data = [dict(zip(input_names, elements)) for elements in zip(*input_data_lists)]
+    for group in grouped_input_data:
+        cwl_inputs = {}
+        for input_name, input_data in group.items():
+            cwl_inputs[input_name] = [File(location=str(Path("lfn:") / path)) for path in input_data]
+
+        job_model_params.append(JobInputModel(sandbox=None, cwl=cwl_inputs))
+
+    return job_model_params
+
+
+def _all_files_done(feeder: TransformationFeeder) -> bool:
+    """Check whether the transformation already processed all its known input files.
+
+    :param feeder: The feeder of the transformation
+    :return: True if it has input files and none of them is unused or assigned
+    """
+    counts = feeder.counts()
+    return (
+        not counts[FileStatus.UNUSED]
+        and not counts[FileStatus.ASSIGNED]
+        and counts[FileStatus.PROCESSED] + counts[FileStatus.FAILED] > 0
+    )
+
+
+class JobSlots:
+    """Execution slots of the router, given to the waiting jobs by order of their keys.
+
+    :param capacity: Number of jobs running at the same time
+    """
+
+    def __init__(self, capacity: int):
+        """Initialize the slots, all free."""
+        self.capacity = capacity
+        self._used = 0
+        self._waiters: list[tuple[tuple, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    async def acquire(self, key: tuple) -> None:
+        """Wait for a free slot.
+
+        :param key: Order of the job among the waiting ones, lowest first
+        """
+        if self._used < self.capacity and not self._waiters:
+            self._used += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (key, next(self._order), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot was handed over meanwhile
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Free a slot, handing it over to the first waiting job if any."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._used -= 1
+
+
+class TransformationScheduler:
+    """Run the jobs of a DAG of transformations.
+
+    :param nodes: The transformations, as built by build_dag
+    :param max_parallel_jobs: Maximum number of jobs running at the same time,
+        defaults to the number of cores available to the router
+    :param follow: Keep running the jobs of the transformations without upstream
+        transformations as new input files appear, instead of stopping after the first jobs
+    :param poll_interval: Maximum number of seconds between two looks for new input files,
+        when no file is notified meanwhile
+    :param idle_timeout: When following, stop after this many seconds without new jobs
+    """
+
+    def __init__(
+        self,
+        nodes: list[TransformationNode],
+        max_parallel_jobs: int | None = None,
+        follow: bool = False,
+        poll_interval: float = POLL_INTERVAL,
+        idle_timeout: float | None = None,
+    ):
+        """Initialize the scheduler."""
+        self.nodes = nodes
+        self.max_parallel_jobs = max(1, max_parallel_jobs or available_cores())
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        # Jobs share the working directory: their identifiers must be distinct
+        self._job_ids = itertools.count(random.randrange(1000, 10000))
+
+    async def run(self) -> list[bool]:
+        """Run the transformations until they all end.
+
+        :return: Whether all the jobs of each transformation executed successfully
+        """
+        self._slots = JobSlots(self.max_parallel_jobs)
+        self._limits = [
+            asyncio.Semaphore(node.max_parallel_jobs) if node.max_parallel_jobs is not None else None
+            for node in self.nodes
+        ]
+        self._done = [asyncio.Event() for _ in self.nodes]
+        self._upstream_done = [asyncio.Event() if node.upstream else None for node in self.nodes]
+        os.environ["DIRAC_PROTO_LOCAL"] = "1"
+        with ExitStack() as stack:
+            # The jobs of a transformation share a single task document
+            self._batches = [stack.enter_context(JobBatch(node.transformation.task)) for node in self.nodes]
+            self._executor = stack.enter_context(
+                ThreadPoolExecutor(max_workers=self.max_parallel_jobs, thread_name_prefix="JobRouter")
+            )
+            return list(await asyncio.gather(*(self._run_transformation(index) for index in range(len(self.nodes)))))
+
+    async def _run_transformation(self, index: int) -> bool:
+        """Run the jobs of a transformation.
+
+        :param index: The index of the transformation
+        :return: Whether all its jobs executed successfully
+        """
+        node = self.nodes[index]
+        try:
+            inputs = get_transformation_inputs(node.transformation)
+            if inputs.query is not None:
+                results = await self._feed(index, inputs)
+            else:
+                # The inputs cannot be read as they come: wait for the upstream transformations
+                if (upstream_done := self._upstream_done[index]) is not None:
+                    await upstream_done.wait()
+                results = await asyncio.gather(*(self._run_job(index, job_input) for job_input in inputs.jobs))
+            logger.info("%d/%d job(s) of transformation %d successful.", sum(results), len(results), index + 1)
+            return all(results)
+        finally:
+            self._done[index].set()
+            for downstream in node.downstream:
+                if all(self._done[upstream].is_set() for upstream in self.nodes[downstream].upstream):
+                    self._upstream_done[downstream].set()  # type: ignore[union-attr]
+
+    async def _feed(self, index: int, inputs: TransformationInputs) -> list[bool]:
+        """Run the jobs of a transformation as groups of input files become available.
+
+        :param index: The index of the transformation
+        :param inputs: The input query of the transformation and the grouping of its files
+        :return: Whether each job executed successfully
+        """
+        assert inputs.query is not None
+        upstream_done = self._upstream_done[index]
+        loop = asyncio.get_running_loop()
+        transformation_id = self._batches[index].task_digest
+        assert transformation_id is not None
+        jobs: list[asyncio.Task] = []
+        last_jobs = loop.time()
+
+        # Listen before the first look at the catalog, not to miss a file stored in between
+        with (
+            CatalogEventListener(FILE_CATALOG_ROOT) as listener,
+            TransformationFeeder(
+                transformation_id,
+                inputs.query,
+                inputs.group_size,
+                group_target=inputs.group_target,
+                weigh=inputs.weigh,
+            ) as feeder,
+        ):
+            logger.info("\t- Waiting for input data...")
+            while True:
+                # Checked before looking at the catalog, which then has all the upstream outputs
+                last_look = upstream_done is not None and upstream_done.is_set()
+                # The feeder blocks on the database and weighs the files: keep it off the event loop
+                await asyncio.to_thread(feeder.poll)
+                if groups := await asyncio.to_thread(feeder.assign_groups, partial=last_look):
+                    logger.info("\t- Input data available: %d new group(s).", len(groups))
+                    jobs.extend(
+                        asyncio.create_task(self._run_group(index, feeder, group_id, paths))
+                        for group_id, paths in groups
+                    )
+                    last_jobs = loop.time()
+                    if upstream_done is None and not self.follow:
+                        break
+                elif upstream_done is None and not self.follow and await asyncio.to_thread(_all_files_done, feeder):
+                    # e.g. the transformation is run again on the same catalog
+                    logger.info("\t- All the input files were already processed, stopping.")
+                    break
+                elif (
+                    upstream_done is None
+                    and self.idle_timeout is not None
+                    and loop.time() - last_jobs >= self.idle_timeout
+                ):
+                    logger.info("\t- No new input data for %s seconds, stopping.", self.idle_timeout)
+                    break
+                if last_look:
+                    logger.info("\t- Upstream transformations done, no more input data.")
+                    break
+                await self._wait_for_inputs(listener, upstream_done)
+
+            return list(await asyncio.gather(*jobs))
+
+    async def _wait_for_inputs(self, listener: CatalogEventListener, upstream_done: asyncio.Event | None) -> None:
+        """Wait for files to be stored in the catalog, or for the upstream transformations to end.
+
+        :param listener: The listener of the catalog
+        :param upstream_done: Set when the upstream transformations ended, if any
+        """
+        if upstream_done is None:
+            await listener.wait_async(self.poll_interval)
+            return
+        waiters = {
+            asyncio.create_task(listener.wait_async(self.poll_interval)),
+            asyncio.create_task(upstream_done.wait()),
+        }
+        _, pending = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in pending:
+            waiter.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _run_group(self, index: int, feeder: TransformationFeeder, group_id: int, paths: list[str]) -> bool:
+        """Run the job of a group of input files, and record the state of the files.
+
+        :param index: The index of the transformation
+        :param feeder: The feeder of the transformation
+        :param group_id: The identifier of the group
+        :param paths: The input files of the group
+        :return: Whether the job executed successfully
+        """
+        (job_input,) = _generate_job_model_parameter({"input-data": [paths]})
+        result = await self._run_job(index, job_input)
+        await asyncio.to_thread(
+            feeder.set_group_status, [group_id], FileStatus.PROCESSED if result else FileStatus.FAILED
+        )
+        return result
+
+    async def _run_job(self, index: int, job_input: JobInputModel | None) -> bool:
+        """Run a job of a transformation, once it gets an execution slot.
+
+        :param index: The index of the transformation
+        :param job_input: The inputs of the job
+        :return: Whether the job executed successfully
+        """
+        node = self.nodes[index]
+        job = JobModel.model_construct(task=node.transformation.task, input=job_input)
+        job_id = next(self._job_ids)
+        limit = self._limits[index]
+        if limit is not None:
+            await limit.acquire()
+        try:
+            # Higher priorities first, then the longest chains of transformations
+            await self._slots.acquire((-node.priority, -node.critical_path, index))
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._executor,
+                    run_job,
+                    job_id,
+                    job,
+                    job_logger.getChild(f"job-{job_id}"),
+                    JobIsolation.SUBPROCESS,
+                    self._batches[index],
+                )
+            except Exception:
+                logger.exception("Job %d of transformation %d failed", job_id, index + 1)
+                return False
+            finally:
+                self._slots.release()
+        finally:
+            if limit is not None:
+                limit.release()
@@ -6,6 +6,15 @@ from cwl_utils.parser.cwl_v1_2 import CommandLineTool
 from dirac_cwl.submission_models import JobModel
 
 
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Keep the dirac-cwl cache of the tests out of the user cache."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.delenv("DIRAC_CWL_SANDBOX_CACHE", raising=False)
+    monkeypatch.delenv("DIRAC_CWL_SE_THROUGHPUT", raising=False)
+    monkeypatch.delenv("DIRAC_CWL_ENTRY_POINTS_CACHE", raising=False)
+
+
 @pytest.fixture
 def job_type_testing():
     """Register a plugin with 1 preprocess and 1 postprocess command.
@@ -0,0 +1,40 @@
+"""
+Tests for the notification of the files stored in the local file catalog.
+
+This module tests that listeners are woken up by the stored files and that the
+sockets of stopped listeners are cleaned up.
+"""
+
+import threading
+import time
+
+from dirac_cwl.mocks.catalog_events import CatalogEventListener, events_directory, publish
+
+
+def test_listener_is_woken_up(tmp_path):
+    """A waiting listener gets the paths of the stored files without waiting for its timeout."""
+    root = tmp_path / "filecatalog"
+    with CatalogEventListener(root) as listener:
+        assert listener.wait(0.01) == []
+
+        threading.Timer(0.1, publish, (root, ["pi/100/result_1.sim", "pi/100/result_2.sim"])).start()
+        start = time.monotonic()
+        paths = listener.wait(30)
+        elapsed = time.monotonic() - start
+
+    assert elapsed < 10
+    # The second notification may not be received yet when the listener wakes up
+    assert paths[0] == "pi/100/result_1.sim"
+    assert not list(events_directory(root).iterdir())
+
+
+def test_publish_without_listeners(tmp_path):
+    """Storing files without listeners, or with stopped ones, is fine."""
+    root = tmp_path / "filecatalog"
+    publish(root, ["pi/100/result_1.sim"])
+
+    listener = CatalogEventListener(root)
+    # The listener stops without removing its socket
+    listener._socket.close()
+    publish(root, ["pi/100/result_1.sim"])
+    assert not list(events_directory(root).iterdir())
@@ -0,0 +1,177 @@
+"""
+Tests for the cache of the plugins discovered from the entry points.
+
+This module tests that the plugins cached are registered without being
+imported, and that the cache is ignored or dropped once the environment changes.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import ClassVar, Optional
+
+import pytest
+
+from dirac_cwl.core.entry_points import EntryPointsCache, PluginEntry
+from dirac_cwl.execution_hooks.core import ExecutionHooksBasePlugin
+from dirac_cwl.execution_hooks.registry import ExecutionHooksPluginRegistry
+
+GROUP = ExecutionHooksPluginRegistry.ENTRY_POINT_GROUP
+
+
+class CachedPlugin(ExecutionHooksBasePlugin):
+    """Plugin discovered from the entry points."""
+
+    vo: ClassVar[Optional[str]] = "test_exp"
+
+
+class FakeEntryPoints:
+    """Entry points of the CachedPlugin, counting the plugins loaded."""
+
+    def __init__(self, delay: float = 0.0):
+        """Expose the CachedPlugin, loaded in delay seconds."""
+        self.names = ["CachedPlugin"]
+        self.loaded = 0
+        self.delay = delay
+
+    def __getitem__(self, name):
+        """Get an entry point."""
+        return self
+
+    def load(self):
+        """Load the plugin of an entry point."""
+        time.sleep(self.delay)
+        self.loaded += 1
+        return CachedPlugin
+
+
+def test_cache(tmp_path):
+    """Groups are kept for the environment they were discovered in."""
+    path = tmp_path / "entry-points.json"
+    entries = [PluginEntry.from_class("CachedPlugin", CachedPlugin, "test_exp")]
+
+    cache = EntryPointsCache(path, key="env1")
+    assert cache.get(GROUP) is None
+    cache.put(GROUP, entries)
+    cache.put("other.group", [])
+    assert cache.get(GROUP) == entries
+    assert cache.get("other.group") == []
+    assert entries[0].load() is CachedPlugin
+
+    # Another environment
+    assert EntryPointsCache(path, key="env2").get(GROUP) is None
+
+    path.write_text("{")
+    assert cache.get(GROUP) is None
+
+
+def test_registry_uses_cache(tmp_path, monkeypatch):
+    """The entry points are scanned once, and the plugins cached are imported when looked up."""
+    from dirac_cwl.execution_hooks import registry as registry_module
+
+    entrypoints = FakeEntryPoints()
+    monkeypatch.setattr(registry_module, "entry_points", lambda *args, **kwargs: entrypoints)
+    cache = EntryPointsCache(tmp_path / "entry-points.json", key="env")
+
+    registry = ExecutionHooksPluginRegistry(lazy_discovery=True, cache=cache)
+    assert registry.get_plugin("CachedPlugin") is CachedPlugin
+    assert entrypoints.loaded == 1
+
+    # Another process: the plugins are registered from the cache
+    registry = ExecutionHooksPluginRegistry(lazy_discovery=True, cache=cache)
+    assert registry.list_plugins() == ["CachedPlugin"]
+    assert registry.list_plugins(vo="test_exp") == ["CachedPlugin"]
+    assert registry.list_virtual_organizations() == ["test_exp"]
+    assert "CachedPlugin" not in registry._plugins
+    assert registry.get_plugin("CachedPlugin") is CachedPlugin
+    assert entrypoints.loaded == 1
+
+    with pytest.raises(ValueError, match="already registered"):
+        registry.register_plugin(CachedPlugin)
+
+
+def test_concurrent_discovery(monkeypatch):
+    """The lookups made while the plugins are discovered wait for the discovery to complete."""
+    from dirac_cwl.execution_hooks import registry as registry_module
+
+    entrypoints = FakeEntryPoints(delay=0.1)
+    monkeypatch.setattr(registry_module, "entry_points", lambda *args, **kwargs: entrypoints)
+    registry = ExecutionHooksPluginRegistry(lazy_discovery=True)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        plugins = list(executor.map(lambda _: registry.get_plugin("CachedPlugin"), range(4)))
+
+    assert plugins == [CachedPlugin] * 4
+    assert entrypoints.loaded == 1
+
+
+def test_concurrent_load(tmp_path, monkeypatch):
+    """The lookups made while a cached plugin is imported wait for it to be registered."""
+    cache = EntryPointsCache(tmp_path / "entry-points.json", key="env")
+    cache.put(GROUP, [PluginEntry.from_class("CachedPlugin", CachedPlugin, "test_exp")])
+    registry = ExecutionHooksPluginRegistry(lazy_discovery=True, cache=cache)
+    registry.discover_plugins()
+
+    load = PluginEntry.load
+
+    def slow_load(entry):
+        time.sleep(0.1)
+        return load(entry)
+
+    monkeypatch.setattr(PluginEntry, "load", slow_load)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        plugins = list(executor.map(lambda _: registry.get_plugin("CachedPlugin"), range(4)))
+
+    assert plugins == [CachedPlugin] * 4
+    assert registry.list_plugins() == ["CachedPlugin"]
+
+
+def test_outdated_cache(tmp_path, monkeypatch):
+    """A cached plugin that cannot be imported anymore makes the registry discover the plugins again."""
+    from dirac_cwl.execution_hooks import registry as registry_module
+
+    entrypoints = FakeEntryPoints()
+    monkeypatch.setattr(registry_module, "entry_points", lambda *args, **kwargs: entrypoints)
+    cache = EntryPointsCache(tmp_path / "entry-points.json", key="env")
+    # The module of CachedPlugin was moved, and RemovedPlugin was removed
+    cache.put(
+        GROUP,
+        [
+            PluginEntry("CachedPlugin", "dirac_cwl.moved_module:CachedPlugin", "test_exp"),
+            PluginEntry("RemovedPlugin", "dirac_cwl.removed_module:RemovedPlugin"),
+        ],
+    )
+
+    registry = ExecutionHooksPluginRegistry(lazy_discovery=True, cache=cache)
+    assert registry.list_plugins() == ["CachedPlugin", "RemovedPlugin"]
+    assert entrypoints.loaded == 0
+
+    assert registry.get_plugin("CachedPlugin") is CachedPlugin
+    assert entrypoints.loaded == 1
+    assert registry.get_plugin("RemovedPlugin") is None
+    assert registry.list_plugins() == ["CachedPlugin"]
+    assert cache.get(GROUP) == [PluginEntry.from_class("CachedPlugin", CachedPlugin, "test_exp")]
+
+
+def test_environment_key_reinstall(tmp_path, monkeypatch):
+    """Reinstalling a distribution with the same version changes the key."""
+    import os
+
+    from dirac_cwl.core.entry_points import environment_key
+
+    dist_info = tmp_path / "plugins-1.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "entry_points.txt").write_text("[dirac_cwl.execution_hooks]\n")
+    monkeypatch.setattr("sys.path", [str(tmp_path)])
+
+    # The key is computed once per process: compute it again
+    key = environment_key.__wrapped__()
+    os.utime(dist_info / "entry_points.txt", ns=(0, 0))
+    assert environment_key.__wrapped__() != key
+
+
+def test_default_location(tmp_path, monkeypatch):
+    """The default location is resolved when the cache is used."""
+    cache = EntryPointsCache.load()
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert cache.path == tmp_path / "dirac-cwl" / "entry-points.json"
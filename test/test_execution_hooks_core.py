@@ -15,6 +15,7 @@ from pytest_mock import MockerFixture
 from dirac_cwl.execution_hooks.core import (
     ExecutionHooksBasePlugin,
     ExecutionHooksHint,
+    HintIndex,
     SchedulingHint,
     TransformationExecutionHooksHint,
 )
@@ -274,3 +275,71 @@ class TestTransformationExecutionHooksHint:
         # Test with no group_size
         descriptor2 = TransformationExecutionHooksHint(hook_plugin="UserPlugin")
         assert descriptor2.group_size is None
+
+
+class TestHintIndex:
+    """Test the HintIndex class."""
+
+    def test_single_pass(self, mocker):
+        """The hints of an object are indexed once and the descriptors built once."""
+        mock_cwl = mocker.Mock()
+        mock_cwl.hints = [
+            {"class": "dirac:Scheduling", "priority": 3},
+            {"class": "dirac:ExecutionHooks", "hook_plugin": "QueryBased", "configuration": {"a": 1}},
+            {"class": "dirac:ExecutionHooks", "configuration": {"b": 2}},
+            {"class": "ResourceRequirement", "coresMin": 2},
+        ]
+        index = HintIndex.of(mock_cwl)
+        assert HintIndex.of(mock_cwl) is index
+        assert index.get("dirac:Scheduling") == [{"priority": 3}]
+        assert index.get("ResourceRequirement") == []
+
+        model_copy = mocker.spy(ExecutionHooksHint, "model_copy")
+        for _ in range(10):
+            descriptor = ExecutionHooksHint.from_cwl(mock_cwl)
+            assert descriptor.hook_plugin == "QueryBased"
+            assert descriptor.configuration == {"a": 1, "b": 2}
+            assert SchedulingHint.from_cwl(mock_cwl).priority == 3
+        # Built once, then one copy per call
+        assert model_copy.call_count == 11
+
+        # The descriptors returned are copies
+        descriptor.hook_plugin = "Other"
+        assert ExecutionHooksHint.from_cwl(mock_cwl).hook_plugin == "QueryBased"
+
+    def test_descriptor_copies_are_deep(self, mocker):
+        """Modifying the dicts and lists of a descriptor does not change the next ones."""
+        mock_cwl = mocker.Mock()
+        mock_cwl.hints = [
+            {"class": "dirac:ExecutionHooks", "configuration": {"a": 1}},
+            {"class": "dirac:ExecutionHooks", "input_data": {"files": ["lfn:/a"]}},
+        ]
+        descriptor = TransformationExecutionHooksHint.from_cwl(mock_cwl)
+        descriptor.configuration["a"] = 2
+        descriptor.input_data["files"].append("lfn:/b")
+
+        descriptor = TransformationExecutionHooksHint.from_cwl(mock_cwl)
+        assert descriptor.configuration == {"a": 1}
+        assert descriptor.input_data == {"files": ["lfn:/a"]}
+
+    def test_descriptor_is_not_validated(self, mocker):
+        """The hints are merged as given, as model_copy does, e.g. the sites of the JDL."""
+        mock_cwl = mocker.Mock()
+        mock_cwl.hints = [{"class": "dirac:Scheduling", "sites": "CTAO.DESY-ZN.de, CTAO.PIC.es"}]
+        assert SchedulingHint.from_cwl(mock_cwl).sites == "CTAO.DESY-ZN.de, CTAO.PIC.es"
+
+    def test_changed_hints(self, mocker):
+        """The index is rebuilt when the hints are replaced or updated."""
+        mock_cwl = mocker.Mock()
+        mock_cwl.hints = [{"class": "dirac:Scheduling", "priority": 3}]
+        assert SchedulingHint.from_cwl(mock_cwl).priority == 3
+
+        mock_cwl.hints = [{"class": "dirac:Scheduling", "priority": 5}]
+        assert SchedulingHint.from_cwl(mock_cwl).priority == 5
+
+        TransformationExecutionHooksHint.update_cwl(mock_cwl, TransformationExecutionHooksHint(group_size=7))
+        assert TransformationExecutionHooksHint.from_cwl(mock_cwl).group_size == 7
+
+        mock_cwl.hints[0]["priority"] = 8
+        HintIndex.invalidate(mock_cwl)
+        assert SchedulingHint.from_cwl(mock_cwl).priority == 8
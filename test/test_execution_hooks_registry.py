@@ -212,6 +212,8 @@ class TestExecutionHooksPluginRegistry:
         # Patch both the entry_points and the logger
         monkeypatch.setattr(registry, "entry_points", lambda *args, **kwargs: entrypointMock)
         monkeypatch.setattr(registry, "logger", loggerMock)
+        # Keep the plugins of the global registry out of the test
+        monkeypatch.setattr(registry, "_registry", ExecutionHooksPluginRegistry(lazy_discovery=True))
 
         # Execute discover_plugins
         discovered = registry.discover_plugins()
@@ -221,6 +223,31 @@ class TestExecutionHooksPluginRegistry:
         # "FakeWrongPlugin" should have logged a warning
         loggerMock.warning.assert_called_once()
 
+    def test_lazy_discovery(self, mocker, monkeypatch):
+        """Test that plugins are discovered once, on the first lookup."""
+        from dirac_cwl.execution_hooks import registry as registry_module
+
+        class FakePlugin(ExecutionHooksBasePlugin): ...
+
+        fakePluginMock = mocker.MagicMock()
+        fakePluginMock.load.return_value = FakePlugin
+        entrypointMock = mocker.MagicMock()
+        entrypointMock.names = ["FakePlugin"]
+        entrypointMock.__getitem__.side_effect = {"FakePlugin": fakePluginMock}.__getitem__
+        monkeypatch.setattr(registry_module, "entry_points", lambda *args, **kwargs: entrypointMock)
+
+        registry = ExecutionHooksPluginRegistry(lazy_discovery=True)
+        fakePluginMock.load.assert_not_called()
+
+        assert registry.get_plugin("FakePlugin") is FakePlugin
+        assert registry.list_plugins() == ["FakePlugin"]
+        fakePluginMock.load.assert_called_once()
+
+        # Plugins registered explicitly come after the discovered ones
+        registry = ExecutionHooksPluginRegistry(lazy_discovery=True)
+        with pytest.raises(ValueError, match="already registered"):
+            registry.register_plugin(FakePlugin)
+
     def test_list_virtual_organizations(self):
         """Test listing vos."""
         registry = ExecutionHooksPluginRegistry()
@@ -0,0 +1,177 @@
+"""
+Tests for the DIRAC executors of the job workflows.
+
+This module tests the replica maps prepared for the steps and merged back into
+the global replica map, sequentially and in parallel.
+"""
+
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+from diracx.core.models.replica_map import ReplicaMap
+
+from dirac_cwl.core.utility import available_cores
+from dirac_cwl.job.executor import DiracExecutor, DiracParallelExecutor
+from dirac_cwl.job.executor.replica_map_delta import append_deltas
+
+WORKFLOW = """\
+cwlVersion: v1.2
+class: Workflow
+requirements:
+  InlineJavascriptRequirement: {}
+  StepInputExpressionRequirement: {}
+inputs: []
+outputs:
+  seen:
+    type: File
+    outputSource: read/seen
+steps:
+  produce:
+    run:
+      class: CommandLineTool
+      baseCommand: [sh, -c]
+      arguments:
+        - >-
+          printf x > out.dst &&
+          printf '{"lfn":"LFN:/vo/out.dst","entry":{"replicas":[{"url":"file://%s/out.dst","se":"SE-A"}]}}\\n'
+          "$PWD" > replica_map.delta.jsonl
+      inputs: []
+      outputs:
+        lfn:
+          type: string
+          outputBinding:
+            outputEval: $("/vo/out.dst")
+    in: {}
+    out: [lfn]
+  read:
+    run:
+      class: CommandLineTool
+      baseCommand: [cat, replica_map.json]
+      inputs:
+        data: File
+      outputs:
+        seen: stdout
+      stdout: seen.json
+    in:
+      data:
+        source: produce/lfn
+        valueFrom: '$({"class": "File", "location": "LFN:" + self})'
+    out: [seen]
+"""
+
+
+def make_entry(url: str) -> ReplicaMap.MapEntry:
+    """Build a replica map entry with a single replica."""
+    return ReplicaMap.MapEntry(replicas=[ReplicaMap.MapEntry.Replica(url=url, se="SE-A")])
+
+
+def make_job(outdir: Path, inputs: dict) -> SimpleNamespace:
+    """Build a job reading the given inputs, as the executors see a CommandLineJob."""
+    return SimpleNamespace(name="step", outdir=str(outdir), builder=SimpleNamespace(job=inputs), output_callback=None)
+
+
+def test_step_replica_map(tmp_path):
+    """A step gets the entries of its LFN inputs only, and its changes are merged back."""
+    global_map_path = tmp_path / "replica_map.json"
+    global_map_path.write_text(
+        ReplicaMap(
+            root={
+                "/vo/a.dst": make_entry("file:///data/a.dst"),
+                "/vo/b.dst": make_entry("file:///data/b.dst"),
+                "/vo/c.dst": make_entry("file:///data/c.dst"),
+            }
+        ).model_dump_json()
+    )
+    executor = DiracExecutor(global_map_path)
+    executor._setup_replica_map(SimpleNamespace())
+
+    job = make_job(
+        tmp_path,
+        {
+            "files": [{"class": "File", "location": "LFN:/vo/a.dst"}, {"class": "File", "path": "LFN:/vo/b.dst"}],
+            "missing": {"class": "File", "location": "LFN:/vo/missing.dst"},
+            "local": {"class": "File", "location": "file:///data/local.dst"},
+        },
+    )
+    executor._prepare_job_replica_map(job, SimpleNamespace())
+    step_map = json.loads((tmp_path / "replica_map.json").read_text())
+    assert list(step_map) == ["/vo/a.dst", "/vo/b.dst"]
+
+    # The application registers its output
+    append_deltas(tmp_path / "replica_map.delta.jsonl", {"LFN:/vo/out.dst": make_entry("file:///data/out.dst")})
+    executor._update_replica_map_from_job(job, SimpleNamespace())
+    assert list(executor.global_map.root) == ["/vo/a.dst", "/vo/b.dst", "/vo/c.dst", "/vo/out.dst"]
+
+
+def test_step_replica_map_rewritten_with_deltas(tmp_path):
+    """The changes of the delta file override the entries of a rewritten step replica map."""
+    executor = DiracExecutor()
+    executor._setup_replica_map(SimpleNamespace())
+    job = make_job(tmp_path, {})
+    executor._prepare_job_replica_map(job, SimpleNamespace())
+
+    # The application rewrites the step replica map, then records changes
+    (tmp_path / "replica_map.json").write_text(
+        ReplicaMap(
+            root={"/vo/a.dst": make_entry("file:///data/a.dst"), "/vo/b.dst": make_entry("file:///data/b.dst")}
+        ).model_dump_json()
+    )
+    append_deltas(tmp_path / "replica_map.delta.jsonl", {"LFN:/vo/b.dst": make_entry("file:///data/b2.dst")})
+    append_deltas(tmp_path / "replica_map.delta.jsonl", {"LFN:/vo/c.dst": make_entry("file:///data/c.dst")})
+    executor._update_replica_map_from_job(job, SimpleNamespace())
+
+    assert list(executor.global_map.root) == ["/vo/a.dst", "/vo/b.dst", "/vo/c.dst"]
+    assert str(executor.global_map.root["/vo/b.dst"].replicas[0].url) == "file:///data/b2.dst"
+
+
+def test_merge_before_reporting_outputs(tmp_path):
+    """The changes of a job are in the global map when the downstream steps get its outputs."""
+    executor = DiracParallelExecutor()
+    executor._setup_replica_map(SimpleNamespace())
+    reported = []
+
+    def output_callback(outputs, process_status):
+        reported.append((outputs, process_status, "/vo/out.dst" in executor.global_map.root))
+
+    job = make_job(tmp_path, {})
+    job.output_callback = output_callback
+    executor._prepare_job_replica_map(job, SimpleNamespace())
+    executor._merge_replica_map_on_completion(job, SimpleNamespace())
+
+    append_deltas(tmp_path / "replica_map.delta.jsonl", {"/vo/out.dst": make_entry("file:///data/out.dst")})
+    job.output_callback({"out": None}, "success")
+    assert reported == [({"out": None}, "success", True)]
+
+
+def test_parallel_resources():
+    """The jobs share the cores available to the process by default."""
+    executor = DiracParallelExecutor()
+    assert executor.max_cores == available_cores()
+    assert executor.max_ram > 0
+
+    executor = DiracParallelExecutor(max_cores=1.5, max_ram=1024)
+    assert (executor.max_cores, executor.max_ram) == (1.5, 1024)
+
+
+def test_parallel_workflow(tmp_path, monkeypatch):
+    """The replica map of a step lists the outputs registered by the steps it depends on."""
+    from cwltool.context import LoadingContext
+    from cwltool.main import main as cwltool_main
+
+    from dirac_cwl.job.executor.tool import dirac_make_tool
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "workflow.cwl").write_text(WORKFLOW)
+    loading_context = LoadingContext()
+    loading_context.construct_tool_object = dirac_make_tool
+
+    exit_code = cwltool_main(
+        argsl=["--parallel", "--outdir", str(tmp_path / "outputs"), str(tmp_path / "workflow.cwl")],
+        executor=DiracParallelExecutor(),
+        loadingContext=loading_context,
+    )
+
+    assert exit_code == 0
+    seen = json.loads((tmp_path / "outputs" / "seen.json").read_text())
+    assert list(seen) == ["/vo/out.dst"]
@@ -0,0 +1,109 @@
+"""
+Tests for the local file catalog.
+
+This module tests the SQLite backend of the mock file catalog.
+"""
+
+import json
+import threading
+
+import pytest
+
+from dirac_cwl.mocks.file_catalog import LocalFileCatalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """Create an empty local file catalog."""
+    return LocalFileCatalog(databasePath=tmp_path / "filecatalog" / "catalog.db")
+
+
+def test_add_file(catalog):
+    """Files are added once, alone or in bulk."""
+    res = catalog.addFile("lfn:/vo/data/file_0")
+    assert res["OK"]
+    assert res["Value"] == {"Successful": {"lfn:/vo/data/file_0": True}, "Failed": {}}
+
+    # A single existing file is an error
+    assert not catalog.addFile("/vo/data/file_0")["OK"]
+
+    res = catalog.addFile(["/vo/data/file_0", "/vo/data/file_1", "/vo/data/file_2"])
+    assert res["OK"]
+    assert set(res["Value"]["Successful"]) == {"/vo/data/file_1", "/vo/data/file_2"}
+    assert set(res["Value"]["Failed"]) == {"/vo/data/file_0"}
+
+    res = catalog.getFileMetadata(["/vo/data/file_1", "/vo/data/unknown"])
+    assert res["OK"]
+    assert set(res["Value"]["Successful"]["/vo/data/file_1"]) == {"CreationDate"}
+    assert set(res["Value"]["Failed"]) == {"/vo/data/unknown"}
+
+
+def test_set_metadata(catalog):
+    """Metadata are replaced, alone or in bulk."""
+    catalog.addFile("/vo/data/file_0")
+    assert catalog.setMetadata("/vo/data/file_0", {"Events": 100, "Type": "SIM"})["OK"]
+    assert catalog.getFileMetadata("/vo/data/file_0")["Value"]["Successful"] == {
+        "/vo/data/file_0": {"Events": 100, "Type": "SIM"}
+    }
+
+    res = catalog.setMetadataBulk({f"/vo/data/file_{i}": {"Events": i, "Type": "RECO"} for i in range(5)})
+    assert res["OK"]
+    assert len(res["Value"]["Successful"]) == 5
+    assert catalog.getFileMetadata("/vo/data/file_0")["Value"]["Successful"] == {
+        "/vo/data/file_0": {"Events": 0, "Type": "RECO"}
+    }
+
+
+def test_queries(catalog):
+    """Files are found by directory and by metadata."""
+    catalog.setMetadataBulk(
+        {
+            "/vo/sim/file_0": {"Type": "SIM", "Run": 1},
+            "/vo/sim/file_1": {"Type": "SIM", "Run": 2},
+            "/vo/sim/sub/file_2": {"Type": "SIM", "Run": 1},
+            "/vo/simulation/file_3": {"Type": "SIM", "Run": 1},
+            "/vo/reco/file_4": {"Type": "RECO", "Run": 1},
+        }
+    )
+
+    res = catalog.findFilesByMetadata({"Type": "SIM", "Run": 1})
+    assert res["Value"] == ["/vo/sim/file_0", "/vo/sim/sub/file_2", "/vo/simulation/file_3"]
+    res = catalog.findFilesByMetadata({"Type": "SIM", "Run": 1}, path="/vo/sim")
+    assert res["Value"] == ["/vo/sim/file_0", "/vo/sim/sub/file_2"]
+
+    res = catalog.listDirectory("lfn:/vo/sim")
+    listing = res["Value"]["Successful"]["lfn:/vo/sim"]
+    assert listing["Files"] == {
+        "/vo/sim/file_0": {"MetaData": {"Type": "SIM", "Run": 1}},
+        "/vo/sim/file_1": {"MetaData": {"Type": "SIM", "Run": 2}},
+    }
+    assert listing["SubDirs"] == {"/vo/sim/sub": True}
+
+
+def test_legacy_import(tmp_path):
+    """The JSON catalog of the previous implementation is imported."""
+    legacy_path = tmp_path / "metadata.json"
+    legacy_path.write_text(json.dumps({"lfn:/vo/file_0": {"CreationDate": 1.0}}))
+
+    catalog = LocalFileCatalog(databasePath=tmp_path / "catalog.db")
+    assert catalog.getFileMetadata("/vo/file_0")["Value"]["Successful"] == {"/vo/file_0": {"CreationDate": 1.0}}
+    assert not legacy_path.exists()
+
+
+def test_concurrent_writers(tmp_path):
+    """Concurrent writers do not lose each other's updates."""
+    database_path = tmp_path / "catalog.db"
+
+    def register(index):
+        catalog = LocalFileCatalog(databasePath=database_path)
+        for i in range(50):
+            assert catalog.addFile(f"/vo/writer_{index}/file_{i}")["OK"]
+
+    threads = [threading.Thread(target=register, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    res = LocalFileCatalog(databasePath=database_path).findFilesByMetadata({}, path="/vo")
+    assert len(res["Value"]) == 200
@@ -0,0 +1,106 @@
+"""
+Tests for the input data stager.
+
+This module tests the concurrent staging of the input data of a job.
+"""
+
+import threading
+import time
+from pathlib import Path, PurePosixPath
+
+import pytest
+
+from dirac_cwl.job.input_data import InputDataStager
+
+
+class FakeDataManager:
+    """Data manager serving files from two storage elements."""
+
+    def __init__(self, failures=None):
+        """Serve files, failing the given number of times for some LFNs."""
+        self.lock = threading.Lock()
+        self.running: dict[str, int] = {"SE-A": 0, "SE-B": 0}
+        self.peak: dict[str, int] = {"SE-A": 0, "SE-B": 0}
+        # Number of times each LFN fails before being downloaded
+        self.failures = dict(failures or {})
+        self.calls: list[tuple[str, str]] = []
+
+    def getActiveReplicas(self, lfns):
+        """Half of the files are on SE-A, the other half on SE-B."""
+        return {
+            "OK": True,
+            "Value": {
+                "Successful": {lfn: {"SE-A" if int(lfn.rsplit("_", 1)[1]) % 2 else "SE-B": "pfn"} for lfn in lfns},
+                "Failed": {},
+            },
+        }
+
+    def getFile(self, lfns, destinationDir, sourceSE=None):
+        """Pretend to download the files, reporting them by string LFN."""
+        (lfn,) = map(str, lfns)
+        with self.lock:
+            self.calls.append((lfn, sourceSE))
+            self.running[sourceSE] += 1
+            self.peak[sourceSE] = max(self.peak[sourceSE], self.running[sourceSE])
+        time.sleep(0.01)
+        with self.lock:
+            self.running[sourceSE] -= 1
+            if self.failures.get(lfn, 0) > 0:
+                self.failures[lfn] -= 1
+                return {"OK": True, "Value": {"Successful": {}, "Failed": {lfn: "Transient error"}}}
+        return {"OK": True, "Value": {"Successful": {lfn: f"{destinationDir}/{lfn}"}, "Failed": {}}}
+
+
+@pytest.mark.asyncio
+async def test_stage_concurrency_per_se(tmp_path):
+    """Transfers are parallel, but bounded for each storage element."""
+    datamanager = FakeDataManager()
+    progress = []
+    stager = InputDataStager(
+        datamanager, tmp_path, max_transfers_per_se=3, progress_callback=lambda *args: progress.append(args)
+    )
+
+    lfns = [f"/vo/file_{i}" for i in range(20)]
+    paths = await stager.stage(lfns)
+
+    assert list(paths) == lfns
+    assert paths["/vo/file_3"] == Path(f"{tmp_path}//vo/file_3")
+    assert datamanager.peak == {"SE-A": 3, "SE-B": 3}
+    assert all(se == ("SE-A" if int(lfn.rsplit("_", 1)[1]) % 2 else "SE-B") for lfn, se in datamanager.calls)
+    # Progress is reported every 10%
+    assert progress == [(i, 20) for i in range(2, 21, 2)]
+
+
+@pytest.mark.asyncio
+async def test_stage_retry(tmp_path):
+    """A file failing transiently is retried."""
+    datamanager = FakeDataManager(failures={"/vo/file_1": 2})
+    stager = InputDataStager(datamanager, tmp_path, max_attempts=3, retry_delay=0)
+
+    paths = await stager.stage(["/vo/file_1", "/vo/file_2"])
+
+    assert set(paths) == {"/vo/file_1", "/vo/file_2"}
+    assert [lfn for lfn, _ in datamanager.calls].count("/vo/file_1") == 3
+
+
+@pytest.mark.asyncio
+async def test_stage_failure(tmp_path):
+    """A file failing at every attempt makes the staging fail."""
+    datamanager = FakeDataManager(failures={"/vo/file_1": 5})
+    stager = InputDataStager(datamanager, tmp_path, max_attempts=2, retry_delay=0)
+
+    with pytest.raises(RuntimeError, match="/vo/file_1"):
+        await stager.stage(["/vo/file_1", "/vo/file_2"])
+
+
+@pytest.mark.asyncio
+async def test_stage_non_string_lfns(tmp_path):
+    """LFNs which are not strings are matched with the string LFNs reported by the data manager."""
+    datamanager = FakeDataManager()
+    stager = InputDataStager(datamanager, tmp_path)
+
+    lfns = [PurePosixPath("/vo/file_1"), PurePosixPath("/vo/file_2")]
+    paths = await stager.stage(lfns)
+
+    assert paths == {lfn: Path(f"{tmp_path}/{lfn}") for lfn in lfns}
+    assert sorted(datamanager.calls) == [("/vo/file_1", "SE-A"), ("/vo/file_2", "SE-B")]
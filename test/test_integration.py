@@ -93,7 +93,7 @@ class TestRealWorldScenarios:
         assert isinstance(processed_command, list)
 
         # Post-process should return a boolean
-        result = await job_wrapper.post_process(0, "{}", "{}")
+        result = await job_wrapper.post_process(0, {}, "")
         assert isinstance(result, bool)
 
     @pytest.mark.asyncio
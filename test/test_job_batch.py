@@ -0,0 +1,73 @@
+"""
+Tests for job batches.
+
+This module tests the content-addressed task documents shared by the jobs of a submission.
+"""
+
+import json
+
+import pytest
+from cwl_utils.parser.cwl_v1_2 import CommandLineTool
+
+from dirac_cwl.job.job_batch import (
+    JobBatch,
+    load_task_document,
+    serialize_task,
+    task_document_path,
+    write_task_document,
+)
+from dirac_cwl.submission_models import JobInputModel
+
+
+def test_serialize_task_is_deterministic(sample_command_line_tool):
+    """The same task always produces the same document and digest."""
+    digest, document = serialize_task(sample_command_line_tool)
+    assert serialize_task(sample_command_line_tool) == (digest, document)
+    assert len(digest) == 64
+
+    other_task = CommandLineTool(
+        id=".", inputs=[], outputs=[], requirements=[], cwlVersion="v1.2", baseCommand=["echo", "Bye"]
+    )
+    assert serialize_task(other_task)[0] != digest
+
+
+def test_task_document_roundtrip(tmp_path, sample_command_line_tool):
+    """A task document is written once and loaded back as a CWL object."""
+    digest, path = write_task_document(sample_command_line_tool, tmp_path)
+    assert path == task_document_path(tmp_path, digest)
+    mtime = path.stat().st_mtime_ns
+
+    # Writing the same task again does not rewrite the document
+    assert write_task_document(sample_command_line_tool, tmp_path) == (digest, path)
+    assert path.stat().st_mtime_ns == mtime
+
+    task = load_task_document(path, digest)
+    assert isinstance(task, CommandLineTool)
+    assert task.baseCommand == ["echo", "Hello World"]
+
+
+def test_corrupted_task_document(tmp_path, sample_command_line_tool):
+    """A document that does not match its digest is rejected."""
+    digest, path = write_task_document(sample_command_line_tool, tmp_path)
+    path.write_text(path.read_text().replace("Hello World", "Hello Moon"))
+
+    with pytest.raises(ValueError, match="corrupted"):
+        load_task_document(path, digest)
+
+
+def test_job_batch(tmp_path, sample_command_line_tool):
+    """Jobs of a batch only reference the task document."""
+    with JobBatch(sample_command_line_tool, parent=tmp_path) as batch:
+        assert batch.directory is not None
+        assert batch.task_path is not None and batch.task_path.exists()
+
+        job_files = [
+            batch.write_job(f"job_{index}", JobInputModel(sandbox=None, cwl={"index": index})) for index in range(3)
+        ]
+        for index, job_file in enumerate(job_files):
+            content = json.loads(job_file.read_text())
+            assert content == {"task_digest": batch.task_digest, "input": {"sandbox": None, "cwl": {"index": index}}}
+
+        directory = batch.directory
+
+    assert not directory.exists()
@@ -0,0 +1,104 @@
+"""
+Tests for the buffering of the job status updates.
+
+This module tests the ordering of the updates, their coalescing by the
+background flusher, and their delivery when the report is closed.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from dirac_cwl.job.job_report import JobMinorStatus, JobReport, JobStatus
+
+
+class FakeJobs:
+    """Record the status updates sent to DiracX."""
+
+    def __init__(self, failures: int = 0):
+        """Fail the given number of first calls."""
+        self.calls: list[dict] = []
+        self.failures = failures
+
+    async def set_job_statuses(self, body):
+        """Record a call."""
+        if self.failures:
+            self.failures -= 1
+            return SimpleNamespace(success=False)
+        self.calls.append(body)
+        return SimpleNamespace(success=True)
+
+
+def make_report(jobs: FakeJobs, **kwargs) -> JobReport:
+    """Build the report of job 1."""
+    return JobReport(1, "JobWrapper", SimpleNamespace(jobs=jobs), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_updates_are_distinct_and_ordered():
+    """Updates set within the same clock tick are all kept, in order."""
+    jobs = FakeJobs()
+    report = make_report(jobs)
+    for i in range(1000):
+        report.set_job_status(application_status=str(i))
+
+    info = report.job_status_info
+    assert len(info) == 1000
+    assert [update["ApplicationStatus"] for update in info.values()] == [str(i) for i in range(1000)]
+    assert list(info) == sorted(info)
+
+    await report.commit()
+    assert len(jobs.calls) == 1
+    assert report.job_status_info == {}
+
+
+@pytest.mark.asyncio
+async def test_failed_updates_are_sent_again():
+    """Updates that could not be sent are kept, before the newer ones."""
+    jobs = FakeJobs(failures=1)
+    report = make_report(jobs)
+    report.set_job_status(JobStatus.RUNNING, JobMinorStatus.JOB_INITIALIZATION)
+    with pytest.raises(RuntimeError):
+        await report.commit()
+
+    report.set_job_status(minor_status=JobMinorStatus.APPLICATION)
+    await report.commit()
+    ((body,),) = [call.values() for call in jobs.calls]
+    assert [update["MinorStatus"] for update in body.values()] == [
+        JobMinorStatus.JOB_INITIALIZATION,
+        JobMinorStatus.APPLICATION,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_commits_are_coalesced():
+    """Commits close in time are sent together, and closing sends the rest."""
+    jobs = FakeJobs()
+    async with make_report(jobs, flush_interval=60, coalesce_delay=0.05) as report:
+        for minor_status in (JobMinorStatus.JOB_INITIALIZATION, JobMinorStatus.INPUT_DATA_RESOLUTION):
+            report.set_job_status(minor_status=minor_status)
+            await report.commit()
+        await asyncio.sleep(0.2)
+        assert len(jobs.calls) == 1
+
+        report.set_job_status(JobStatus.COMPLETING, JobMinorStatus.APP_SUCCESS)
+        await report.commit()
+        report.set_job_status(JobStatus.DONE, JobMinorStatus.EXEC_COMPLETE)
+    assert len(jobs.calls) == 2
+    assert [update["Status"] for update in jobs.calls[1][1].values()] == [JobStatus.COMPLETING, JobStatus.DONE]
+
+
+@pytest.mark.asyncio
+async def test_flush_size_and_interval():
+    """Pending updates are sent when they are too many, or at the flush interval."""
+    jobs = FakeJobs()
+    async with make_report(jobs, flush_interval=0.1, flush_size=3, coalesce_delay=0) as report:
+        for i in range(3):
+            report.set_job_status(application_status=str(i))
+        await asyncio.sleep(0.02)
+        assert len(jobs.calls) == 1
+
+        report.set_job_status(application_status="3")
+        await asyncio.sleep(0.2)
+        assert len(jobs.calls) == 2
@@ -0,0 +1,125 @@
+"""
+Tests for the local job router.
+
+This module tests how the router dispatches the jobs of a submission.
+"""
+
+import threading
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+
+from dirac_cwl.job.submission_clients import JobIsolation
+from dirac_cwl.submission_models import JobInputModel, JobModel, JobSubmissionModel
+
+
+@pytest.fixture
+def job_submission(sample_command_line_tool, tmp_path, monkeypatch):
+    """Create a job submission with 6 jobs."""
+    # The router writes the task document of the batch in the working directory
+    monkeypatch.chdir(tmp_path)
+    return JobSubmissionModel(
+        task=sample_command_line_tool,
+        inputs=[JobInputModel(sandbox=None, cwl={}) for _ in range(6)],
+    )
+
+
+class TestSubmitJobRouter:
+    """Test the submit_job_router function."""
+
+    @pytest.mark.parametrize("max_parallel_jobs", [1, 2, 4])
+    def test_concurrency_is_bounded(self, mocker, job_submission, max_parallel_jobs):
+        """The router never runs more jobs at a time than requested."""
+        from dirac_cwl import job as job_module
+
+        lock = threading.Lock()
+        running = 0
+        peak = 0
+        job_ids = []
+
+        def fake_run_job(job_id, job, logger, isolation, batch):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+                job_ids.append(job_id)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+            return True
+
+        mocker.patch.object(job_module, "run_job", side_effect=fake_run_job)
+
+        assert job_module.submit_job_router(job_submission, max_parallel_jobs=max_parallel_jobs)
+        assert len(job_ids) == 6
+        assert len(set(job_ids)) == 6
+        assert peak == max_parallel_jobs
+
+    def test_failure_is_reported(self, mocker, job_submission):
+        """A single failed job makes the submission fail."""
+        from dirac_cwl import job as job_module
+
+        results = iter([True, True, False, True, True, True])
+        lock = threading.Lock()
+
+        def fake_run_job(job_id, job, logger, isolation, batch):
+            with lock:
+                return next(results)
+
+        mocker.patch.object(job_module, "run_job", side_effect=fake_run_job)
+
+        assert not job_module.submit_job_router(job_submission, max_parallel_jobs=3)
+
+
+class TestRunJob:
+    """Test the run_job function."""
+
+    def test_in_process(self, mocker, sample_command_line_tool):
+        """The in-process mode calls the job wrapper directly with the parsed task."""
+        from dirac_cwl import job as job_module
+        from dirac_cwl.job.status_aggregator import get_status_aggregator
+
+        subprocess_mock = mocker.patch.object(job_module.subprocess, "run")
+        wrapper_cls = mocker.patch("dirac_cwl.job.job_wrapper.JobWrapper")
+        wrapper_cls.return_value.run_job = AsyncMock(return_value=True)
+
+        job_input = JobInputModel(sandbox=None, cwl={"message": "hello"})
+        job = JobModel(task=sample_command_line_tool, input=job_input)
+
+        assert job_module.run_job(1234, job, mocker.Mock(), JobIsolation.IN_PROCESS)
+
+        subprocess_mock.assert_not_called()
+        # The jobs of the process share the same status aggregator
+        wrapper_cls.assert_called_once_with(1234, status_aggregator=get_status_aggregator())
+        executed_job = wrapper_cls.return_value.run_job.call_args.args[0]
+        # The task is shared, the inputs are not
+        assert executed_job.task is sample_command_line_tool
+        assert executed_job.input == job_input
+        assert executed_job.input is not job_input
+
+    def test_in_process_failure(self, mocker, sample_command_line_tool):
+        """An exception raised by the job wrapper fails the job without stopping the router."""
+        from dirac_cwl import job as job_module
+
+        wrapper_cls = mocker.patch("dirac_cwl.job.job_wrapper.JobWrapper")
+        wrapper_cls.return_value.run_job = AsyncMock(side_effect=RuntimeError("boom"))
+
+        job = JobModel(task=sample_command_line_tool)
+        assert not job_module.run_job(1234, job, mocker.Mock(), JobIsolation.IN_PROCESS)
+
+    def test_subprocess_logs_inputs(self, mocker, sample_command_line_tool, tmp_path, monkeypatch):
+        """The inputs of a job are logged in a single record, not printed from the worker thread."""
+        from dirac_cwl import job as job_module
+
+        monkeypatch.chdir(tmp_path)
+        mocker.patch.object(job_module.subprocess, "run", return_value=mocker.Mock(returncode=0, stdout="", stderr=""))
+        print_json = mocker.patch.object(job_module, "print_json")
+        logger = mocker.Mock()
+
+        job = JobModel(task=sample_command_line_tool, input=JobInputModel(sandbox=None, cwl={"message": "hello"}))
+        assert job_module.run_job(1234, job, logger, JobIsolation.SUBPROCESS)
+
+        print_json.assert_not_called()
+        message, *args = logger.info.call_args_list[0].args
+        assert '"message": "hello"' in message % tuple(args)
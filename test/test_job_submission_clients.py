@@ -15,6 +15,7 @@ from dirac_cwl.job.submission_clients import DIRACSubmissionClient, PrototypeSub
 from dirac_cwl.submission_models import (
     JobInputModel,
     JobModel,
+    JobSubmissionModel,
 )
 
 
@@ -90,6 +91,37 @@ LFN:/pi/100/result_5.sim;""",
 
         assert res == expected_jdl
 
+    @pytest.mark.asyncio
+    async def test_submit_job_sandboxes(self, mocker):
+        """The task document is uploaded once, and each job file in its own sandbox."""
+        from dirac_cwl.job import submission_clients
+
+        uploads = []
+
+        async def create_sandbox(paths):
+            uploads.append([path.name for path in paths])
+            return f"SB:SandboxSE|/S3/diracx-sandbox-store/sha256:{len(uploads):04}.tar.zst"
+
+        mocker.patch.object(submission_clients, "create_sandbox", create_sandbox)
+        client = mocker.patch.object(submission_clients, "AsyncDiracClient").return_value.__aenter__.return_value
+        client.jobs.submit_jdl_jobs = mocker.AsyncMock(return_value=[])
+
+        task = load_document(pack("test/workflows/helloworld/description_basic.cwl"))
+        job_submission = JobSubmissionModel(
+            task=task, inputs=[JobInputModel(sandbox=None, cwl={}), JobInputModel(sandbox=None, cwl={})]
+        )
+        assert await DIRACSubmissionClient().submit_job(job_submission)
+
+        assert len(uploads) == 3
+        assert len(uploads[0]) == 1 and uploads[0][0].endswith(".cwl")
+        assert uploads[1:] == [["job_0.json"], ["job_1.json"]]
+        jdls = client.jobs.submit_jdl_jobs.call_args.args[0]
+        assert "InputSandbox = {SB:SandboxSE|/S3/diracx-sandbox-store/sha256:0001.tar.zst, " in jdls[0]
+        assert jdls[1].endswith(
+            "InputSandbox = {SB:SandboxSE|/S3/diracx-sandbox-store/sha256:0001.tar.zst, "
+            "SB:SandboxSE|/S3/diracx-sandbox-store/sha256:0003.tar.zst};"
+        )
+
 
 class TestPrototypeSubmissionClient:
     """Test the PrototypeSubmissionClient class."""
@@ -35,7 +35,7 @@ class TestJobWrapper:
         assert result == command  # Should return command unchanged
 
         # Test default post_process behavior
-        result = await job_wrapper.post_process(0, "{}", "{}")  # Should not raise any exception
+        result = await job_wrapper.post_process(0, {}, "")  # Should not raise any exception
         assert result
 
         # Test default run_job behavior
@@ -88,7 +88,7 @@ class TestJobWrapper:
 
         execute_dualprocess_mock.reset_mock()  # Reset the mock to be able to call "assert_called_once"
 
-        await job_wrapper.post_process(0, "{}", "{}")
+        await job_wrapper.post_process(0, {}, "")
         execute_postprocess_mock.assert_called_once()
         execute_dualprocess_mock.assert_called_once()
 
@@ -101,7 +101,7 @@ class TestJobWrapper:
             await job_wrapper.pre_process(sample_job.task, None)
 
         with pytest.raises(TypeError):
-            await job_wrapper.post_process(0, "{}", "{}")
+            await job_wrapper.post_process(0, {}, "")
 
     @pytest.mark.asyncio
     async def test_command_exception(self, job_type_testing, sample_job, mocker, monkeypatch):
@@ -129,7 +129,7 @@ class TestJobWrapper:
             await job_wrapper.pre_process(sample_job.task, None)
 
         with pytest.raises(WorkflowProcessingException):
-            await job_wrapper.post_process(0, "{}", "{}")
+            await job_wrapper.post_process(0, {}, "")
 
     @pytest.mark.asyncio
     async def test_job_status(self):
@@ -167,4 +167,9 @@ class TestJobWrapper:
         # Status info only stays accumulated for local testing, status info is emptied when committing to diracx
         assert len(job_wrapper._job_report.job_status_info) > 0
         assert (STATUS_DIR / f"status_{job_id}").exists()
+        # The payload log is kept when the job directory is removed
+        assert not job_wrapper._job_path.exists()
+        assert job_wrapper._log_path.parent == job_wrapper._job_path.parent
+        assert job_wrapper._log_path.exists()
+        job_wrapper._log_path.unlink()
         rmtree(STATUS_DIR)
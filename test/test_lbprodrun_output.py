@@ -0,0 +1,49 @@
+"""
+Tests for the handling of the output of lb-prod-run.
+
+This module tests the splitting of the output in lines, the batched writes to
+the application log and the rate-limited mirror to the logger.
+"""
+
+import asyncio
+import logging
+
+import pytest
+
+from dirac_cwl.job.executor.run_lbprodrun import LogMirror, handle_output, readlines
+
+
+def make_stream(*chunks: bytes) -> asyncio.StreamReader:
+    """Build a stream fed with the given chunks."""
+    stream = asyncio.StreamReader()
+    for chunk in chunks:
+        stream.feed_data(chunk)
+    stream.feed_eof()
+    return stream
+
+
+@pytest.mark.asyncio
+async def test_readlines():
+    """Lines split across chunks, long lines and a last line without newline are read."""
+    long_line = b"x" * 200_000
+    stream = make_stream(b"first\nsec", b"ond\n\n", long_line[:100_000], long_line[100_000:] + b"\n\xff", b"last")
+
+    lines = [line async for line in readlines(stream, chunk_size=1024)]
+
+    assert lines == ["first", "second", "", long_line.decode(), "\\xfflast"]
+
+
+@pytest.mark.asyncio
+async def test_handle_output(tmp_path, caplog):
+    """All the lines are written to the log file, only some are mirrored to the logger."""
+    stream = make_stream(b"".join(b"line %d\n" % i for i in range(1000)))
+    mirror = LogMirror(rate=10)
+
+    with caplog.at_level(logging.INFO), open(tmp_path / "app.log", "w") as fh:
+        await handle_output(stream, fh, mirror)
+        mirror.close()
+
+    assert (tmp_path / "app.log").read_text().splitlines() == [f"line {i}" for i in range(1000)]
+    mirrored = [r.getMessage() for r in caplog.records if r.getMessage().startswith("line ")]
+    assert mirrored == [f"line {i}" for i in range(10)]
+    assert "... 990 line(s) not mirrored, see the application log" in caplog.messages
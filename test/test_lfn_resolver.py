@@ -0,0 +1,67 @@
+"""
+Tests for the LFN resolver.
+
+This module tests the memoized resolution of LFNs through a replica map.
+"""
+
+from diracx.core.models.replica_map import ReplicaMap
+
+from dirac_cwl.job.executor.lfn_resolver import LFNResolver
+
+
+def make_entry(url: str, size: int | None = None, adler32: str | None = None) -> ReplicaMap.MapEntry:
+    """Build a replica map entry with a single replica."""
+    return ReplicaMap.MapEntry(
+        replicas=[ReplicaMap.MapEntry.Replica(url=url, se="SE-A")],
+        size_bytes=size,
+        checksum=ReplicaMap.MapEntry.Checksum(adler32=adler32) if adler32 else None,
+    )
+
+
+def test_resolve():
+    """Local and remote replicas are resolved, unknown LFNs are returned as is."""
+    resolver = LFNResolver(
+        ReplicaMap(
+            root={
+                "/vo/local.dst": make_entry("file:///data/local.dst", size=10),
+                "/vo/remote.dst": make_entry("root://eos.example.org//remote.dst", adler32="788c5caa"),
+            }
+        )
+    )
+
+    local = resolver.resolve("LFN:/vo/local.dst")
+    assert local.found and not local.is_remote
+    assert local.path == "/data/local.dst"
+    assert local.pfn == "file:///data/local.dst"
+    assert local.size == 10
+
+    remote = resolver.resolve("/vo/remote.dst")
+    assert remote.is_remote
+    assert remote.path == remote.pfn == "root://eos.example.org//remote.dst"
+    assert remote.checksum == "adler32$788c5caa"
+
+    unknown = resolver.resolve("LFN:/vo/unknown.dst")
+    assert not unknown.found
+    assert unknown.path == "/vo/unknown.dst"
+
+
+def test_memoization_and_invalidation():
+    """Resolutions are computed once, until invalidated."""
+    replica_map = ReplicaMap(root={"/vo/a.dst": make_entry("file:///data/a.dst")})
+    resolver = LFNResolver(replica_map)
+
+    for _ in range(3):
+        resolver.resolve("LFN:/vo/a.dst")
+        resolver.resolve("LFN:/vo/b.dst")
+    assert resolver.stats.hits == 4
+    assert resolver.stats.misses == 2
+    assert resolver.stats.entries == 2
+
+    # The output of a step is registered in the replica map
+    replica_map.root["/vo/b.dst"] = make_entry("file:///data/b.dst")
+    assert not resolver.resolve("LFN:/vo/b.dst").found
+    resolver.invalidate(["/vo/b.dst"])
+
+    assert resolver.resolve("LFN:/vo/b.dst").path == "/data/b.dst"
+    assert resolver.stats.version == 1
+    assert resolver.stats.misses == 3
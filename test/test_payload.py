@@ -0,0 +1,104 @@
+"""
+Tests for the payload execution.
+
+This module tests that the payload output is streamed rather than buffered.
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+from dirac_cwl.job import payload
+from dirac_cwl.job.payload import RotatingLogFile, prune_payload_logs, run_payload
+
+
+def test_rotating_log_file(tmp_path):
+    """The log file is rotated when it exceeds its maximum size."""
+    log_path = tmp_path / "payload.log"
+    log_file = RotatingLogFile(log_path, max_bytes=10, backup_count=2)
+    for chunk in (b"aaaaaaaa", b"bbbbbbbb", b"cccccccc", b"dddddddd"):
+        log_file.write(chunk)
+    log_file.close()
+
+    assert log_path.read_bytes() == b"dddddddd"
+    assert (tmp_path / "payload.log.1").read_bytes() == b"cccccccc"
+    assert (tmp_path / "payload.log.2").read_bytes() == b"bbbbbbbb"
+    assert not (tmp_path / "payload.log.3").exists()
+
+
+@pytest.mark.asyncio
+async def test_run_payload(tmp_path, monkeypatch):
+    """Stderr goes to the log file, only its end is kept in memory."""
+    monkeypatch.setattr(payload, "STDERR_TAIL_BYTES", 1024)
+    script = (
+        "import json, sys, time\n"
+        "for i in range(2000):\n"
+        "    sys.stderr.write(f'line {i}\\n')\n"
+        "time.sleep(0.3)\n"
+        "print(json.dumps({'output': {'path': 'result.txt'}}))\n"
+    )
+    heartbeats = []
+
+    async def heartbeat(elapsed):
+        heartbeats.append(elapsed)
+
+    log_path = tmp_path / "logs" / "payload.log"
+    result = await run_payload(
+        [sys.executable, "-c", script],
+        cwd=tmp_path,
+        log_path=log_path,
+        heartbeat=heartbeat,
+        heartbeat_interval=0.05,
+    )
+
+    assert result.returncode == 0
+    assert result.outputs == {"output": {"path": "result.txt"}}
+    assert json.loads(result.stdout) == result.outputs
+    assert result.stderr.endswith("line 1999\n")
+    assert "line 0\n" not in result.stderr
+    assert len(result.stderr) < 2 * 1024 + payload.READ_CHUNK_SIZE
+    assert log_path.read_text() == "".join(f"line {i}\n" for i in range(2000))
+    assert heartbeats
+
+
+@pytest.mark.asyncio
+async def test_run_payload_large_output(tmp_path, monkeypatch):
+    """A large output document is parsed from the spooled file, only its beginning is kept as text."""
+    monkeypatch.setattr(payload, "STDOUT_SPOOL_BYTES", 1024)
+    script = "import json\nprint(json.dumps({f'output_{i}': {'path': f'result_{i}.txt'} for i in range(10000)}))\n"
+
+    result = await run_payload([sys.executable, "-c", script], cwd=tmp_path, log_path=tmp_path / "payload.log")
+
+    assert len(result.outputs) == 10000
+    assert result.outputs["output_9999"] == {"path": "result_9999.txt"}
+    assert len(result.stdout) == payload.STDOUT_HEAD_BYTES
+
+
+@pytest.mark.asyncio
+async def test_run_payload_failure(tmp_path):
+    """The return code of the payload is reported."""
+    result = await run_payload(
+        [sys.executable, "-c", "import sys; sys.stderr.write('boom'); sys.exit(3)"],
+        cwd=tmp_path,
+        log_path=tmp_path / "payload.log",
+    )
+
+    assert result.returncode == 3
+    assert result.stdout == ""
+    assert result.outputs is None
+    assert result.stderr == "boom"
+
+
+def test_prune_payload_logs(tmp_path):
+    """Only the old log files matching the pattern are removed, rotated ones included."""
+    old = [tmp_path / "1_a.cwltool.log", tmp_path / "1_a.cwltool.log.1"]
+    recent = [tmp_path / "2_b.cwltool.log", tmp_path / "other.log"]
+    for path in old + recent:
+        path.write_text("log")
+    for path in old + recent[1:]:
+        os.utime(path, (0, 0))
+
+    assert prune_payload_logs(tmp_path, "*.cwltool.log*", max_age=3600) == 2
+    assert sorted(tmp_path.iterdir()) == sorted(recent)
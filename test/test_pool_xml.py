@@ -0,0 +1,116 @@
+"""
+Tests for the pool XML catalog handling of the lb-prod-run wrapper.
+
+This module tests the streaming generation and update of the pool XML catalog.
+"""
+
+import xml.etree.ElementTree as ET
+
+from diracx.core.models.replica_map import ReplicaMap
+
+from dirac_cwl.job.executor.replica_map_delta import read_deltas
+from dirac_cwl.job.executor.run_lbprodrun import (
+    generate_pool_xml_catalog_from_replica_map,
+    update_pool_xml_to_absolute_paths,
+    update_replica_map_from_pool_xml,
+)
+
+GUID = "6032CB7C-32DC-EC11-9A66-D85ED3091D71"
+
+
+def write_replica_map(path):
+    """Write a replica map with a local and a remote input."""
+    replica_map = ReplicaMap(
+        root={
+            "/lhcb/MC/2024/00001_1.sim": ReplicaMap.MapEntry(
+                replicas=[ReplicaMap.MapEntry.Replica(url="root://eos.example.org//a&b.sim", se="CERN-DST")],
+                checksum=ReplicaMap.MapEntry.Checksum(guid=GUID),
+                size_bytes=10,
+            ),
+            "/lhcb/MC/2024/00002_1.digi": ReplicaMap.MapEntry(
+                replicas=[ReplicaMap.MapEntry.Replica(url="file:///data/00002_1.digi", se="DIRAC.Client.Local")],
+            ),
+        }
+    )
+    path.write_text(replica_map.model_dump_json())
+
+
+def test_generate(tmp_path):
+    """The catalog lists the replicas and LFNs of the replica map."""
+    write_replica_map(tmp_path / "replica_map.json")
+    catalog = tmp_path / "pool_xml_catalog.xml"
+
+    generate_pool_xml_catalog_from_replica_map(tmp_path / "replica_map.json", catalog)
+
+    content = catalog.read_text()
+    assert content.startswith('<?xml version="1.0" encoding="UTF-8" standalone="no" ?>\n<!-- Edited By POOL -->\n')
+    files = ET.parse(catalog).getroot().findall("File")
+    assert [f.get("ID") for f in files] == [GUID, None]
+    assert files[0].find("physical/pfn").attrib == {"name": "root://eos.example.org//a&b.sim", "filetype": "SIM"}
+    assert files[1].find("logical/lfn").get("name") == "/lhcb/MC/2024/00002_1.digi"
+
+
+def test_update_in_a_single_pass(tmp_path, monkeypatch):
+    """Relative PFNs become absolute and the outputs are added to the replica map."""
+    monkeypatch.chdir(tmp_path)
+    write_replica_map(tmp_path / "replica_map.json")
+    catalog = tmp_path / "pool_xml_catalog.xml"
+    generate_pool_xml_catalog_from_replica_map(tmp_path / "replica_map.json", catalog)
+
+    # The application registers its output with a relative PFN
+    (tmp_path / "00003_1.dst").write_bytes(b"x" * 42)
+    content = catalog.read_text().replace(
+        "</POOLFILECATALOG>",
+        '<File ID="7032CB7C-32DC-EC11-9A66-D85ED3091D71"><physical><pfn name="00003_1.dst" filetype="DST"/>'
+        '</physical><logical><lfn name="/lhcb/MC/2024/00003_1.dst"/></logical></File></POOLFILECATALOG>',
+    )
+    catalog.write_text(content)
+
+    assert update_pool_xml_to_absolute_paths(catalog, tmp_path / "replica_map.json") == 1
+
+    files = ET.parse(catalog).getroot().findall("File")
+    assert len(files) == 3
+    assert files[2].find("physical/pfn").get("name") == f"{tmp_path}/00003_1.dst"
+    assert "<!DOCTYPE POOLFILECATALOG" in catalog.read_text()
+
+    # Only the new entry is recorded, in the delta file
+    deltas = dict(read_deltas(tmp_path / "replica_map.delta.jsonl"))
+    assert list(deltas) == ["/lhcb/MC/2024/00003_1.dst"]
+    assert deltas["/lhcb/MC/2024/00003_1.dst"].size_bytes == 42
+
+    # Nothing changes when the catalog is read again
+    delta = (tmp_path / "replica_map.delta.jsonl").read_text()
+    update_replica_map_from_pool_xml(catalog, tmp_path / "replica_map.json")
+    assert (tmp_path / "replica_map.delta.jsonl").read_text() == delta
+
+
+def test_update_with_broken_replica_map(tmp_path, monkeypatch):
+    """A replica map that cannot be read does not prevent the update of the catalog."""
+    monkeypatch.chdir(tmp_path)
+    write_replica_map(tmp_path / "replica_map.json")
+    catalog = tmp_path / "pool_xml_catalog.xml"
+    generate_pool_xml_catalog_from_replica_map(tmp_path / "replica_map.json", catalog)
+    catalog.write_text(catalog.read_text().replace("file:///data/00002_1.digi", "00002_1.digi"))
+    (tmp_path / "00002_1.digi").write_bytes(b"x")
+    (tmp_path / "replica_map.json").write_text("{")
+
+    assert update_pool_xml_to_absolute_paths(catalog, tmp_path / "replica_map.json") == 1
+    assert f"{tmp_path}/00002_1.digi" in catalog.read_text()
+    assert not (tmp_path / "replica_map.delta.jsonl").exists()
+
+
+def test_update_keeps_meta(tmp_path, monkeypatch):
+    """The elements of the catalog other than File are kept by the update."""
+    monkeypatch.chdir(tmp_path)
+    write_replica_map(tmp_path / "replica_map.json")
+    catalog = tmp_path / "pool_xml_catalog.xml"
+    generate_pool_xml_catalog_from_replica_map(tmp_path / "replica_map.json", catalog)
+    catalog.write_text(
+        catalog.read_text().replace("<POOLFILECATALOG>\n", '<POOLFILECATALOG>\n<META name="Content" type="string"/>\n')
+    )
+
+    update_pool_xml_to_absolute_paths(catalog)
+
+    root = ET.parse(catalog).getroot()
+    assert [child.tag for child in root] == ["META", "File", "File"]
+    assert root.find("META").attrib == {"name": "Content", "type": "string"}
@@ -297,6 +297,21 @@ class TestInputDatasetPluginRegistry:
         # Warning should have been logged for FakeWrongPlugin
         logger_mock.warning.assert_called_once()
 
+    def test_lazy_discovery(self, mocker, monkeypatch):
+        """Test that plugins are discovered once, on the first lookup."""
+        from dirac_cwl.production import registry as registry_module
+
+        fake_ep = mocker.MagicMock()
+        fake_ep.load.return_value = TestPlugin
+        monkeypatch.setattr(registry_module, "entry_points", lambda *args, **kwargs: [fake_ep])
+
+        registry = InputDatasetPluginRegistry(lazy_discovery=True)
+        fake_ep.load.assert_not_called()
+
+        assert registry.get_plugin("TestPlugin") is TestPlugin
+        assert registry.list_plugins() == ["TestPlugin"]
+        fake_ep.load.assert_called_once()
+
 
 class TestGlobalRegistryFunctions:
     """Test the global registry functions."""
@@ -0,0 +1,53 @@
+"""
+Tests for the execution of productions by the router.
+
+This module tests the dependencies between the transformations of a production
+and their scheduling order.
+"""
+
+import pytest
+from cwl_utils.pack import pack
+from cwl_utils.parser import load_document
+
+from dirac_cwl.production import _get_transformations, _get_upstream_steps
+from dirac_cwl.submission_models import ProductionSubmissionModel
+from dirac_cwl.transformation.scheduler import build_dag
+
+
+def test_upstream_steps():
+    """Steps consuming the outputs of other steps depend on them."""
+    pi = load_document(pack("test/workflows/pi/description.cwl"))
+    crypto = load_document(pack("test/workflows/crypto/description.cwl"))
+
+    assert _get_upstream_steps(pi) == [set(), {0}]
+    assert _get_upstream_steps(crypto) == [set(), set(), set(), set()]
+
+
+def test_transformations_keep_hints():
+    """The transformations keep the hints of their step, e.g. their input query."""
+    production = ProductionSubmissionModel(task=load_document(pack("test/workflows/pi/description.cwl")))
+
+    _, gathering = _get_transformations(production)
+
+    assert gathering.task.hints[0]["group_size"] == 5
+
+
+def test_dag():
+    """The transformations are ordered by the length of the chain of transformations depending on them."""
+    production = ProductionSubmissionModel(task=load_document(pack("test/workflows/pi/description.cwl")))
+
+    simulate, gathering = build_dag(_get_transformations(production), _get_upstream_steps(production.task))
+
+    assert (simulate.downstream, simulate.critical_path) == ({1}, 2)
+    assert (gathering.upstream, gathering.critical_path) == ({0}, 1)
+
+
+@pytest.mark.parametrize("max_parallel_jobs", [0, -1])
+def test_dag_invalid_max_parallel_jobs(max_parallel_jobs):
+    """A limit of parallel jobs below 1 is rejected with the other invalid hints."""
+    production = ProductionSubmissionModel(task=load_document(pack("test/workflows/pi/description.cwl")))
+    transformations = _get_transformations(production)
+    transformations[0].task.hints = [{"class": "dirac:Scheduling", "max_parallel_jobs": max_parallel_jobs}]
+
+    with pytest.raises(ValueError, match="Invalid DIRAC hints"):
+        build_dag(transformations, _get_upstream_steps(production.task))
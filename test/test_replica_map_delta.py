@@ -0,0 +1,45 @@
+"""
+Tests for the replica map delta files.
+
+This module tests the recording and the replay of the changes of a step replica map.
+"""
+
+from diracx.core.models.replica_map import ReplicaMap
+
+from dirac_cwl.job.executor.replica_map_delta import append_deltas, delta_path_for, read_deltas
+
+
+def make_entry(url: str, size: int) -> ReplicaMap.MapEntry:
+    """Build a replica map entry with a single replica."""
+    return ReplicaMap.MapEntry(replicas=[ReplicaMap.MapEntry.Replica(url=url, se="SE-A")], size_bytes=size)
+
+
+def test_delta_path_for(tmp_path):
+    """The delta file sits next to the replica map."""
+    assert delta_path_for(tmp_path / "replica_map.json") == tmp_path / "replica_map.delta.jsonl"
+
+
+def test_append_and_read(tmp_path):
+    """Entries are read back in order, one compact line each."""
+    delta_path = tmp_path / "replica_map.delta.jsonl"
+    append_deltas(delta_path, {"LFN:/a": make_entry("file:///a", 1)})
+    append_deltas(delta_path, {"LFN:/b": make_entry("file:///b", 2), "LFN:/a": make_entry("file:///a2", 3)})
+    append_deltas(delta_path, {})
+
+    lines = delta_path.read_text().splitlines()
+    assert len(lines) == 3
+    assert all(": " not in line for line in lines)
+
+    deltas = list(read_deltas(delta_path))
+    assert [lfn for lfn, _ in deltas] == ["/a", "/b", "/a"]
+    assert deltas[2][1] == make_entry("file:///a2", 3)
+
+
+def test_truncated_line_is_skipped(tmp_path):
+    """A partially written last line does not prevent reading the others."""
+    delta_path = tmp_path / "replica_map.delta.jsonl"
+    append_deltas(delta_path, {"LFN:/a": make_entry("file:///a", 1)})
+    with open(delta_path, "a") as f:
+        f.write('{"lfn":"LFN:/b","entry":{"repl')
+
+    assert [lfn for lfn, _ in read_deltas(delta_path)] == ["/a"]
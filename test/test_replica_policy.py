@@ -0,0 +1,71 @@
+"""
+Tests for the replica ranking policies.
+
+This module tests the choice of the replica read by a step and the fallback
+to the next replica.
+"""
+
+from diracx.core.models.replica_map import ReplicaMap
+
+from dirac_cwl.core.throughput import SEThroughput
+from dirac_cwl.job.executor.lfn_resolver import LFNResolver
+from dirac_cwl.job.executor.replica_policy import LocalityReplicaPolicy
+
+
+def make_replica(url: str, se: str) -> ReplicaMap.MapEntry.Replica:
+    """Build a replica."""
+    return ReplicaMap.MapEntry.Replica(url=url, se=se)
+
+
+def test_locality_policy():
+    """Local files come first, then the site SEs, then the preferred protocols."""
+    remote = make_replica("https://remote.example.org/f.dst", "RAL-DST")
+    xrootd = make_replica("root://remote.example.org//f.dst", "RAL-DST")
+    site = make_replica("https://site.example.org/f.dst", "CERN-DST")
+    local = make_replica("file:///data/f.dst", "CERN-DST")
+    policy = LocalityReplicaPolicy(local_ses=["CERN-DST"])
+
+    assert policy.rank([remote, xrootd, site, local]) == [local, site, xrootd, remote]
+    assert LocalityReplicaPolicy(protocols=["https", "root"]).rank([xrootd, remote]) == [remote, xrootd]
+
+
+def test_throughput_ranking(tmp_path):
+    """Equivalent replicas are ranked by measured throughput, which is persisted."""
+    throughput = SEThroughput(tmp_path / "throughput.json")
+    throughput.record("SLOW-DST", 10 * 1024**2, 10.0)
+    throughput.record("FAST-DST", 10 * 1024**2, 1.0)
+    # Too small to be measured
+    throughput.record("SLOW-DST", 10, 0.0001)
+    throughput.save()
+
+    slow = make_replica("root://slow.example.org//f.dst", "SLOW-DST")
+    fast = make_replica("root://fast.example.org//f.dst", "FAST-DST")
+    policy = LocalityReplicaPolicy(throughput=SEThroughput(tmp_path / "throughput.json"))
+    assert policy.rank([slow, fast]) == [fast, slow]
+    assert policy.rank([slow]) == [slow]
+
+
+def test_resolver_fallback(tmp_path):
+    """Missing local replicas are skipped and failed replicas are replaced by the next ones."""
+    present = tmp_path / "present.dst"
+    present.write_text("data")
+    replica_map = ReplicaMap(
+        root={
+            "/vo/f.dst": ReplicaMap.MapEntry(
+                replicas=[
+                    make_replica("root://remote.example.org//f.dst", "RAL-DST"),
+                    make_replica(f"file://{tmp_path}/missing.dst", "LOCAL"),
+                    make_replica(f"file://{present}", "LOCAL"),
+                ]
+            )
+        }
+    )
+    resolver = LFNResolver(replica_map)
+
+    resolved = resolver.resolve("LFN:/vo/f.dst")
+    assert resolved.path == str(present)
+    assert resolved.alternatives == ("root://remote.example.org//f.dst",)
+
+    resolved = resolver.mark_failed("LFN:/vo/f.dst", resolved.pfn)
+    assert resolved.is_remote
+    assert resolved.alternatives == ()
@@ -0,0 +1,66 @@
+"""
+Tests for the mock sandbox store.
+
+This module tests the creation and the retrieval of sandboxes.
+"""
+
+import os
+
+import pytest
+
+from dirac_cwl.mocks import sandbox
+from dirac_cwl.mocks.sandbox import create_sandbox, download_sandbox
+
+
+@pytest.fixture
+def sandbox_store(tmp_path, monkeypatch):
+    """Use a temporary sandbox store."""
+    store = tmp_path / "sandboxstore"
+    monkeypatch.setattr(sandbox, "SANDBOX_STORE_DIR", store)
+    return store
+
+
+@pytest.fixture
+def input_files(tmp_path):
+    """Create files to put in a sandbox."""
+    directory = tmp_path / "inputs"
+    (directory / "data").mkdir(parents=True)
+    (directory / "parameter.yaml").write_text("message: hello\n")
+    (directory / "data" / "values.txt").write_text("1\n2\n3\n")
+    return [directory / "parameter.yaml", directory / "data"]
+
+
+@pytest.mark.asyncio
+async def test_sandbox_roundtrip(sandbox_store, input_files, tmp_path):
+    """A sandbox is stored as a single zstd archive and can be extracted."""
+    pfn = await create_sandbox(input_files, compression_level=3)
+
+    assert pfn.startswith("sha256:") and pfn.endswith(".tar.zst")
+    archive = sandbox_store / pfn
+    assert archive.read_bytes()[:4] == b"\x28\xb5\x2f\xfd"
+    # No temporary file is left behind
+    assert list(sandbox_store.glob("*.tar.*")) == [archive]
+    assert not list(sandbox_store.glob(".tmp-*"))
+
+    destination = tmp_path / "destination"
+    await download_sandbox(pfn, destination)
+    assert (destination / "parameter.yaml").read_text() == "message: hello\n"
+    assert (destination / "data" / "values.txt").read_text() == "1\n2\n3\n"
+
+
+@pytest.mark.asyncio
+async def test_sandbox_reuse(sandbox_store, input_files, mocker):
+    """Unchanged inputs are not archived again."""
+    pfn = await create_sandbox(input_files, compression_level=3)
+
+    compressor = mocker.patch.object(sandbox.zstandard, "ZstdCompressor", wraps=sandbox.zstandard.ZstdCompressor)
+    assert await create_sandbox(input_files, compression_level=3) == pfn
+    compressor.assert_not_called()
+
+    # A modified input leads to a new archive
+    values = input_files[1] / "values.txt"
+    values.write_text("4\n5\n6\n")
+    os.utime(values, ns=(0, 0))
+    new_pfn = await create_sandbox(input_files, compression_level=3)
+    assert new_pfn != pfn
+    compressor.assert_called_once()
@@ -0,0 +1,129 @@
+"""
+Tests for the sandbox cache.
+
+This module tests the node-local cache of the extracted sandboxes.
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from dirac_cwl.job.sandbox_cache import SandboxCache
+
+
+class FakeDownload:
+    """Extract fake sandboxes, counting the extractions."""
+
+    def __init__(self, size=10):
+        """Extract sandboxes with a data file of the given size."""
+        self.calls: list[str] = []
+        self.size = size
+
+    async def __call__(self, pfn, destination):
+        """Extract a sandbox into a destination directory."""
+        self.calls.append(pfn)
+        await asyncio.sleep(0.05)
+        (destination / "sub").mkdir(parents=True, exist_ok=True)
+        (destination / "parameter.yaml").write_text(pfn)
+        (destination / "sub" / "data.bin").write_bytes(b"x" * self.size)
+
+
+@pytest.mark.asyncio
+async def test_cache_hit(tmp_path):
+    """A sandbox is extracted once, then copied into the job directories."""
+    cache = SandboxCache(tmp_path / "cache")
+    download = FakeDownload()
+
+    assert not await cache.fetch("sha256:aaaa.tar.zst", tmp_path / "job_1", download)
+    assert await cache.fetch("sha256:aaaa.tar.zst", tmp_path / "job_2", download)
+
+    assert download.calls == ["sha256:aaaa.tar.zst"]
+    for job in ("job_1", "job_2"):
+        assert (tmp_path / job / "parameter.yaml").read_text() == "sha256:aaaa.tar.zst"
+        assert (tmp_path / job / "sub" / "data.bin").read_bytes() == b"x" * 10
+    # The jobs may modify their files without changing the cached ones
+    assert not os.path.samefile(tmp_path / "job_1" / "sub" / "data.bin", tmp_path / "job_2" / "sub" / "data.bin")
+    with open(tmp_path / "job_1" / "parameter.yaml", "a") as f:
+        f.write("modified")
+    assert await cache.fetch("sha256:aaaa.tar.zst", tmp_path / "job_3", download)
+    assert (tmp_path / "job_3" / "parameter.yaml").read_text() == "sha256:aaaa.tar.zst"
+
+
+@pytest.mark.asyncio
+async def test_cache_symlinks(tmp_path):
+    """The symbolic links of a sandbox, to files or directories, are copied as links."""
+    cache = SandboxCache(tmp_path / "cache")
+    download = FakeDownload()
+
+    async def extract(pfn, destination):
+        await download(pfn, destination)
+        (destination / "linked").symlink_to("sub", target_is_directory=True)
+        (destination / "data.bin").symlink_to("sub/data.bin")
+
+    assert not await cache.fetch("sha256:aaaa.tar.zst", tmp_path / "job_1", extract)
+    assert await cache.fetch("sha256:aaaa.tar.zst", tmp_path / "job_2", extract)
+
+    for job in ("job_1", "job_2"):
+        assert os.readlink(tmp_path / job / "linked") == "sub"
+        assert os.readlink(tmp_path / job / "data.bin") == "sub/data.bin"
+        assert (tmp_path / job / "linked" / "data.bin").read_bytes() == b"x" * 10
+
+
+@pytest.mark.asyncio
+async def test_concurrent_jobs(tmp_path):
+    """Concurrent jobs sharing a sandbox extract it once."""
+    cache = SandboxCache(tmp_path / "cache")
+    download = FakeDownload()
+
+    results = await asyncio.gather(
+        *(cache.fetch("sha256:aaaa.tar.zst", tmp_path / f"job_{i}", download) for i in range(5))
+    )
+
+    assert download.calls == ["sha256:aaaa.tar.zst"]
+    assert sorted(results) == [False, True, True, True, True]
+    for i in range(5):
+        assert (tmp_path / f"job_{i}" / "parameter.yaml").exists()
+
+
+@pytest.mark.asyncio
+async def test_eviction(tmp_path):
+    """The least recently used sandboxes are evicted when the cache is full."""
+    cache = SandboxCache(tmp_path / "cache", max_size=100)
+    download = FakeDownload(size=30)
+
+    await cache.fetch("sha256:aaaa.tar.zst", tmp_path / "job_1", download)
+    await cache.fetch("sha256:bbbb.tar.zst", tmp_path / "job_2", download)
+    # Use the first sandbox again: the second one becomes the least recently used
+    await cache.fetch("sha256:aaaa.tar.zst", tmp_path / "job_3", download)
+    await cache.fetch("sha256:cccc.tar.zst", tmp_path / "job_4", download)
+
+    assert len(list((cache.directory / "entries").iterdir())) == 2
+    assert await cache.fetch("sha256:aaaa.tar.zst", tmp_path / "job_5", download)
+    assert not await cache.fetch("sha256:bbbb.tar.zst", tmp_path / "job_6", download)
+    # Evicted files are still available to the jobs that used them
+    assert (tmp_path / "job_2" / "parameter.yaml").read_text() == "sha256:bbbb.tar.zst"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_eviction(tmp_path, monkeypatch):
+    """An entry evicted by another job while evicting is skipped."""
+    from dirac_cwl.job import sandbox_cache
+
+    cache = SandboxCache(tmp_path / "cache", max_size=100)
+    download = FakeDownload(size=30)
+    await cache.fetch("sha256:aaaa.tar.zst", tmp_path / "job_1", download)
+    await cache.fetch("sha256:bbbb.tar.zst", tmp_path / "job_2", download)
+
+    # The least recently used entry is removed by another job while its size is computed
+    tree_size = sandbox_cache._tree_size
+
+    def evicted_tree_size(directory):
+        if directory.name == sandbox_cache.hashlib.sha256(b"sha256:aaaa.tar.zst").hexdigest():
+            sandbox_cache._remove_tree(directory)
+            raise FileNotFoundError(directory)
+        return tree_size(directory)
+
+    monkeypatch.setattr(sandbox_cache, "_tree_size", evicted_tree_size)
+    assert not await cache.fetch("sha256:cccc.tar.zst", tmp_path / "job_3", download)
+    assert (tmp_path / "job_3" / "parameter.yaml").read_text() == "sha256:cccc.tar.zst"
@@ -0,0 +1,124 @@
+"""
+Tests for the aggregation of the status updates of the jobs of a process.
+
+This module tests that the updates of concurrent jobs are sent in a few shared
+calls, and that the jobs are told when their updates could not be sent.
+"""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from dirac_cwl.job.job_report import JobMinorStatus, JobReport, JobStatus
+from dirac_cwl.job.status_aggregator import JobStatusAggregator
+from dirac_cwl.submission_models import JobModel
+
+
+class FakeClient:
+    """Record the status updates sent to DiracX."""
+
+    def __init__(self, success: bool = True):
+        """Answer all the calls with the given success."""
+        self.calls: list[dict] = []
+        self.success = success
+        self.jobs = self
+        self.opened = 0
+
+    async def __aenter__(self):
+        """Open the client."""
+        self.opened += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Close the client."""
+
+    async def set_job_statuses(self, body):
+        """Record a call."""
+        self.calls.append(body)
+        return SimpleNamespace(success=self.success)
+
+
+async def run_job(job_id: int, aggregator: JobStatusAggregator) -> None:
+    """Report the statuses of a job, as the job wrapper does."""
+    async with JobReport(job_id, "JobWrapper", None, coalesce_delay=0, aggregator=aggregator) as report:
+        report.set_job_status(JobStatus.RUNNING, JobMinorStatus.JOB_INITIALIZATION)
+        await report.commit()
+        report.set_job_status(minor_status=JobMinorStatus.APPLICATION)
+        await report.commit()
+        report.set_job_status(JobStatus.DONE, JobMinorStatus.EXEC_COMPLETE)
+
+
+def test_concurrent_jobs_share_calls():
+    """The updates of jobs running in different threads are sent together, by a single client."""
+    client = FakeClient()
+    aggregator = JobStatusAggregator(lambda: client, interval=0.2)
+    threads = [threading.Thread(target=asyncio.run, args=(run_job(job_id, aggregator),)) for job_id in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    aggregator.close()
+
+    assert client.opened == 1
+    assert len(client.calls) < 5
+    updates = {}
+    for body in client.calls:
+        for job_id, job_updates in body.items():
+            updates.setdefault(job_id, {}).update(job_updates)
+    assert sorted(updates) == list(range(20))
+    for job_updates in updates.values():
+        assert [update["MinorStatus"] for update in job_updates.values()] == [
+            JobMinorStatus.JOB_INITIALIZATION,
+            JobMinorStatus.APPLICATION,
+            JobMinorStatus.EXEC_COMPLETE,
+        ]
+
+
+@pytest.mark.asyncio
+async def test_failed_send():
+    """The jobs keep the updates that could not be sent."""
+    aggregator = JobStatusAggregator(lambda: FakeClient(success=False), interval=0.05)
+    report = JobReport(1, "JobWrapper", None, aggregator=aggregator)
+    report.set_job_status(JobStatus.RUNNING)
+    with pytest.raises(RuntimeError):
+        await report.commit()
+    assert len(report.job_status_info) == 1
+    aggregator.close()
+
+
+def test_in_process_jobs_share_calls(mocker, monkeypatch, sample_command_line_tool):
+    """The local router sends the statuses of its in-process jobs together."""
+    from dirac_cwl import job as job_module
+    from dirac_cwl.job import status_aggregator
+    from dirac_cwl.job.job_wrapper import JobWrapper
+
+    async def run_job(self, job):
+        async with self._job_report as report:
+            report.set_job_status(JobStatus.DONE, JobMinorStatus.EXEC_COMPLETE)
+        return True
+
+    client = FakeClient()
+    monkeypatch.setenv("DIRAC_PROTO_LOCAL", "1")
+    monkeypatch.setattr(status_aggregator, "_aggregator", JobStatusAggregator(lambda: client, interval=0.5))
+    monkeypatch.setattr(JobWrapper, "run_job", run_job)
+
+    job = JobModel(task=sample_command_line_tool)
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda job_id: results.append(job_module.run_job_in_process(job_id, job, mocker.Mock())),
+            args=(job_id,),
+        )
+        for job_id in (1, 2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    status_aggregator.get_status_aggregator().close()
+
+    assert results == [True, True]
+    assert len(client.calls) == 1
+    assert sorted(client.calls[0]) == [1, 2]
@@ -0,0 +1,126 @@
+"""
+Tests for the incremental feeding of transformations.
+
+This module tests the discovery of new input files, their grouping and the
+bookkeeping of their state across restarts.
+"""
+
+from pathlib import Path
+
+from dirac_cwl.transformation.feeder import FileStatus, TransformationFeeder
+
+
+def add_files(directory: Path, *names: str) -> None:
+    """Create input files."""
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (directory / name).write_text(name)
+
+
+def make_feeder(tmp_path: Path, group_size: int = 2) -> TransformationFeeder:
+    """Build a feeder of the files of the pi/100 query."""
+    return TransformationFeeder(
+        "transformation",
+        Path("pi/100"),
+        group_size,
+        database_path=tmp_path / "transformations.db",
+        root=tmp_path / "filecatalog",
+    )
+
+
+def test_new_files_are_grouped_once(tmp_path):
+    """Only full groups of new files are assigned, each file to a single group."""
+    query = tmp_path / "filecatalog" / "pi" / "100"
+    with make_feeder(tmp_path) as feeder:
+        # The query directory does not exist yet
+        assert feeder.poll() == 0
+
+        add_files(query, "a.sim", "b.sim", "c.sim")
+        assert feeder.poll() == 3
+        assert feeder.assign_groups() == [(1, ["pi/100/a.sim", "pi/100/b.sim"])]
+        assert feeder.assign_groups() == []
+
+        add_files(query, "d.sim")
+        assert feeder.poll() == 1
+        assert feeder.poll() == 0
+        assert feeder.assign_groups() == [(2, ["pi/100/c.sim", "pi/100/d.sim"])]
+
+        feeder.set_group_status([1], FileStatus.PROCESSED)
+        feeder.set_group_status([2], FileStatus.FAILED)
+        assert feeder.counts() == {
+            FileStatus.UNUSED: 0,
+            FileStatus.ASSIGNED: 0,
+            FileStatus.PROCESSED: 2,
+            FileStatus.FAILED: 2,
+        }
+
+
+def test_restart(tmp_path):
+    """Processed files are not fed again, interrupted groups are."""
+    add_files(tmp_path / "filecatalog" / "pi" / "100", "a.sim", "b.sim", "c.sim", "d.sim")
+    with make_feeder(tmp_path) as feeder:
+        feeder.poll()
+        (first, _), _ = feeder.assign_groups()
+        feeder.set_group_status([first], FileStatus.PROCESSED)
+
+    with make_feeder(tmp_path) as feeder:
+        assert feeder.poll() == 0
+        assert feeder.assign_groups() == [(2, ["pi/100/c.sim", "pi/100/d.sim"])]
+
+
+def test_partial_group(tmp_path):
+    """Once no more files are expected, the files left over form a last group."""
+    add_files(tmp_path / "filecatalog" / "pi" / "100", "a.sim", "b.sim", "c.sim")
+    with make_feeder(tmp_path) as feeder:
+        feeder.poll()
+        assert feeder.assign_groups(partial=True) == [(1, ["pi/100/a.sim", "pi/100/b.sim"]), (2, ["pi/100/c.sim"])]
+        assert feeder.assign_groups(partial=True) == []
+
+
+def test_weighted_groups(tmp_path):
+    """With a group target, groups are assigned once no unused file fits in them."""
+    query = tmp_path / "filecatalog" / "pi" / "100"
+    sizes = {"pi/100/a.sim": 6.0, "pi/100/b.sim": 2.0, "pi/100/c.sim": 1.0, "pi/100/d.sim": 4.0}
+    weighed = []
+
+    def weigh(paths):
+        weighed.extend(paths)
+        return [sizes[path] for path in paths]
+
+    with TransformationFeeder(
+        "transformation",
+        Path("pi/100"),
+        3,
+        database_path=tmp_path / "transformations.db",
+        root=tmp_path / "filecatalog",
+        group_target=10.0,
+        weigh=weigh,
+    ) as feeder:
+        add_files(query, "a.sim", "b.sim")
+        feeder.poll()
+        assert feeder.assign_groups() == []
+
+        add_files(query, "c.sim", "d.sim")
+        feeder.poll()
+        assert feeder.assign_groups() == [(1, ["pi/100/a.sim", "pi/100/d.sim"])]
+        assert feeder.assign_groups(partial=True) == [(2, ["pi/100/b.sim", "pi/100/c.sim"])]
+        # Each file is weighed once
+        assert sorted(weighed) == sorted(sizes)
+
+
+def test_weighted_groups_below_target(tmp_path):
+    """Groups whose weight cannot get closer to the target are full without new files."""
+    add_files(tmp_path / "filecatalog" / "pi" / "100", *(f"{index:02}.sim" for index in range(30)))
+    with TransformationFeeder(
+        "transformation",
+        Path("pi/100"),
+        100,
+        database_path=tmp_path / "transformations.db",
+        root=tmp_path / "filecatalog",
+        group_target=10.0,
+        weigh=lambda paths: [3.0] * len(paths),
+    ) as feeder:
+        feeder.poll()
+        groups = feeder.assign_groups()
+        assert [len(paths) for _, paths in groups] == [3] * 10
+        assert feeder.assign_groups(partial=True) == []
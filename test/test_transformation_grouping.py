@@ -0,0 +1,94 @@
+"""
+Tests for the grouping of the input files of transformations by weight.
+
+This module tests the weighing of the input files from the replica map, the
+catalog metadata and the stored files, and their packing into groups.
+"""
+
+import pytest
+from diracx.core.models.replica_map import ReplicaMap
+
+from dirac_cwl.execution_hooks import GroupWeight
+from dirac_cwl.transformation.grouping import file_weights, group_files, pack_groups
+
+
+def test_fixed_groups():
+    """Without a target, the files are sliced into groups of group_size files."""
+    assert group_files(["a", "b", "c", "d", "e"], 2) == [["a", "b"], ["c", "d"], ["e"]]
+    assert group_files(["a", "b"], None) == [["a"], ["b"]]
+
+
+def test_pack_groups():
+    """Items are packed into groups close to the target, keeping their order."""
+    items = ["a", "b", "c", "d", "e", "f"]
+    weights = [1.0, 8.0, 2.0, 12.0, 5.0, 3.0]
+    groups = pack_groups(items, weights, 10.0)
+    # The heavy item gets a group of its own, the others fill their groups to the target
+    assert groups == [["a", "e", "f"], ["b", "c"], ["d"]]
+
+
+def test_pack_groups_max_items():
+    """Groups never have more than max_items items."""
+    groups = pack_groups(list(range(10)), [1.0] * 10, 100.0, max_items=4)
+    assert groups == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+
+def test_size_weights(tmp_path):
+    """Sizes come from the replica map, then the catalog metadata, then the stored files."""
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "stored.dst").write_bytes(b"\0" * 300)
+    replica_map = ReplicaMap(
+        root={
+            "/data/mapped.dst": ReplicaMap.MapEntry(
+                replicas=[ReplicaMap.MapEntry.Replica(url="root://eos.example.org//mapped.dst", se="SE")],
+                size_bytes=100,
+            )
+        }
+    )
+    metadata = {"/data/catalogued.dst": {"Size": 200}}
+    locations = ["lfn:/data/mapped.dst", "lfn:/data/catalogued.dst", "lfn:/data/stored.dst", "lfn:/data/unknown.dst"]
+
+    weights = file_weights(locations, GroupWeight.SIZE, metadata, replica_map, root=tmp_path)
+    # The file of unknown size weighs the mean of the others
+    assert weights == [100.0, 200.0, 300.0, 200.0]
+
+
+@pytest.mark.parametrize(
+    "weight, cpu_per_event, expected",
+    [
+        (GroupWeight.FILES, None, [1.0, 1.0]),
+        (GroupWeight.EVENTS, None, [1000.0, 3000.0]),
+        (GroupWeight.CPU, 0.5, [500.0, 1500.0]),
+    ],
+)
+def test_event_weights(weight, cpu_per_event, expected):
+    """Event counts come from the catalog metadata."""
+    metadata = {"/a.sim": {"NumberOfEvents": 1000}, "/b.sim": {"NumberOfEvents": 3000}}
+    assert file_weights(["lfn:/a.sim", "LFN:/b.sim"], weight, metadata, cpu_per_event=cpu_per_event) == expected
+
+
+def test_weighted_groups():
+    """Files of very different weights give groups of similar weights."""
+    weights = {"lfn:/a": 90.0, "lfn:/b": 10.0, "lfn:/c": 50.0, "lfn:/d": 50.0, "lfn:/e": 95.0}
+    groups = group_files(list(weights), 3, target=100.0, weigh=lambda locations: [weights[x] for x in locations])
+    assert groups == [["lfn:/a", "lfn:/b"], ["lfn:/c", "lfn:/d"], ["lfn:/e"]]
+
+
+def test_catalog_weigher_reuses_catalog(mocker):
+    """The weigher opens the file catalog once for all the files it weighs."""
+    from dirac_cwl.transformation import grouping
+
+    open_catalog = mocker.patch.object(grouping, "open_catalog")
+    metadata = {"/a.sim": {"NumberOfEvents": 1000}, "/b.sim": {"NumberOfEvents": 3000}}
+    open_catalog.return_value.getFileMetadata.side_effect = lambda lfns: {
+        "OK": True,
+        "Value": {"Successful": {lfn: metadata[lfn] for lfn in lfns}, "Failed": {}},
+    }
+
+    weigh = grouping.catalog_weigher(GroupWeight.EVENTS)
+    assert weigh(["lfn:/a.sim"]) == [1000.0]
+    assert weigh(["lfn:/b.sim"]) == [3000.0]
+    open_catalog.assert_called_once()
+
+    assert grouping.catalog_weigher(GroupWeight.FILES)(["lfn:/a.sim"]) == [1.0]
+    open_catalog.assert_called_once()
@@ -0,0 +1,132 @@
+"""
+Tests for the scheduling of the jobs of transformations.
+
+This module tests the order in which the jobs get the execution slots of the router.
+"""
+
+import asyncio
+import threading
+from pathlib import Path
+
+import pytest
+
+from dirac_cwl.submission_models import JobInputModel, TransformationSubmissionModel
+from dirac_cwl.transformation import scheduler as scheduler_module
+from dirac_cwl.transformation.scheduler import JobSlots, TransformationInputs, TransformationScheduler, build_dag
+
+
+@pytest.mark.asyncio
+async def test_job_slots_order():
+    """Waiting jobs get the freed slots by order of their keys."""
+    slots = JobSlots(1)
+    started = []
+
+    async def job(name, key):
+        await slots.acquire(key)
+        started.append(name)
+        await asyncio.sleep(0.01)
+        slots.release()
+
+    await slots.acquire((0,))
+    tasks = [
+        asyncio.create_task(job(name, key))
+        for name, key in [("low", (-1, -1)), ("high", (-10, -1)), ("long", (-10, -3))]
+    ]
+    await asyncio.sleep(0.01)
+    slots.release()
+    await asyncio.gather(*tasks)
+
+    assert started == ["long", "high", "low"]
+
+
+@pytest.mark.asyncio
+async def test_job_slots_cancelled_waiter():
+    """A cancelled waiting job does not hold a slot."""
+    slots = JobSlots(1)
+    await slots.acquire((0,))
+    waiter = asyncio.create_task(slots.acquire((0,)))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    slots.release()
+
+    await asyncio.wait_for(slots.acquire((0,)), 1)
+
+
+@pytest.mark.asyncio
+async def test_transformation_jobs_share_task_document(sample_command_line_tool, tmp_path, monkeypatch, mocker):
+    """The jobs of a transformation share the task document of a single batch."""
+    monkeypatch.chdir(tmp_path)
+    job_inputs = [JobInputModel(sandbox=None, cwl={"value": value}) for value in range(3)]
+    mocker.patch.object(
+        scheduler_module, "get_transformation_inputs", return_value=TransformationInputs(jobs=job_inputs)
+    )
+    batches = []
+
+    def fake_run_job(job_id, job, logger, isolation, batch):
+        batches.append(batch)
+        assert len(list(batch.directory.glob("task_*.cwl"))) == 1
+        return True
+
+    mocker.patch.object(scheduler_module, "run_job", side_effect=fake_run_job)
+    nodes = build_dag([TransformationSubmissionModel(task=sample_command_line_tool)])
+
+    assert await TransformationScheduler(nodes, max_parallel_jobs=2).run() == [True]
+    assert len(batches) == 3
+    assert len(set(map(id, batches))) == 1
+
+
+@pytest.mark.asyncio
+async def test_transformation_run_again(sample_command_line_tool, tmp_path, monkeypatch, mocker):
+    """Running a transformation again on the same catalog stops once its files are all processed."""
+    monkeypatch.chdir(tmp_path)
+    query = tmp_path / "filecatalog" / "pi" / "100"
+    query.mkdir(parents=True)
+    for name in ("a.sim", "b.sim"):
+        (query / name).write_text(name)
+    mocker.patch.object(
+        scheduler_module,
+        "get_transformation_inputs",
+        return_value=TransformationInputs(query=Path("pi/100"), group_size=2),
+    )
+    run_job = mocker.patch.object(scheduler_module, "run_job", return_value=True)
+    nodes = build_dag([TransformationSubmissionModel(task=sample_command_line_tool)])
+
+    assert await TransformationScheduler(nodes, poll_interval=0.01).run() == [True]
+    assert run_job.call_count == 1
+
+    assert await asyncio.wait_for(TransformationScheduler(nodes, poll_interval=0.01).run(), 5) == [True]
+    assert run_job.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_transformation_feeder_off_event_loop(sample_command_line_tool, tmp_path, monkeypatch, mocker):
+    """The feeder groups the files and records their state outside of the event loop thread."""
+    from dirac_cwl.transformation.feeder import TransformationFeeder
+
+    monkeypatch.chdir(tmp_path)
+    query = tmp_path / "filecatalog" / "pi" / "100"
+    query.mkdir(parents=True)
+    for name in ("a.sim", "b.sim"):
+        (query / name).write_text(name)
+    mocker.patch.object(
+        scheduler_module,
+        "get_transformation_inputs",
+        return_value=TransformationInputs(query=Path("pi/100"), group_size=2),
+    )
+    mocker.patch.object(scheduler_module, "run_job", return_value=True)
+    threads = {}
+
+    def record(method):
+        def wrapper(*args, **kwargs):
+            threads[method.__name__] = threading.current_thread()
+            return method(*args, **kwargs)
+
+        return wrapper
+
+    for method in (TransformationFeeder.assign_groups, TransformationFeeder.set_group_status):
+        monkeypatch.setattr(TransformationFeeder, method.__name__, record(method))
+    nodes = build_dag([TransformationSubmissionModel(task=sample_command_line_tool)])
+
+    assert await TransformationScheduler(nodes, poll_interval=0.01).run() == [True]
+    assert set(threads) == {"assign_groups", "set_group_status"}
+    assert threading.main_thread() not in threads.values()
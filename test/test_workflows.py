@@ -166,6 +166,18 @@ def test_run_job_success(cli_runner, cleanup, pi_test_files, cwl_file, inputs):
     assert "CLI: Job(s) done" in clean_output, f"Failed to run the job: {result.stdout}"
 
 
+def test_subcommands_keep_their_commands(cli_runner, cleanup):
+    """Test that the subcommands, imported when run, are groups of their own commands."""
+    for name in ("job", "transformation", "production"):
+        result = cli_runner.invoke(app, [name, "--help"])
+        assert result.exit_code == 0, result.output
+        assert "submit" in strip_ansi_codes(result.stdout)
+
+    result = cli_runner.invoke(app, ["job", "submit", "test/workflows/helloworld/description_basic.cwl"])
+    assert result.exit_code == 0, result.output
+    assert "CLI: Job(s) done" in strip_ansi_codes(result.stdout)
+
+
 @pytest.mark.parametrize(
     "cwl_file, inputs, expected_error",
     [